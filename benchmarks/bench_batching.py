@@ -0,0 +1,109 @@
+"""
+Measures per-query latency and throughput of concurrent `embed_query` calls
+made directly on a model versus through BatchingEmbeddings.
+
+By default the model is a synthetic CPU-bound encoder (a few dense layers in
+numpy, with a fixed per-call overhead like a real forward pass), so the
+script runs offline; `--backend` uses a real embedding backend instead.
+
+Usage:
+    python -m benchmarks.bench_batching [--threads 16] [--queries 50] [--backend onnx] [--json out.json]
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import numpy as np
+
+from src.core.embeddings import BatchingEmbeddings
+from src.core.processing import EMBEDDING_BACKENDS, get_embeddings
+
+
+class SyntheticEncoder:
+    """Stand-in for a transformer: cost = per-call overhead + per-text matmuls."""
+
+    def __init__(self, dim=384, layers=6, tokens=64, call_overhead_ms=2.0, seed=0):
+        rng = np.random.default_rng(seed)
+        self.weights = [rng.standard_normal((dim, dim)).astype(np.float32) / np.sqrt(dim) for _ in range(layers)]
+        self.dim = dim
+        self.tokens = tokens
+        self.call_overhead = call_overhead_ms / 1000
+
+    def embed_documents(self, texts):
+        deadline = time.perf_counter() + self.call_overhead
+        while time.perf_counter() < deadline:
+            pass
+        hidden = np.ones((len(texts) * self.tokens, self.dim), dtype=np.float32)
+        for weight in self.weights:
+            hidden = np.tanh(hidden @ weight)
+        pooled = hidden.reshape(len(texts), self.tokens, self.dim).mean(axis=1)
+        return pooled.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def run_load(model, threads, queries):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(client_id):
+        local = []
+        for i in range(queries):
+            started = time.perf_counter()
+            model.embed_query(f"client {client_id} question {i}")
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "queries_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--queries", type=int, default=50, help="Queries per client thread.")
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, help="Use a real backend instead of the synthetic one.")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    model = get_embeddings(backend=args.backend) if args.backend else SyntheticEncoder()
+    results = []
+    for threads in args.threads:
+        direct = run_load(model, threads, args.queries)
+        batching = BatchingEmbeddings(model, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+        batched = run_load(batching, threads, args.queries)
+        batched["service"] = batching.metrics.as_dict()
+        batching.close()
+        results.append({"threads": threads, "direct": direct, "batched": batched})
+
+        for name, result in (("direct", direct), ("batched", batched)):
+            print(f"{threads:>3} threads {name:>8}: {result['queries_per_second']:>8,.0f} q/s, "
+                  f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms")
+        print(f"{'':>20}service: {batching.metrics.summary()}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"backend": args.backend or "synthetic", "queries": args.queries, "runs": results}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
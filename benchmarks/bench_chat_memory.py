@@ -0,0 +1,106 @@
+"""
+Size and latency of the question-rewrite (refine) call over a long
+conversation, with the old last-three-messages history versus
+ConversationMemory (rolling summary + recent turns under a token budget),
+against the local fake LLM server. Assistant answers are long, as real RAG
+answers often are; prompt processing costs --ms-per-1k latency per 1,000
+prompt tokens.
+
+Also reports the oldest turn still represented in the context (each user
+question carries a "(turn N)" marker), i.e. how far back the context reaches.
+
+Usage:
+    python -m benchmarks.bench_chat_memory [--turns 40] [--answer-words 400] [--json out.json]
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from benchmarks.fake_embeddings import HashingEmbeddings
+from benchmarks.fake_llm_server import FakeLLMConfig, start_server
+from src.core.agent import AgentBrain
+from src.core.chat_memory import ConversationMemory
+from src.core.llm import LLMPool
+from src.core.memory import MemoryManager
+from src.core.tracing import Tracer
+
+WORDS = "report revenue growth risk policy customer market audit strategy model results quarter data".split()
+
+
+def oldest_turn(history_text):
+    turns = [int(turn) for turn in re.findall(r"\(turn (\d+)\)", history_text)]
+    return min(turns) if turns else None
+
+
+def run(mode, agent, tracer, args):
+    rng = random.Random(1)
+    if mode == "last3":
+        history = []
+    else:
+        history = ConversationMemory(llm=agent.llm if mode == "memory-llm" else None,
+                                     recent_tokens=args.budget * 3 // 5, summary_tokens=args.budget * 2 // 5)
+    tokens, latencies, reach = [], [], []
+    for turn in range(1, args.turns + 1):
+        question = f"And what does it say about {rng.choice(WORDS)} (turn {turn})?"
+        if history:
+            text = history.context() if mode != "last3" else "\n".join(
+                f"{message['role'].upper()}: {message['content']}" for message in history[-3:])
+            reach.append(turn - (oldest_turn(text) or turn))
+        tracer.spans.clear()
+        agent.ask(question, chat_history=history)
+        refine = [span for span in tracer.spans if span["name"] == "refine"]
+        if refine:
+            tokens.append(refine[0]["attributes"]["history_tokens"])
+            latencies.append(refine[0]["durationMs"])
+
+        answer = " ".join(rng.choice(WORDS) for _ in range(args.answer_words)) + "."
+        if mode == "last3":
+            history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+        else:
+            history.add("user", question)
+            history.add("assistant", answer)
+    # Let background summary updates land before the next mode starts.
+    time.sleep(args.llm_ms / 1000 * 2)
+    ordered = sorted(latencies)
+    return {
+        "history_tokens_mean": round(sum(tokens) / len(tokens), 1),
+        "history_tokens_max": max(tokens),
+        "refine_p50_ms": round(ordered[len(ordered) // 2], 1),
+        "refine_max_ms": round(ordered[-1], 1),
+        "turns_back_reached": max(reach),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--answer-words", type=int, default=400)
+    parser.add_argument("--budget", type=int, default=650, help="ConversationMemory token budget.")
+    parser.add_argument("--llm-ms", type=float, default=100.0)
+    parser.add_argument("--ms-per-1k", type=float, default=150.0)
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    server, url = start_server(FakeLLMConfig(latency_ms=args.llm_ms, sigma=0.05, tail=0.0, seed=2,
+                                             ms_per_1k_prompt_tokens=args.ms_per_1k))
+    pool = LLMPool(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, base_url=url, hedge=False)
+    tracer = Tracer()
+    agent = AgentBrain("gsk_fake_key", None, MemoryManager(embedding_model=HashingEmbeddings()), llm_pool=pool,
+                       speculative=False, tracer=tracer)
+
+    results = {mode: run(mode, agent, tracer, args) for mode in ("last3", "memory-extractive", "memory-llm")}
+    server.shutdown()
+
+    for mode, result in results.items():
+        print(f"{mode:>18}: history {result['history_tokens_mean']} tokens avg / {result['history_tokens_max']} max, "
+              f"refine p50 {result['refine_p50_ms']} ms / max {result['refine_max_ms']} ms, "
+              f"reaches {result['turns_back_reached']} turns back")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"args": vars(args), "modes": results}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
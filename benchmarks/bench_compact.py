@@ -0,0 +1,133 @@
+"""
+Compares the flat float32 index + InMemoryDocstore against the compact
+storage modes (fp16 / sq8 scalar quantization + CompactDocstore): memory per
+chunk, extrapolated to one million chunks, and recall@k against exact search.
+
+Usage:
+    python -m benchmarks.bench_compact [--chunks 20000] [--dim 384] [--k 10] [--json out.json]
+"""
+import argparse
+import json
+import random
+import tracemalloc
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from src.core.compact import STORAGE_MODES, CompactDocstore, make_index
+
+WORDS = (
+    "policy report revenue quarter growth risk compliance audit customer market "
+    "analysis strategy the of and to in for with on by data model system results"
+).split()
+MILLION = 1_000_000
+
+
+def build_vectors(count, dim, clusters=64, seed=42):
+    """Unit vectors around random topic centroids, roughly like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def build_chunks(count, chunk_chars, seed=42):
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(count):
+        words = []
+        while sum(len(word) + 1 for word in words) < chunk_chars:
+            words.append(rng.choice(WORDS))
+        chunks.append(Document(
+            page_content=" ".join(words),
+            metadata={"source": f"doc_{i % 50}.pdf", "file_path": f"doc_{i % 50}.pdf", "page": i % 300},
+        ))
+    return chunks
+
+
+def docstore_bytes(docstore_type, chunks):
+    """Bytes allocated to hold the chunks once they are in the docstore."""
+    # Fresh copies of every string are built under tracemalloc, as they would be
+    # when chunks come out of the splitter; the source list itself is not counted.
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    docstore = docstore_type()
+    for i, chunk in enumerate(chunks):
+        metadata = json.loads(json.dumps(chunk.metadata))
+        text = chunk.page_content.encode("utf-8").decode("utf-8")
+        docstore.add({str(i): Document(page_content=text, metadata=metadata)})
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return current - before
+
+
+def recall_at_k(exact_ids, approx_ids):
+    k = exact_ids.shape[1]
+    hits = sum(len(set(exact) & set(approx)) for exact, approx in zip(exact_ids, approx_ids))
+    return hits / (len(exact_ids) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 produces 384-d vectors.")
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    vectors = build_vectors(args.chunks + args.queries, args.dim)
+    corpus, queries = vectors[: args.chunks], vectors[args.chunks :]
+    chunks = build_chunks(args.chunks, args.chunk_chars)
+
+    docstores = {
+        "flat": docstore_bytes(InMemoryDocstore, chunks),
+        "compact": docstore_bytes(CompactDocstore, chunks),
+    }
+
+    results = {}
+    exact_ids = None
+    for storage in STORAGE_MODES:
+        index = make_index(args.dim, storage)
+        if not index.is_trained:
+            index.train(corpus)
+        index.add(corpus)
+        _, ids = index.search(queries, args.k)
+        if exact_ids is None:
+            exact_ids = ids
+        index_bytes = faiss.serialize_index(index).nbytes
+        store_bytes = docstores["flat" if storage == "flat" else "compact"]
+        per_chunk = (index_bytes + store_bytes) / args.chunks
+        results[storage] = {
+            "index_bytes": int(index_bytes),
+            "docstore_bytes": int(store_bytes),
+            "bytes_per_chunk": round(per_chunk, 1),
+            "gb_per_million_chunks": round(per_chunk * MILLION / 1024 ** 3, 2),
+            f"recall_at_{args.k}": round(recall_at_k(exact_ids, ids), 4),
+        }
+
+    report = {
+        "chunks": args.chunks,
+        "dim": args.dim,
+        "chunk_chars": args.chunk_chars,
+        "queries": args.queries,
+        "k": args.k,
+        "storage": results,
+    }
+
+    for storage, result in results.items():
+        print(f"{storage:>5}: {result['bytes_per_chunk']:,.0f} B/chunk "
+              f"(index {result['index_bytes'] / args.chunks:,.0f}, docstore {result['docstore_bytes'] / args.chunks:,.0f}), "
+              f"{result['gb_per_million_chunks']} GB per 1M chunks, recall@{args.k} {result[f'recall_at_{args.k}']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares embedding backends (see src.core.processing.get_embeddings) on a
+synthetic chunk corpus: load time, chunks/sec, and how far each backend's
+vectors drift from the reference backend (min cosine similarity and max
+absolute difference). Backends whose dependencies are missing are skipped.
+
+Usage:
+    python -m benchmarks.bench_embeddings [--chunks 2000] [--backends torch onnx onnx-int8] [--threads 4] [--json out.json]
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from src.core.processing import EMBEDDING_BACKENDS, get_embeddings
+
+WORDS = (
+    "policy report revenue quarter growth risk compliance audit customer market "
+    "analysis strategy the of and to in for with on by data model system results"
+).split()
+
+
+def build_chunks(count, seed=42):
+    """Chunks of very different lengths, as the splitter produces at page ends."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.choice((8, 40, 120, 180)))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads.")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    texts = build_chunks(args.chunks)
+    results = {}
+    reference = None
+    for backend in args.backends:
+        started = time.perf_counter()
+        try:
+            model = get_embeddings(backend=backend, num_threads=args.threads, batch_size=args.batch_size)
+        except ImportError as error:
+            print(f"{backend:>10}: skipped ({error})")
+            continue
+        load_seconds = time.perf_counter() - started
+
+        model.embed_documents(texts[:8])  # warm-up
+        started = time.perf_counter()
+        vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+        seconds = time.perf_counter() - started
+
+        result = {
+            "load_seconds": round(load_seconds, 2),
+            "seconds": round(seconds, 3),
+            "chunks_per_second": round(len(texts) / seconds, 1),
+        }
+        if reference is None:
+            reference = (backend, vectors)
+        else:
+            cosine = np.sum(reference[1] * vectors, axis=1) / (
+                np.linalg.norm(reference[1], axis=1) * np.linalg.norm(vectors, axis=1)
+            )
+            result["reference"] = reference[0]
+            result["min_cosine"] = round(float(cosine.min()), 6)
+            result["max_abs_diff"] = round(float(np.abs(reference[1] - vectors).max()), 6)
+        results[backend] = result
+
+    for backend, result in results.items():
+        drift = ""
+        if "reference" in result:
+            drift = f", vs {result['reference']}: min cosine {result['min_cosine']}, max |diff| {result['max_abs_diff']}"
+        print(f"{backend:>10}: load {result['load_seconds']}s, {result['chunks_per_second']:,.0f} chunks/s{drift}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"chunks": args.chunks, "threads": args.threads, "backends": results}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
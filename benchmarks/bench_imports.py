@@ -0,0 +1,81 @@
+"""
+Measures cold import time of the app's modules, each in a fresh interpreter,
+and lists the slowest imports they pull in (via `python -X importtime`).
+
+"first-paint" is everything main.py imports before the API key gate; it
+should stay small. The other entries load lazily or on the warm-up thread.
+
+Usage:
+    python -m benchmarks.bench_imports [--repeats 3] [--top 8] [--json out.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+TARGETS = {
+    "first-paint": ["streamlit", "src.core.registry", "src.ui.layout", "src.ui.visuals"],
+    "agent": ["src.core.agent"],
+    "memory": ["src.core.memory"],
+    "processing": ["src.core.processing"],
+    "embeddings": ["src.core.embeddings"],
+}
+
+
+def import_once(modules):
+    """Returns (seconds, importtime lines) for importing `modules` in a new interpreter."""
+    code = "import " + ", ".join(modules)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed"
+        raise ImportError(error)
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented by two spaces per level after the leading one.
+        rows.append((int(cumulative_us), int(self_us), name[1:]))
+    top_level = [row for row in rows if not row[2].startswith(" ")]
+    seconds = sum(row[0] for row in top_level) / 1e6
+    return seconds, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports to list per target.")
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    results = {}
+    for target, modules in TARGETS.items():
+        try:
+            runs = [import_once(modules) for _ in range(args.repeats)]
+        except ImportError as error:
+            print(f"{target:>12}: skipped ({error})")
+            continue
+        seconds, rows = min(runs, key=lambda run: run[0])
+        slowest = sorted(rows, reverse=True)[: args.top]
+        results[target] = {
+            "modules": modules,
+            "seconds": round(seconds, 3),
+            "slowest": [{"module": name.strip(), "cumulative_ms": round(cumulative / 1000, 1)} for cumulative, _, name in slowest],
+        }
+        print(f"{target:>12}: {seconds * 1000:,.0f} ms")
+        for entry in results[target]["slowest"]:
+            print(f"{'':>14}{entry['cumulative_ms']:>8,.1f} ms  {entry['module']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"python": sys.version.split()[0], "targets": results}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Load-tests the Groq client layer against the local fake LLM server: plain
+ChatGroq clients (one per session, no retries) versus the shared LLMPool
+(rate limiting, backoff with jitter, hedging). Reports success rate, 429s
+seen by the server, and p50/p95/p99 latency of successful calls.
+
+Usage:
+    python -m benchmarks.bench_llm [--sessions 8] [--calls 10] [--server-rpm 120] [--json out.json]
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+from benchmarks.fake_llm_server import FakeLLMConfig, start_server
+from src.core.llm import GROQ_MODEL, LLMPool
+
+FAKE_KEY = "gsk_fake_benchmark_key"
+
+
+def run_sessions(make_model, sessions, calls):
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def session(session_id):
+        model = make_model()
+        for i in range(calls):
+            started = time.perf_counter()
+            try:
+                model.invoke(f"Session {session_id} question {i}: summarise the attached context.")
+            except Exception as error:
+                with lock:
+                    failures.append(type(error).__name__)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(q):
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1) if latencies else None
+
+    return {
+        "succeeded": len(latencies),
+        "failed": len(failures),
+        "failure_types": sorted(set(failures)),
+        "seconds": round(elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=10, help="Calls per session.")
+    parser.add_argument("--server-rpm", type=int, default=120, help="The fake server's rate limit.")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tail", type=float, default=0.05, help="Fraction of 8x-slow responses.")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Fraction of 503 responses.")
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    from langchain_groq import ChatGroq
+
+    results = {}
+    for name in ("direct", "pooled"):
+        config = FakeLLMConfig(latency_ms=args.latency_ms, tail=args.tail, rpm=args.server_rpm,
+                               error_rate=args.error_rate, reply="ok", seed=7)
+        server, url = start_server(config)
+        if name == "direct":
+            def make_model():
+                return ChatGroq(model=GROQ_MODEL, api_key=FAKE_KEY, base_url=url, max_retries=0)
+        else:
+            # Client-side budget slightly under the server's limit, hedging after 2x median latency.
+            pool = LLMPool(requests_per_minute=int(args.server_rpm * 0.95), tokens_per_minute=10 ** 6,
+                           base_url=url, hedge_after=args.latency_ms * 2 / 1000)
+
+            def make_model():
+                return pool.chat_model(FAKE_KEY)
+        result = run_sessions(make_model, args.sessions, args.calls)
+        result["server"] = dict(config.counts)
+        if name == "pooled":
+            result["client"] = pool.stats(FAKE_KEY)
+        server.shutdown()
+        results[name] = result
+
+        print(f"{name:>7}: {result['succeeded']}/{result['succeeded'] + result['failed']} ok in {result['seconds']}s, "
+              f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, "
+              f"server 429s {result['server']['rate_limited']}")
+        if result["failure_types"]:
+            print(f"{'':>9}failures: {', '.join(result['failure_types'])}")
+        if "client" in result:
+            print(f"{'':>9}client: {result['client']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"sessions": args.sessions, "calls": args.calls, "results": results}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
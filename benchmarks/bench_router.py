@@ -0,0 +1,122 @@
+"""
+LLM calls and latency per question through AgentBrain.ask, with RAG-first
+probing versus the local QueryRouter, against the local fake LLM and Tavily
+servers. A small document store (real MemoryManager, hashed bag-of-words
+embeddings so no model download is needed) answers the document questions;
+the web and chat questions are not covered by it.
+
+Usage:
+    python -m benchmarks.bench_router [--llm-ms 300] [--tavily-ms 600] [--json out.json]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from langchain_core.documents import Document
+
+from benchmarks.fake_embeddings import HashingEmbeddings
+from benchmarks.fake_llm_server import FakeLLMConfig, start_server as start_llm_server
+from benchmarks.fake_tavily_server import FakeTavilyConfig, start_server as start_tavily_server
+from src.core.agent import AgentBrain
+from src.core.llm import LLMPool
+from src.core.memory import MemoryManager
+from src.core.router import QueryRouter
+from src.core.websearch import WebSearch
+
+DOCUMENTS = [
+    "Refund policy: customers may return products within 30 days for a full refund.",
+    "The contract termination clause requires 60 days written notice from either party.",
+    "The annual report lists revenue of 12 million and three key findings on growth.",
+    "Warranty terms in the manual cover parts and labour for two years.",
+    "Meeting notes action items: update the roadmap, hire two engineers, review the budget.",
+    "Section 3 requirements: encryption at rest, audit logging, and single sign-on.",
+]
+
+QUESTIONS = {
+    "RAG": [
+        "What does the document say about the refund policy?",
+        "What is the termination clause in the contract?",
+        "What revenue does the annual report list?",
+        "What are the warranty terms in the manual?",
+        "What are the action items from the meeting notes?",
+        "Which requirements are listed in section 3?",
+    ],
+    "WEB": [
+        "What is the latest news about the election?",
+        "Current price of bitcoin right now?",
+        "Who won the match last night?",
+        "Today's headlines in technology?",
+    ],
+    "CHAT": [
+        "Tell me a joke about cats.",
+        "Write a short poem about the sea.",
+        "Can you explain recursion simply?",
+        "Give me tips for a job interview.",
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-ms", type=float, default=300.0)
+    parser.add_argument("--tavily-ms", type=float, default=600.0)
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    llm_server, llm_url = start_llm_server(FakeLLMConfig(latency_ms=args.llm_ms, sigma=0.05, tail=0.0, seed=5))
+    tavily_server, tavily_url = start_tavily_server(FakeTavilyConfig(latency_ms=args.tavily_ms))
+    pool = LLMPool(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, base_url=llm_url, hedge=False)
+
+    embeddings = HashingEmbeddings()
+    memory = MemoryManager(embedding_model=embeddings)
+    memory.ingest_docs([Document(page_content=text, metadata={"source": "handbook.pdf", "page": i})
+                        for i, text in enumerate(DOCUMENTS)])
+
+    results = {}
+    for mode in ("probing", "routed"):
+        router = QueryRouter(embeddings) if mode == "routed" else None
+        # Speculation off: it hides latency but adds calls, which is what this measures.
+        agent = AgentBrain("gsk_fake_key", "tvly-fake-key", memory, llm_pool=pool,
+                           web_search=WebSearch(api_base_url=tavily_url), speculative=False, router=router)
+        per_route = {}
+        for expected, questions in QUESTIONS.items():
+            # The fake model only finds answers in the documents for document questions.
+            llm_server.config.rag_answer = "The handbook covers this." if expected == "RAG" else "MISSING_INFO"
+            calls, latencies, correct = [], [], 0
+            for question in questions:
+                before = llm_server.config.counts["requests"]
+                started = time.perf_counter()
+                _, _, tool = agent.ask(question)
+                latencies.append(time.perf_counter() - started)
+                calls.append(llm_server.config.counts["requests"] - before)
+                correct += tool == expected
+            per_route[expected] = {
+                "llm_calls": round(statistics.mean(calls), 2),
+                "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+                "correct_tool": f"{correct}/{len(questions)}",
+            }
+        total = sum(len(questions) for questions in QUESTIONS.values())
+        results[mode] = {
+            "llm_calls_per_question": round(
+                sum(per_route[route]["llm_calls"] * len(QUESTIONS[route]) for route in QUESTIONS) / total, 2),
+            "routes": per_route,
+        }
+
+    llm_server.shutdown()
+    tavily_server.shutdown()
+
+    report = {"llm_ms": args.llm_ms, "tavily_ms": args.tavily_ms, "modes": results}
+    for mode, result in results.items():
+        print(f"{mode:>7}: {result['llm_calls_per_question']} LLM calls/question")
+        for route, stats in result["routes"].items():
+            print(f"         {route:<4} calls {stats['llm_calls']}, mean {stats['mean_ms']} ms, "
+                  f"tool {stats['correct_tool']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+End-to-end latency of web-routed questions through AgentBrain.ask, with and
+without speculative web prefetching, against the local fake LLM and Tavily
+servers. Documents never contain the answer (RAG replies MISSING_INFO), so
+every question falls through to the web path.
+
+Usage:
+    python -m benchmarks.bench_speculative [--questions 10] [--llm-ms 400] [--tavily-ms 600] [--json out.json]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from langchain_core.documents import Document
+
+from benchmarks.fake_llm_server import FakeLLMConfig, start_server as start_llm_server
+from benchmarks.fake_tavily_server import FakeTavilyConfig, start_server as start_tavily_server
+from src.core.agent import AgentBrain
+from src.core.llm import LLMPool
+from src.core.websearch import WebSearch
+
+
+class StaticMemory:
+    """Stands in for MemoryManager: always returns the same unrelated chunks."""
+
+    vector_store = True
+
+    def search(self, query, k=5, score_threshold=None):
+        return [(Document(page_content=f"Archived policy note {i}.", metadata={"source": "notes.pdf", "page": i}), 0.9)
+                for i in range(k)]
+
+    def filter_relevant(self, results):
+        return results
+
+    def search_summaries(self, query, k=5):
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--llm-ms", type=float, default=400.0)
+    parser.add_argument("--tavily-ms", type=float, default=600.0)
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    llm_server, llm_url = start_llm_server(FakeLLMConfig(latency_ms=args.llm_ms, sigma=0.05, tail=0.0, seed=3))
+    tavily_server, tavily_url = start_tavily_server(FakeTavilyConfig(latency_ms=args.tavily_ms))
+    pool = LLMPool(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, base_url=llm_url, hedge=False)
+
+    results = {}
+    for mode, speculative in (("sequential", False), ("speculative", True)):
+        # A fresh cache per mode, and distinct questions, so every search really goes out.
+        agent = AgentBrain("gsk_fake_key", "tvly-fake-key", StaticMemory(), llm_pool=pool,
+                           web_search=WebSearch(api_base_url=tavily_url), speculative=speculative)
+        latencies = []
+        tools = set()
+        for i in range(args.questions):
+            started = time.perf_counter()
+            _, _, tool = agent.ask(f"What is the latest {mode} price of item {i}?")
+            latencies.append(time.perf_counter() - started)
+            tools.add(tool)
+        results[mode] = {
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1),
+            "tools": sorted(tools),
+        }
+
+    llm_server.shutdown()
+    tavily_server.shutdown()
+
+    report = {
+        "questions": args.questions,
+        "llm_ms": args.llm_ms,
+        "tavily_ms": args.tavily_ms,
+        "speedup": round(results["sequential"]["mean_ms"] / results["speculative"]["mean_ms"], 2),
+        "modes": results,
+    }
+    for mode, result in results.items():
+        print(f"{mode:>11}: mean {result['mean_ms']} ms, p50 {result['p50_ms']} ms, max {result['max_ms']} ms "
+              f"(tools: {', '.join(result['tools'])})")
+    print(f"    speedup: {report['speedup']}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compares chunking throughput of LangChain's RecursiveCharacterTextSplitter
+against OffsetTextSplitter on a fixed synthetic corpus, and checks that both
+produce identical chunks.
+
+Usage:
+    python -m benchmarks.bench_splitter [--pages 400] [--chunk-size 1000] [--json out.json]
+"""
+import argparse
+import json
+import random
+import time
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.core.splitter import OffsetTextSplitter
+
+WORDS = (
+    "policy report revenue quarter growth risk compliance audit customer market "
+    "analysis strategy the of and to in for with on by data model system results"
+).split()
+
+
+def build_corpus(pages, seed=42):
+    """Text-heavy pages: paragraphs of sentences, with some long unbroken lines."""
+    rng = random.Random(seed)
+    documents = []
+    for page in range(pages):
+        paragraphs = []
+        for _ in range(rng.randint(4, 12)):
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+                for _ in range(rng.randint(2, 9))
+            ]
+            separator = "\n" if rng.random() < 0.3 else " "
+            paragraphs.append(separator.join(sentences))
+        documents.append(Document(page_content="\n\n".join(paragraphs), metadata={"source": "bench.pdf", "page": page}))
+    return documents
+
+
+def time_splitter(splitter, documents, repeats):
+    best = float("inf")
+    chunks = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        chunks = splitter.split_documents(documents)
+        best = min(best, time.perf_counter() - started)
+    return chunks, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    documents = build_corpus(args.pages)
+    corpus_bytes = sum(len(doc.page_content.encode("utf-8")) for doc in documents)
+
+    splitters = {
+        "recursive": RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap),
+        "offset": OffsetTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap),
+    }
+    results = {}
+    outputs = {}
+    for name, splitter in splitters.items():
+        chunks, seconds = time_splitter(splitter, documents, args.repeats)
+        outputs[name] = [chunk.page_content for chunk in chunks]
+        results[name] = {
+            "chunks": len(chunks),
+            "seconds": round(seconds, 4),
+            "chunks_per_second": round(len(chunks) / seconds, 1),
+            "mb_per_second": round(corpus_bytes / seconds / (1024 * 1024), 2),
+        }
+
+    report = {
+        "pages": args.pages,
+        "corpus_bytes": corpus_bytes,
+        "chunk_size": args.chunk_size,
+        "chunk_overlap": args.chunk_overlap,
+        "identical_chunks": outputs["recursive"] == outputs["offset"],
+        "speedup": round(results["recursive"]["seconds"] / results["offset"]["seconds"], 2),
+        "splitters": results,
+    }
+
+    for name, result in results.items():
+        print(f"{name:>10}: {result['chunks']} chunks in {result['seconds']:.3f}s "
+              f"({result['chunks_per_second']:,.0f} chunks/s, {result['mb_per_second']} MB/s)")
+    print(f"   speedup: {report['speedup']}x, identical chunks: {report['identical_chunks']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
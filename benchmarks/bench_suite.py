@@ -0,0 +1,282 @@
+"""
+End-to-end offline benchmark suite: DocumentProcessor, MemoryManager and
+AgentBrain on a synthetic PDF corpus, with the fake LLM and Tavily servers
+standing in for the network. Reports
+
+  - ingest: parse+split and embed+index chunks/sec for the PDF corpus,
+  - search: queries/sec and latency at several corpus sizes,
+  - ask: end-to-end latency percentiles (and per-stage spans) for a mix of
+    document, web and chat questions,
+  - peak RSS after each phase,
+
+and writes everything to a JSON file. Pass a previous file as --baseline to
+print the relative change of every metric.
+
+Embeddings default to the hashed bag-of-words stand-in so the suite runs
+offline in seconds; --embeddings torch/onnx/onnx-int8 uses the real model.
+
+Usage:
+    python -m benchmarks.bench_suite [--pdfs 20] [--sizes 1000,10000,50000] [--llm-ms 300]
+                                     [--json bench_suite.json] [--baseline old.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+
+from langchain_core.documents import Document
+
+from benchmarks.fake_embeddings import HashingEmbeddings
+from benchmarks.fake_llm_server import FakeLLMConfig, start_server as start_llm_server
+from benchmarks.fake_tavily_server import FakeTavilyConfig, start_server as start_tavily_server
+from src.core.agent import AgentBrain
+from src.core.llm import LLMPool
+from src.core.memory import MemoryManager
+from src.core.processing import DocumentProcessor, get_embeddings
+from src.core.router import QueryRouter
+from src.core.tracing import Tracer
+from src.core.websearch import WebSearch
+
+WORDS = (
+    "policy report revenue quarter growth risk compliance audit customer market "
+    "analysis strategy the of and to in for with on by data model system results"
+).split()
+TOPICS = ("budget", "deadline", "owner", "supplier", "warranty", "headcount", "region", "licence")
+
+WEB_QUESTIONS = (
+    "What is the latest news about interest rates?",
+    "Current price of gold today?",
+    "Recent headlines about electric cars this week?",
+)
+CHAT_QUESTIONS = (
+    "Tell me a joke about accountants.",
+    "Write a short poem about spreadsheets.",
+    "Can you explain recursion simply?",
+)
+
+
+class SyntheticUpload(io.BytesIO):
+    """Quacks like a Streamlit UploadedFile: getbuffer(), name and type."""
+
+    def __init__(self, data, name, mime_type="application/pdf"):
+        super().__init__(data)
+        self.name = name
+        self.type = mime_type
+
+
+def page_text(rng, pdf, page):
+    """Filler paragraphs plus one fact per page that a document question can target."""
+    topic = TOPICS[(pdf + page) % len(TOPICS)]
+    fact = f"The {topic} of project {pdf}x{page} is recorded as item {rng.randint(100, 999)}."
+    paragraphs = [
+        " ".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+                 for _ in range(rng.randint(3, 6)))
+        for _ in range(3)
+    ]
+    paragraphs.insert(rng.randint(0, len(paragraphs)), fact)
+    return "\n\n".join(paragraphs), (pdf, page, topic)
+
+
+def build_pdfs(count, pages, seed=42):
+    """Returns (uploads, facts) for `count` PDFs of `pages` text pages each."""
+    import pymupdf
+
+    rng = random.Random(seed)
+    uploads, facts = [], []
+    for pdf in range(count):
+        with pymupdf.open() as doc:
+            for page in range(pages):
+                text, fact = page_text(rng, pdf, page)
+                doc.new_page().insert_textbox(pymupdf.Rect(50, 50, 545, 792), text, fontsize=9)
+                facts.append(fact)
+            uploads.append(SyntheticUpload(doc.tobytes(), f"report_{pdf:03d}.pdf"))
+    return uploads, facts
+
+
+def synthetic_chunks(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        Document(page_content=page_text(rng, i // 10, i % 10)[0][:1000],
+                 metadata={"source": f"synthetic_{i // 10}.pdf", "page": i % 10})
+        for i in range(count)
+    ]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentiles(seconds):
+    ordered = sorted(seconds)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"mean_ms": round(statistics.mean(ordered) * 1000, 2), "p50_ms": pick(0.50), "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99)}
+
+
+def bench_ingest(embeddings, args):
+    uploads, facts = build_pdfs(args.pdfs, args.pages)
+    processor = DocumentProcessor(chunk_size=args.chunk_size, splitter="offset")
+
+    started = time.perf_counter()
+    splits = []
+    for upload in uploads:
+        splits.extend(processor.process_upload(upload))
+    parse_seconds = time.perf_counter() - started
+
+    memory = MemoryManager(embedding_model=embeddings, storage=args.storage, metric=args.metric)
+    started = time.perf_counter()
+    memory.ingest_docs(splits)
+    index_seconds = time.perf_counter() - started
+
+    result = {
+        "pdfs": len(uploads),
+        "pages": len(facts),
+        "mb": round(sum(len(upload.getvalue()) for upload in uploads) / (1024 * 1024), 2),
+        "chunks": len(splits),
+        "parse_chunks_per_second": round(len(splits) / parse_seconds, 1),
+        "index_chunks_per_second": round(len(splits) / index_seconds, 1),
+        "total_chunks_per_second": round(len(splits) / (parse_seconds + index_seconds), 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    return result, memory, facts
+
+
+def bench_search(embeddings, args):
+    results = {}
+    rng = random.Random(11)
+    for size in args.sizes:
+        memory = MemoryManager(embedding_model=embeddings, storage=args.storage, metric=args.metric)
+        memory.ingest_docs(synthetic_chunks(size))
+        queries = [f"What is the {rng.choice(TOPICS)} of project {rng.randint(0, size // 10)}x{rng.randint(0, 9)}?"
+                   for _ in range(args.queries)]
+        latencies = []
+        started = time.perf_counter()
+        for query in queries:
+            query_started = time.perf_counter()
+            memory.search(query, k=args.k, score_threshold=None)
+            latencies.append(time.perf_counter() - query_started)
+        elapsed = time.perf_counter() - started
+        results[str(size)] = {"qps": round(len(queries) / elapsed, 1), **percentiles(latencies),
+                              "peak_rss_mb": peak_rss_mb()}
+        memory.clear()
+    return results
+
+
+def bench_ask(memory, embeddings, facts, args):
+    llm_server, llm_url = start_llm_server(FakeLLMConfig(
+        latency_ms=args.llm_ms, sigma=0.1, tail=0.0, rag_answer="The report records it as stated.", seed=1,
+    ))
+    tavily_server, tavily_url = start_tavily_server(FakeTavilyConfig(latency_ms=args.tavily_ms))
+    try:
+        pool = LLMPool(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, base_url=llm_url, hedge=False)
+        tracer = Tracer()
+        agent = AgentBrain("gsk_fake_key", "tvly-fake-key", memory, llm_pool=pool,
+                           web_search=WebSearch(api_base_url=tavily_url),
+                           router=QueryRouter(embeddings), tracer=tracer)
+
+        rng = random.Random(3)
+        doc_questions = [f"What is the {topic} of project {pdf}x{page}?" for pdf, page, topic in rng.sample(facts, 4)]
+        questions = [*doc_questions, *WEB_QUESTIONS, *CHAT_QUESTIONS]
+        latencies, tools = [], {}
+        for _ in range(args.rounds):
+            for question in questions:
+                started = time.perf_counter()
+                _, _, tool = agent.ask(question)
+                latencies.append(time.perf_counter() - started)
+                tools[tool] = tools.get(tool, 0) + 1
+        return {
+            "questions": len(latencies),
+            **percentiles(latencies),
+            "tools": tools,
+            "llm_requests": llm_server.config.counts["requests"],
+            "tavily_requests": tavily_server.config.counts["requests"],
+            "stages": tracer.summary(),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        llm_server.shutdown()
+        tavily_server.shutdown()
+
+
+def compare(report, baseline, path=""):
+    """Yields (metric path, old, new, relative change) for every numeric leaf present in both."""
+    for key, value in report.items():
+        if key not in baseline or key == "environment":
+            continue
+        name = f"{path}.{key}" if path else key
+        old = baseline[key]
+        if isinstance(value, dict) and isinstance(old, dict):
+            yield from compare(value, old, name)
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and not isinstance(value, bool) and old:
+            yield name, old, value, (value - old) / old
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Corpus sizes (chunks) for the search phase.")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--storage", default="flat", choices=("flat", "fp16", "sq8"))
+    parser.add_argument("--metric", default="l2", choices=("l2", "ip"))
+    parser.add_argument("--embeddings", default="hashing", choices=("hashing", "torch", "onnx", "onnx-int8"))
+    parser.add_argument("--llm-ms", type=float, default=300.0)
+    parser.add_argument("--tavily-ms", type=float, default=600.0)
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the ask question mix.")
+    parser.add_argument("--json", default="bench_suite.json", help="Where to write the results.")
+    parser.add_argument("--baseline", help="Previous results file to compare against.")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    embeddings = HashingEmbeddings() if args.embeddings == "hashing" else get_embeddings(args.embeddings)
+
+    ingest, memory, facts = bench_ingest(embeddings, args)
+    print(f"ingest: {ingest['chunks']} chunks from {ingest['pdfs']} PDFs, "
+          f"parse {ingest['parse_chunks_per_second']}/s, index {ingest['index_chunks_per_second']}/s")
+    search = bench_search(embeddings, args)
+    for size, result in search.items():
+        print(f"search @ {size:>7} chunks: {result['qps']} q/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms")
+    ask = bench_ask(memory, embeddings, facts, args)
+    print(f"ask: p50 {ask['p50_ms']} ms, p95 {ask['p95_ms']} ms, p99 {ask['p99_ms']} ms "
+          f"({ask['llm_requests']} LLM calls for {ask['questions']} questions)")
+    print(f"peak RSS: {peak_rss_mb()} MB")
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("json", "baseline")},
+        },
+        "ingest": ingest,
+        "search": search,
+        "ask": ask,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    with open(args.json, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"wrote {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        print(f"\nchange vs {args.baseline}:")
+        for name, old, new, change in compare(report, baseline):
+            print(f"  {name:<48} {old:>12} -> {new:<12} {change:+.1%}")
+
+
+if __name__ == "__main__":
+    main()
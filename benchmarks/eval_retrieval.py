@@ -0,0 +1,261 @@
+"""
+Retrieval quality vs speed over a grid of settings. For each chunk size and
+storage mode the corpus is indexed once; every labelled question is then
+searched once at the largest k, and recall@k, MRR and nDCG for every
+(k, score threshold) pair are scored together with NumPy broadcasting.
+Search latency is measured per k. A threshold is applied the way AgentBrain
+applies it: chunks over the threshold are dropped, unless that drops them all.
+
+Labels are JSON lines, one question each, naming the relevant chunks by text
+they contain and/or by where they come from (so labels survive re-chunking):
+
+    {"question": "What is the refund window?", "answers": ["within 30 days"]}
+    {"question": "Who signs the contract?", "sources": [{"source": "contract.pdf", "page": 4}]}
+
+Without --labels, a synthetic PDF corpus with generated questions is used.
+
+Usage:
+    python -m benchmarks.eval_retrieval --docs docs/ --labels labels.jsonl
+        [--chunk-sizes 500,1000,1500] [--k 1,3,5,10] [--thresholds none,1.0,1.5]
+        [--storage flat,sq8] [--sections off,extractive] [--embeddings torch] [--min-recall 0.9]
+        [--json out.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+from src.core.memory import MemoryManager
+from src.core.processing import DocumentProcessor, get_embeddings
+from src.core.sections import ExtractiveSummarizer
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def load_labels(path):
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def synthetic_corpus(pdfs, pages):
+    """Uploads plus one question per page, whose answer is the page's fact sentence."""
+    from benchmarks.bench_suite import build_pdfs
+
+    uploads, facts = build_pdfs(pdfs, pages)
+    labels = [
+        {"question": f"What is the {topic} of project {pdf}x{page}?",
+         "answers": [f"The {topic} of project {pdf}x{page} is recorded"]}
+        for pdf, page, topic in facts
+    ]
+    return uploads, labels
+
+
+def list_documents(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if os.path.isfile(os.path.join(path, name))))
+        else:
+            files.append(path)
+    return files
+
+
+def is_relevant(doc, label):
+    text = _normalize(doc.page_content)
+    if any(_normalize(answer) in text for answer in label.get("answers", ())):
+        return True
+    source = os.path.basename(str(doc.metadata.get("source", "")))
+    page = doc.metadata.get("page")
+    return any(
+        os.path.basename(str(ref["source"])) == source and ref.get("page", page) == page
+        for ref in label.get("sources", ())
+    )
+
+
+def score_grid(relevant, scores, total_relevant, ks, thresholds):
+    """
+    Args:
+        relevant: (questions, max_k) bool, relevance of each ranked result.
+        scores: (questions, max_k) distances (lower is better; negate inner
+            products), inf where fewer results came back.
+        total_relevant: (questions,) relevant chunks in the whole corpus.
+        ks / thresholds: grid values; a threshold of None means no threshold.
+    Returns:
+        Dict of (len(ks), len(thresholds)) arrays: recall, mrr, ndcg, hit_rate, returned.
+    """
+    max_k = relevant.shape[1]
+    k = np.asarray(ks)[:, None, None, None]
+    limit = np.array([np.inf if t is None else t for t in thresholds])[None, :, None, None]
+    rank = np.arange(max_k)[None, None, None, :]
+
+    in_top_k = (rank < k) & np.isfinite(scores)[None, None]
+    under = in_top_k & (scores[None, None] <= limit)
+    # Nothing under the threshold: fall back to the plain top-k results.
+    keep = np.where(under.any(axis=3, keepdims=True), under, in_top_k)
+    hits = keep & relevant[None, None]
+
+    answerable = total_relevant > 0
+    found = hits.sum(axis=3)
+    recall = np.minimum(found / np.maximum(total_relevant, 1), 1.0)
+    first = np.argmax(hits, axis=3)
+    reciprocal_rank = np.where(hits.any(axis=3), 1.0 / (first + 1), 0.0)
+
+    discounts = 1.0 / np.log2(np.arange(max_k) + 2)
+    dcg = (hits * discounts).sum(axis=3)
+    ideal_hits = np.minimum(total_relevant[None, None], np.asarray(ks)[:, None, None])
+    idcg = np.concatenate([[0.0], np.cumsum(discounts)])[ideal_hits]
+    ndcg = np.divide(dcg, idcg, out=np.zeros_like(dcg), where=idcg > 0)
+
+    def mean(values):
+        return values[..., answerable].mean(axis=2) if answerable.any() else np.zeros(values.shape[:2])
+
+    return {
+        "recall": mean(recall),
+        "mrr": mean(reciprocal_rank),
+        "ndcg": mean(ndcg),
+        "hit_rate": mean(hits.any(axis=3).astype(float)),
+        "returned": keep.sum(axis=3).mean(axis=2),
+    }
+
+
+def evaluate(splits, labels, embeddings, storage, metric, ks, thresholds, repeats, sections="off"):
+    summarizer = ExtractiveSummarizer() if sections == "extractive" else None
+    memory = MemoryManager(embedding_model=embeddings, storage=storage, metric=metric, score_threshold="auto",
+                           summarizer=summarizer)
+    started = time.perf_counter()
+    memory.ingest_docs(splits)
+    index_seconds = time.perf_counter() - started
+
+    total_relevant = np.array([sum(is_relevant(doc, label) for doc in splits) for label in labels])
+    max_k = max(ks)
+    relevant = np.zeros((len(labels), max_k), dtype=bool)
+    scores = np.full((len(labels), max_k), np.inf)
+    for row, label in enumerate(labels):
+        for col, (doc, score) in enumerate(memory.search(label["question"], k=max_k, score_threshold=None)):
+            relevant[row, col] = is_relevant(doc, label)
+            scores[row, col] = score if metric == "l2" else -score
+    # "auto" is the threshold calibrated at ingest; inner-product thresholds are negated like the scores.
+    thresholds = [memory.relevance_threshold if t == "auto" else t for t in thresholds]
+    thresholds = [t if t is None or metric == "l2" else -t for t in thresholds]
+
+    latency = {}
+    for k in ks:
+        timings = []
+        for _ in range(repeats):
+            for label in labels:
+                query_started = time.perf_counter()
+                memory.search(label["question"], k=k, score_threshold=None)
+                timings.append(time.perf_counter() - query_started)
+        timings.sort()
+        latency[k] = (timings[len(timings) // 2] * 1000,
+                      timings[min(len(timings) - 1, int(0.95 * len(timings)))] * 1000)
+    memory.clear()
+    grid = score_grid(relevant, scores, total_relevant, ks, thresholds)
+    return grid, latency, index_seconds, int((total_relevant > 0).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", nargs="*", default=[], help="Files or directories to index.")
+    parser.add_argument("--labels", help="Question -> relevant chunk labels (JSON lines).")
+    parser.add_argument("--pdfs", type=int, default=10, help="Synthetic PDFs when no --labels are given.")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--chunk-sizes", default="500,1000,1500")
+    parser.add_argument("--k", default="1,3,5,10")
+    parser.add_argument("--thresholds", default="none,auto,1.0,1.5",
+                        help="Score thresholds in the metric's units; 'none' disables, 'auto' is the calibrated one.")
+    parser.add_argument("--metric", default="l2", choices=("l2", "ip"))
+    parser.add_argument("--storage", default="flat", help="Comma-separated storage modes (flat, fp16, sq8).")
+    parser.add_argument("--sections", default="off",
+                        help="Comma-separated: off (flat search), extractive (section summaries first).")
+    parser.add_argument("--embeddings", default="torch", choices=("torch", "onnx", "onnx-int8", "hashing"))
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the questions per k.")
+    parser.add_argument("--min-recall", type=float, help="Print the fastest setting reaching this recall.")
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    chunk_sizes = [int(value) for value in args.chunk_sizes.split(",")]
+    ks = sorted(int(value) for value in args.k.split(","))
+    thresholds = [
+        None if value.strip().lower() == "none" else "auto" if value.strip().lower() == "auto" else float(value)
+        for value in args.thresholds.split(",")
+    ]
+    storages = [value.strip() for value in args.storage.split(",")]
+    section_modes = [value.strip() for value in args.sections.split(",")]
+
+    if args.labels:
+        labels = load_labels(args.labels)
+        uploads, files = None, list_documents(args.docs)
+    else:
+        uploads, labels = synthetic_corpus(args.pdfs, args.pages)
+        files = None
+    if args.embeddings == "hashing":
+        from benchmarks.fake_embeddings import HashingEmbeddings
+
+        embeddings = HashingEmbeddings()
+    else:
+        embeddings = get_embeddings(args.embeddings)
+
+    rows = []
+    for chunk_size in chunk_sizes:
+        processor = DocumentProcessor(chunk_size=chunk_size, splitter="offset")
+        if uploads is not None:
+            splits = [split for upload in uploads for split in processor.process_upload(upload)]
+        else:
+            splits = processor.process_files(files)
+        for storage, sections in itertools.product(storages, section_modes):
+            grid, latency, index_seconds, answerable = evaluate(
+                splits, labels, embeddings, storage, args.metric, ks, thresholds, args.repeats, sections
+            )
+            for i, k in enumerate(ks):
+                for j, threshold in enumerate(thresholds):
+                    rows.append({
+                        "chunk_size": chunk_size,
+                        "storage": storage,
+                        "sections": sections,
+                        "k": k,
+                        "threshold": threshold,
+                        "chunks": len(splits),
+                        "questions": answerable,
+                        "recall": round(float(grid["recall"][i, j]), 4),
+                        "mrr": round(float(grid["mrr"][i, j]), 4),
+                        "ndcg": round(float(grid["ndcg"][i, j]), 4),
+                        "hit_rate": round(float(grid["hit_rate"][i, j]), 4),
+                        "avg_returned": round(float(grid["returned"][i, j]), 2),
+                        "p50_ms": round(latency[k][0], 3),
+                        "p95_ms": round(latency[k][1], 3),
+                        "index_seconds": round(index_seconds, 3),
+                    })
+
+    print(f"{'chunk':>6} {'storage':>7} {'sections':>10} {'k':>3} {'thresh':>6} {'recall':>7} {'mrr':>6} {'ndcg':>6} "
+          f"{'ctx':>5} {'p50 ms':>8} {'p95 ms':>8}")
+    for row in rows:
+        threshold = "-" if row["threshold"] is None else row["threshold"]
+        print(f"{row['chunk_size']:>6} {row['storage']:>7} {row['sections']:>10} {row['k']:>3} {threshold:>6} {row['recall']:>7} "
+              f"{row['mrr']:>6} {row['ndcg']:>6} {row['avg_returned']:>5} {row['p50_ms']:>8} {row['p95_ms']:>8}")
+
+    best = None
+    if args.min_recall is not None:
+        passing = [row for row in rows if row["recall"] >= args.min_recall]
+        # Cheapest: fastest search, then the least context handed to the LLM.
+        best = min(passing, key=lambda row: (row["p50_ms"], row["avg_returned"]), default=None)
+        if best is None:
+            print(f"\nNo setting reaches recall {args.min_recall}.")
+        else:
+            print(f"\nCheapest setting with recall >= {args.min_recall}: chunk_size={best['chunk_size']}, "
+                  f"storage={best['storage']}, sections={best['sections']}, k={best['k']}, threshold={best['threshold']} "
+                  f"(recall {best['recall']}, p50 {best['p50_ms']} ms, {best['avg_returned']} chunks/answer)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"embeddings": args.embeddings, "rows": rows, "best": best}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Deterministic stand-in for the embedding model, for offline benchmarks:
+hashed bag-of-words vectors, L2-normalized. No model download, and texts
+sharing words land close together, so retrieval and routing behave sensibly.
+"""
+import hashlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashingEmbeddings(Embeddings):
+    """Normalized hashed bag-of-words vectors; deterministic and dependency-free."""
+
+    def __init__(self, dimension=512):
+        self.dimension = dimension
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in "".join(c if c.isalnum() else " " for c in text.lower()).split():
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dimension] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
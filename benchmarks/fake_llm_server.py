@@ -0,0 +1,212 @@
+"""
+Local stand-in for the Groq chat completions API, for offline benchmarks.
+
+Serves POST /openai/v1/chat/completions (the path the Groq SDK calls) with
+OpenAI-format responses. Latency is log-normal with an optional slow tail,
+and the server enforces its own requests-per-minute limit, answering 429
+with Retry-After like the real API. It can also inject random 5xx errors.
+
+Usage:
+    python -m benchmarks.fake_llm_server [--port 8089] [--rpm 120] [--latency-ms 300] [--tail 0.05]
+Then point a client at base_url="http://127.0.0.1:8089".
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+
+class FakeLLMConfig:
+    def __init__(self, latency_ms=300.0, sigma=0.35, tail=0.05, tail_factor=8.0, rpm=None, error_rate=0.0,
+                 reply=None, rag_answer="MISSING_INFO", seed=None, ms_per_1k_prompt_tokens=0.0, failures=(),
+                 failure_retry_after=None):
+        """
+        Args:
+            tail / tail_factor: Fraction of requests that are `tail_factor` times slower.
+            rpm: Requests per rolling minute before answering 429 (None = unlimited).
+            reply: Content of every completion; None answers AgentBrain's prompts
+                plausibly (see agent_reply).
+            rag_answer: What agent_reply answers to document (RAG) prompts.
+            ms_per_1k_prompt_tokens: Extra latency per 1,000 prompt tokens (prompt processing).
+            failures: HTTP statuses (e.g. 429, 503) answered to the first
+                requests, in order, before normal service; for tests.
+            failure_retry_after: Retry-After seconds sent with those failures.
+        """
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.tail = tail
+        self.tail_factor = tail_factor
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.reply = reply
+        self.rag_answer = rag_answer
+        self.ms_per_1k_prompt_tokens = ms_per_1k_prompt_tokens
+        self.failures = deque(failures)
+        self.failure_retry_after = failure_retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0}
+        self.arrivals = []
+
+    def admit(self):
+        """Returns None to serve the request, or the seconds to put in Retry-After."""
+        now = time.monotonic()
+        with self.lock:
+            self.counts["requests"] += 1
+            self.arrivals.append(now)
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if self.rpm is not None and len(self.recent) >= self.rpm:
+                self.counts["rate_limited"] += 1
+                return max(0.1, 60 - (now - self.recent[0]))
+            self.recent.append(now)
+            return None
+
+    def scripted_failure(self):
+        """The next status from `failures`, or None once they are used up."""
+        with self.lock:
+            return self.failures.popleft() if self.failures else None
+
+    def latency(self, prompt_tokens=0):
+        with self.lock:
+            seconds = self.latency_ms / 1000 * self.random.lognormvariate(0, self.sigma)
+            seconds += prompt_tokens / 1000 * self.ms_per_1k_prompt_tokens / 1000
+            if self.random.random() < self.tail:
+                seconds *= self.tail_factor
+            fail = self.random.random() < self.error_rate
+        return seconds, fail
+
+    def count(self, field):
+        with self.lock:
+            self.counts[field] += 1
+
+
+def agent_reply(prompt, rag_answer="MISSING_INFO"):
+    """
+    Canned answers to AgentBrain's prompts: the question rewrite and search
+    query echo the question, RAG answers `rag_answer`, a conversation summary
+    update appends the new user lines, anything else a sentence.
+    """
+    match = re.search(r'Question: "?(.*?)"?\s*$', prompt, re.MULTILINE)
+    question = match.group(1).strip() if match else "question"
+    if "Refined Question:" in prompt or "Search Query:" in prompt:
+        return question
+    if "Answer based ONLY on the Context" in prompt:
+        return rag_answer
+    if "Updated summary:" in prompt:
+        # Conversation summary: the previous summary plus the new user lines, newest kept.
+        previous = re.search(r"Summary so far: (.*)", prompt)
+        previous = previous.group(1).strip() if previous and previous.group(1).strip() != "(empty)" else ""
+        asked = re.findall(r"USER: (.*)", prompt)
+        return " ".join([previous, *(f"Asked: {line}" for line in asked)]).strip()[-800:]
+    return f"Here is a short answer about {question}."
+
+
+def _handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path != COMPLETIONS_PATH:
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+
+            retry_after = config.admit()
+            status = config.scripted_failure()
+            if status is not None:
+                config.count("rate_limited" if status == 429 else "errors")
+                headers = {}
+                if config.failure_retry_after is not None:
+                    headers["retry-after"] = f"{config.failure_retry_after:.2f}"
+                self._send(status, {"error": {"message": f"Scripted {status}", "type": "scripted"}}, headers)
+                return
+            if retry_after is not None:
+                self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                           {"retry-after": f"{retry_after:.2f}"})
+                return
+
+            prompt = "\n".join(str(message.get("content", "")) for message in request.get("messages", []))
+            prompt_tokens = len(prompt) // 4 + 1
+            seconds, fail = config.latency(prompt_tokens)
+            time.sleep(seconds)
+            if fail:
+                config.count("errors")
+                self._send(503, {"error": {"message": "Service unavailable", "type": "server_error"}})
+                return
+
+            reply = config.reply if config.reply is not None else agent_reply(prompt, config.rag_answer)
+            completion_tokens = len(reply) // 4 + 1
+            config.count("ok")
+            self._send(200, {
+                "id": f"chatcmpl-{time.time_ns()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+
+    return Handler
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """Starts the server on a daemon thread; returns (server, base_url). Call server.shutdown() to stop."""
+    config = config or FakeLLMConfig()
+    server = ThreadingHTTPServer((host, port), _handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--tail", type=float, default=0.05)
+    parser.add_argument("--rpm", type=int, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(latency_ms=args.latency_ms, tail=args.tail, rpm=args.rpm, error_rate=args.error_rate)
+    server, url = start_server(config, port=args.port)
+    print(f"Fake LLM server on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(config.counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Local stand-in for the Tavily search API, for offline benchmarks.
+
+Serves POST /search with deterministic results derived from the query,
+after a configurable delay. Point WebSearch(api_base_url=...) or
+TavilyClient(api_base_url=...) at the returned URL.
+
+Usage:
+    python -m benchmarks.fake_tavily_server [--port 8090] [--latency-ms 600]
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTavilyConfig:
+    def __init__(self, latency_ms=600.0, results=5):
+        self.latency_ms = latency_ms
+        self.results = results
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0}
+
+    def search(self, query, max_results):
+        with self.lock:
+            self.counts["requests"] += 1
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:8]
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"Result {i + 1} for {query[:40]} ({digest})",
+                    "url": f"https://example.com/{digest}/{i}",
+                    "content": f"Snippet {i + 1} about {query}. Published this week; figures updated daily.",
+                    "score": round(1.0 - i * 0.1, 2),
+                }
+                for i in range(min(max_results, self.results))
+            ],
+        }
+
+
+def _handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path != "/search":
+                status, body = 404, {"detail": {"error": f"Unknown path {self.path}"}}
+            else:
+                time.sleep(config.latency_ms / 1000)
+                status, body = 200, config.search(request.get("query", ""), request.get("max_results", 5))
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """Starts the server on a daemon thread; returns (server, base_url). Call server.shutdown() to stop."""
+    config = config or FakeTavilyConfig()
+    server = ThreadingHTTPServer((host, port), _handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="fake-tavily", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=600.0)
+    args = parser.parse_args()
+
+    config = FakeTavilyConfig(latency_ms=args.latency_ms)
+    server, url = start_server(config, port=args.port)
+    print(f"Fake Tavily server on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(config.counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Load test for the HTTP API (src/api): concurrent clients send a mix of
+/search, /ask (half of them as server-sent-event streams) and /batch
+requests for a fixed time, at one or more client counts. Reports per
+endpoint the completed and refused (503) requests, latency percentiles and
+throughput, and for streams the time to the first event.
+
+By default the API runs in-process (httpx's ASGI transport) over a real
+MemoryManager with hashed bag-of-words embeddings and AgentBrain, against
+the local fake LLM and Tavily servers, so it needs no network or model
+download. A client count above the ask limit plus its queue shows the
+backpressure: extra requests are refused at once instead of queueing up.
+(In-process, streamed responses arrive whole, so the time to the first
+event equals the full latency; use --url for real streaming.)
+
+--url sends the same load to a running server instead, e.g. against the
+fake backends:
+
+    python -m benchmarks.fake_llm_server --port 8089 --latency-ms 200 &
+    python -m benchmarks.fake_tavily_server --port 8090 --latency-ms 300 &
+    GROQ_API_KEY=gsk_fake TAVILY_API_KEY=tvly-fake GROQ_BASE_URL=http://127.0.0.1:8089 \\
+        TAVILY_BASE_URL=http://127.0.0.1:8090 GROQ_RPM=1000000 GROQ_TPM=1000000000 python -m src.api &
+    python -m benchmarks.load_api --url http://127.0.0.1:8000
+
+Usage:
+    python -m benchmarks.load_api [--clients 8,64] [--seconds 10] [--ask-limit 8] [--ask-queue 16]
+                                  [--url http://127.0.0.1:8000] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.fake_embeddings import HashingEmbeddings
+from benchmarks.fake_llm_server import FakeLLMConfig, start_server as start_llm_server
+from benchmarks.fake_tavily_server import FakeTavilyConfig, start_server as start_tavily_server
+from src.api.app import ApiApp
+from src.core.agent import AgentBrain
+from src.core.llm import LLMPool
+from src.core.memory import MemoryManager
+from src.core.router import QueryRouter
+from src.core.tracing import Tracer
+from src.core.websearch import WebSearch
+
+TOPICS = ("refund policy", "termination clause", "revenue", "warranty terms", "action items", "security requirements")
+WORDS = "policy report customer contract audit budget roadmap review team quarter".split()
+QUESTIONS = [
+    *(f"What does the document say about the {topic}?" for topic in TOPICS),
+    "What is the latest news about interest rates?",
+    "Current price of gold today?",
+    "Tell me a joke about accountants.",
+    "Can you explain recursion simply?",
+]
+# Relative frequency of each request kind.
+MIX = {"search": 5, "ask": 2, "ask_stream": 2, "batch": 1}
+
+
+def corpus_files(files, paragraphs, seed=3):
+    rng = random.Random(seed)
+    documents = []
+    for number in range(files):
+        lines = []
+        for paragraph in range(paragraphs):
+            topic = TOPICS[(number + paragraph) % len(TOPICS)]
+            filler = " ".join(rng.choice(WORDS) for _ in range(60))
+            lines.append(f"The {topic} of unit {number}-{paragraph} is item {rng.randint(100, 999)}. {filler}.")
+        documents.append({"name": f"handbook_{number:03d}.txt", "text": "\n\n".join(lines)})
+    return documents
+
+
+async def ingest(client, files):
+    response = await client.post("/ingest", json={"files": files, "chunk_size": 800})
+    response.raise_for_status()
+    job_id = response.json()["job"]["id"]
+    while True:
+        status = (await client.get(f"/jobs/{job_id}")).json()
+        if status["state"] not in ("queued", "running"):
+            return status
+        await asyncio.sleep(0.1)
+
+
+async def request(client, kind, rng):
+    """Returns (status, seconds, seconds to first event or None, Retry-After or None)."""
+    started = time.perf_counter()
+    if kind == "search":
+        response = await client.post("/search", json={"query": rng.choice(QUESTIONS), "k": 5})
+    elif kind == "ask":
+        response = await client.post("/ask", json={"question": rng.choice(QUESTIONS), "k": 5})
+    elif kind == "batch":
+        response = await client.post("/batch", json={"questions": rng.sample(QUESTIONS, 3), "k": 5})
+        if response.status_code == 200 and any("error" in item for item in response.json()["results"]):
+            return 503, time.perf_counter() - started, None, 1.0
+    else:
+        first_event, status = None, None
+        async with client.stream("POST", "/ask", json={"question": rng.choice(QUESTIONS), "stream": True}) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event:") and first_event is None:
+                    first_event = time.perf_counter() - started
+                if line == "event: error":
+                    status = 500
+        return status or response.status_code, time.perf_counter() - started, first_event, _retry_after(response)
+    return response.status_code, time.perf_counter() - started, None, _retry_after(response)
+
+
+def _retry_after(response):
+    value = response.headers.get("retry-after")
+    return float(value) if value else None
+
+
+async def run_phase(client, clients, seconds, seed, backoff_cap):
+    records = defaultdict(list)
+    deadline = time.perf_counter() + seconds
+    kinds, weights = list(MIX), list(MIX.values())
+
+    async def worker(number):
+        rng = random.Random(seed * 1000 + number)
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            try:
+                status, latency, first_event, retry_after = await request(client, kind, rng)
+            except httpx.HTTPError as error:
+                status, latency, first_event, retry_after = type(error).__name__, 0.0, None, None
+            records[kind].append((status, latency, first_event))
+            if retry_after:
+                # A well-behaved client backs off as told (capped, so the phase stays short).
+                await asyncio.sleep(min(retry_after, backoff_cap))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    summary = {}
+    for kind in kinds:
+        rows = records[kind]
+        ok = sorted(seconds for status, seconds, _ in rows if status == 200)
+        first_events = sorted(first for status, _, first in rows if status == 200 and first is not None)
+        summary[kind] = {
+            "requests": len(rows),
+            "ok": len(ok),
+            "rejected_503": sum(1 for status, _, _ in rows if status == 503),
+            "errors": sum(1 for status, _, _ in rows if status not in (200, 503)),
+            "ok_per_second": round(len(ok) / elapsed, 1),
+            "p50_ms": round(statistics.median(ok) * 1000, 1) if ok else None,
+            "p95_ms": round(ok[max(0, int(len(ok) * 0.95) - 1)] * 1000, 1) if ok else None,
+            "p99_ms": round(ok[max(0, int(len(ok) * 0.99) - 1)] * 1000, 1) if ok else None,
+        }
+        if first_events:
+            summary[kind]["first_event_p50_ms"] = round(statistics.median(first_events) * 1000, 1)
+    return summary
+
+
+async def run(args, client):
+    if args.files:
+        job = await ingest(client, corpus_files(args.files, args.paragraphs))
+        print(f"ingest: {job['state']} in {job['elapsed_seconds']} s, {job.get('result')}")
+    results = {}
+    for clients in args.clients:
+        results[clients] = await run_phase(client, clients, args.seconds, clients, args.backoff_cap)
+        print(f"\n{clients} clients:")
+        for kind, row in results[clients].items():
+            first = f", first event p50 {row['first_event_p50_ms']} ms" if "first_event_p50_ms" in row else ""
+            print(f"  {kind:>10}: {row['ok']}/{row['requests']} ok ({row['ok_per_second']}/s), "
+                  f"{row['rejected_503']} refused, {row['errors']} errors, "
+                  f"p50 {row['p50_ms']} ms, p95 {row['p95_ms']} ms, p99 {row['p99_ms']} ms{first}")
+    health = (await client.get("/health")).json()
+    return results, health
+
+
+def build_app(args):
+    llm_server, llm_url = start_llm_server(FakeLLMConfig(
+        latency_ms=args.llm_ms, sigma=0.1, tail=0.0, seed=4,
+        rag_answer="According to the documents, the item is listed in the handbook.",
+    ))
+    tavily_server, tavily_url = start_tavily_server(FakeTavilyConfig(latency_ms=args.tavily_ms))
+    pool = LLMPool(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, base_url=llm_url, hedge=False,
+                   max_workers=256, max_connections=256)
+    embeddings = HashingEmbeddings()
+    memory = MemoryManager(embedding_model=embeddings)
+    agent = AgentBrain("gsk_fake_key", "tvly-fake-key", memory, llm_pool=pool,
+                       web_search=WebSearch(api_base_url=tavily_url), router=QueryRouter(embeddings),
+                       tracer=Tracer())
+    app = ApiApp(agent, memory, ask_limit=args.ask_limit, ask_queue=args.ask_queue,
+                 search_limit=args.search_limit, search_queue=args.search_queue, queue_timeout=args.queue_timeout)
+    return app, (llm_server, tavily_server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=lambda value: [int(part) for part in value.split(",")], default=[8, 64])
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each client count.")
+    parser.add_argument("--files", type=int, default=20, help="Synthetic text files ingested first (0 skips).")
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--url", help="Load a running API server instead of an in-process one.")
+    parser.add_argument("--llm-ms", type=float, default=200.0)
+    parser.add_argument("--tavily-ms", type=float, default=300.0)
+    parser.add_argument("--ask-limit", type=int, default=8)
+    parser.add_argument("--ask-queue", type=int, default=16)
+    parser.add_argument("--search-limit", type=int, default=16)
+    parser.add_argument("--search-queue", type=int, default=128)
+    parser.add_argument("--queue-timeout", type=float, default=10.0)
+    parser.add_argument("--backoff-cap", type=float, default=2.0, help="Longest Retry-After a client honors.")
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    servers = ()
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120.0,
+                                   limits=httpx.Limits(max_connections=max(args.clients) * 2))
+    else:
+        app, servers = build_app(args)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api", timeout=120.0)
+
+    async def session():
+        async with client:
+            return await run(args, client)
+
+    results, health = asyncio.run(session())
+    for server in servers:
+        server.shutdown()
+    print(f"\nlimits: {json.dumps(health['limits'])}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"args": vars(args), "clients": results, "health": health}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Stress test for MemoryManager's concurrency model: many reader threads call
+search, search_by_vector, search_summaries and documents() while one writer
+thread keeps changing the index (ingest_docs, load_shared with reused and
+dropped files, clear).
+
+Every write adds or removes whole "generations" of chunks, so each snapshot a
+reader can see holds complete generations only. Readers check that:
+
+  - no call raises (e.g. a store swapped to None mid-query),
+  - every result is a Document (not a docstore miss), with sorted scores,
+  - documents() never shows part of a generation (a half-built index).
+
+Reader throughput and latency are reported without and with the writer, so
+it is visible whether reads wait for writes (reads after a clear() hit an
+empty index and are nearly free, which lifts the second phase's reads/s).
+Exits non-zero on any failure.
+
+Usage:
+    python -m benchmarks.stress_memory [--readers 8] [--seconds 5] [--chunks 300] [--storage flat]
+                                       [--sections] [--json out.json]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+
+from langchain_core.documents import Document
+
+from benchmarks.fake_embeddings import HashingEmbeddings
+from src.core.memory import MemoryManager
+from src.core.registry import CorpusRegistry
+from src.core.sections import ExtractiveSummarizer
+
+# Back-to-back ingests append to the manager's own store in place; an ingest
+# after load_shared copies the registry's store instead.
+WRITE_CYCLE = ("ingest_docs", "ingest_docs", "load_shared", "ingest_docs", "load_shared", "clear")
+WORDS = "policy report revenue quarter growth risk audit customer market strategy data model results".split()
+
+
+def generation(number, chunks, rng):
+    content_hash = f"gen-{number}"
+    return [
+        Document(
+            page_content=" ".join(rng.choice(WORDS) for _ in range(40)) + f" generation {number} chunk {i}",
+            metadata={"source": f"{content_hash}.pdf", "content_hash": content_hash, "generation": number,
+                      "page": i // 4},
+        )
+        for i in range(chunks)
+    ]
+
+
+def check_results(results):
+    if any(not isinstance(doc, Document) for doc, _ in results):
+        return "docstore miss"
+    scores = [score for _, score in results]
+    if scores != sorted(scores) and scores != sorted(scores, reverse=True):
+        return "unsorted scores"
+    return None
+
+
+def check_documents(documents, chunks):
+    counts = Counter(doc.metadata.get("generation") for doc in documents)
+    partial = {number: count for number, count in counts.items() if count != chunks}
+    return f"partial generations {partial}" if partial else None
+
+
+def reader(memory, queries, vectors, stop, chunks, seed, report):
+    rng = random.Random(seed)
+    latencies, failures, operations = [], [], Counter()
+    while not stop.is_set():
+        operation = rng.choices(("search", "search_by_vector", "search_summaries", "documents"), (8, 8, 2, 1))[0]
+        started = time.perf_counter()
+        try:
+            if operation == "search":
+                problem = check_results(memory.search(rng.choice(queries), k=5))
+            elif operation == "search_by_vector":
+                problem = check_results(memory.search_by_vector(rng.choice(vectors), k=5))
+            elif operation == "search_summaries":
+                problem = check_results(memory.search_summaries(rng.choice(queries), k=3))
+            else:
+                problem = check_documents(memory.documents(), chunks)
+        except Exception as error:
+            problem = f"{type(error).__name__}: {error}"
+        latencies.append(time.perf_counter() - started)
+        operations[operation] += 1
+        if problem:
+            failures.append(f"{operation}: {problem}")
+    report(latencies, failures, operations)
+
+
+def writer(memory, registry, stop, chunks, rng, report):
+    latencies, failures, operations = [], [], Counter()
+    number, live = 0, [0]
+    while not stop.is_set():
+        operation = WRITE_CYCLE[number % len(WRITE_CYCLE)]
+        number += 1
+        docs = generation(number, chunks, rng)
+        started = time.perf_counter()
+        try:
+            if operation == "ingest_docs":
+                memory.ingest_docs(docs)
+                live.append(number)
+            elif operation == "load_shared":
+                # Keep the newest generation, drop the older ones, add a new one.
+                keep = {f"gen-{kept}" for kept in live[-1:]}
+                memory.load_shared(registry, f"corpus-{number}", lambda docs=docs: docs, keep_sources=keep)
+                live = live[-1:] + [number]
+            else:
+                memory.clear()
+                live = []
+        except Exception as error:
+            failures.append(f"{operation}: {type(error).__name__}: {error}")
+        latencies.append(time.perf_counter() - started)
+        operations[operation] += 1
+    report(latencies, failures, operations)
+
+
+def summarize(latencies, seconds):
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"operations": 0}
+    return {
+        "operations": len(ordered),
+        "per_second": round(len(ordered) / seconds, 1),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[max(0, int(len(ordered) * 0.99) - 1)] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def run_phase(memory, registry, args, with_writer, queries, vectors):
+    stop = threading.Event()
+    lock = threading.Lock()
+    reads, writes = {"latencies": [], "failures": [], "operations": Counter()}, {}
+
+    def collect(target):
+        def report(latencies, failures, operations):
+            with lock:
+                target.setdefault("latencies", []).extend(latencies)
+                target.setdefault("failures", []).extend(failures)
+                target.setdefault("operations", Counter()).update(operations)
+        return report
+
+    threads = [
+        threading.Thread(target=reader, args=(memory, queries, vectors, stop, args.chunks, seed, collect(reads)))
+        for seed in range(args.readers)
+    ]
+    if with_writer:
+        threads.append(threading.Thread(
+            target=writer, args=(memory, registry, stop, args.chunks, random.Random(7), collect(writes))
+        ))
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    result = {"reads": {**summarize(reads["latencies"], args.seconds), "by_operation": dict(reads["operations"]),
+                        "failures": len(reads["failures"]), "failure_examples": reads["failures"][:5]}}
+    if with_writer:
+        result["writes"] = {**summarize(writes["latencies"], args.seconds), "by_operation": dict(writes["operations"]),
+                            "failures": len(writes["failures"]), "failure_examples": writes["failures"][:5]}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each phase.")
+    parser.add_argument("--chunks", type=int, default=300, help="Chunks per generation (one write).")
+    parser.add_argument("--storage", default="flat", choices=("flat", "fp16", "sq8"))
+    parser.add_argument("--sections", action="store_true", help="Build extractive section summaries too.")
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    embeddings = HashingEmbeddings()
+    memory = MemoryManager(embedding_model=embeddings, storage=args.storage,
+                           summarizer=ExtractiveSummarizer() if args.sections else None)
+    registry = CorpusRegistry()
+    memory.ingest_docs(generation(0, args.chunks, rng))
+    queries = [" ".join(rng.sample(WORDS, 3)) for _ in range(200)]
+    vectors = embeddings.embed_documents(queries)
+
+    results = {
+        "readers_only": run_phase(memory, registry, args, False, queries, vectors),
+        "readers_and_writer": run_phase(memory, registry, args, True, queries, vectors),
+    }
+
+    for phase, result in results.items():
+        reads = result["reads"]
+        print(f"{phase:>18}: {reads['per_second']} reads/s, p50 {reads['p50_ms']} ms, p99 {reads['p99_ms']} ms, "
+              f"max {reads['max_ms']} ms, {reads['failures']} failures")
+        if "writes" in result:
+            writes = result["writes"]
+            print(f"{'writer':>18}: {writes['operations']} writes {writes['by_operation']}, "
+                  f"p50 {writes['p50_ms']} ms, {writes['failures']} failures")
+        for example in reads["failure_examples"] + result.get("writes", {}).get("failure_examples", []):
+            print(f"{'':>20}{example}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"args": vars(args), "phases": results}, handle, indent=2)
+
+    failed = sum(result["reads"]["failures"] + result.get("writes", {}).get("failures", 0)
+                 for result in results.values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,24 @@
-import os
-import tempfile
 import io
+import os
 import csv
 import hashlib
+import importlib
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import List
 
 import streamlit as st
 
-from src.core.agent import AgentBrain
-from src.core.memory import MemoryManager
-from src.core.processing import DocumentProcessor
+# Only light modules are imported up front so the key screen paints at once;
+# langchain, FAISS and the embedding model load in the background (see
+# start_warmup) and are imported below the API key gate.
+from src.core.conversations import ConversationStore, new_conversation_id
+from src.core.registry import CorpusRegistry
 from src.ui.layout import setup_page
 from src.ui.visuals import (
     normalize_source_results,
     render_comparison_chart,
+    render_latency_summary,
     render_sidebar_stats,
     render_source_badges,
 )
@@ -27,6 +31,162 @@ TOOL_LABELS = {
     "MIXED": "Routed via Mixed Mode",
 }
 MAX_BATCH_QUESTIONS = 8
+# Chat turns rendered with their insight cards and follow-ups; older ones load a page at a time.
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "20"))
+# Token budget of the chat context sent to the question rewrite: recent turns plus a rolling
+# summary of older ones, updated by the LLM ("llm") or from the turns' first words ("extractive").
+CHAT_MEMORY_TOKENS = int(os.getenv("CHAT_MEMORY_TOKENS", "650"))
+CHAT_SUMMARY = os.getenv("CHAT_SUMMARY", "llm")
+CHAT_MEMORY_REBUILD_MESSAGES = 40
+# Ingestion jobs run at the same time across all sessions.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# SQLite file for conversations, favorites and batch results; unset keeps them in memory.
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH") or ":memory:"
+# "flat" (exact float32), or "fp16"/"sq8" for compact quantized storage.
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "flat")
+# "l2" (squared distance), or "ip" for inner product over normalized vectors (cosine).
+VECTOR_METRIC = os.getenv("VECTOR_METRIC", "l2")
+# Relevance cut-off in the metric's units, or "auto" to calibrate per corpus; unset uses the metric's default.
+SCORE_THRESHOLD = os.getenv("SCORE_THRESHOLD") or None
+if SCORE_THRESHOLD not in (None, "auto"):
+    SCORE_THRESHOLD = float(SCORE_THRESHOLD)
+# Section summaries for two-stage search over large documents: "extractive" (local,
+# default), "llm" (Groq, one call per section at ingest) or "off".
+SECTION_SUMMARIES = os.getenv("SECTION_SUMMARIES", "extractive")
+SECTION_PAGES = int(os.getenv("SECTION_PAGES", "5"))
+# "torch" (default), or "onnx"/"onnx-int8" for the lighter ONNX Runtime backend.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+# Per-key Groq budget shared by all sessions (defaults match the free tier).
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_RPM", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TPM", "12000"))
+# Optional SQLite file so cached web searches survive restarts.
+WEB_CACHE_PATH = os.getenv("WEB_CACHE_PATH") or None
+# Map-reduce answers for corpus-wide summary questions ("0" sends them through top-k retrieval).
+MAP_REDUCE = os.getenv("MAP_REDUCE", "1") != "0"
+# Optional SQLite file so cached map-step notes survive restarts.
+MAP_CACHE_PATH = os.getenv("MAP_CACHE_PATH") or None
+# Decide CHAT/RAG/WEB locally before any LLM call ("0" restores RAG-first probing).
+QUERY_ROUTER = os.getenv("QUERY_ROUTER", "1") != "0"
+# Optional JSONL file receiving every routing decision, for offline tuning.
+ROUTER_LOG_PATH = os.getenv("ROUTER_LOG_PATH") or None
+# Optional JSON-lines file receiving every per-stage timing span.
+TRACE_PATH = os.getenv("TRACE_PATH") or None
+
+
+@st.cache_resource(show_spinner=False)
+def get_corpus_registry() -> CorpusRegistry:
+    """One registry per server process, shared by every session."""
+    return CorpusRegistry()
+
+
+@st.cache_resource(show_spinner=False)
+def get_conversation_store() -> ConversationStore:
+    """Messages, favorites and batch results of every session, paged from SQLite."""
+    return ConversationStore(CONVERSATION_DB_PATH)
+
+
+def get_conversation_id() -> str:
+    """Kept in the URL (?conversation=...), so a reload or bookmark reopens the same chat."""
+    if "conversation_id" not in st.session_state:
+        st.session_state.conversation_id = st.query_params.get("conversation") or new_conversation_id()
+        st.query_params["conversation"] = st.session_state.conversation_id
+    return st.session_state.conversation_id
+
+
+@st.cache_resource(show_spinner=False)
+def get_ingest_queue():
+    """Background ingestion workers shared by every session; jobs outlive a browser disconnect."""
+    from src.core.jobs import JobQueue
+
+    return JobQueue(max_workers=INGEST_WORKERS)
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_pool():
+    """Pooled, rate-limited Groq clients shared by every session."""
+    from src.core.llm import LLMPool
+
+    return LLMPool(requests_per_minute=GROQ_REQUESTS_PER_MINUTE, tokens_per_minute=GROQ_TOKENS_PER_MINUTE)
+
+
+@st.cache_resource(show_spinner=False)
+def get_web_search():
+    """Pooled Tavily sessions and web search caches shared by every session."""
+    from src.core.websearch import WebSearch
+
+    return WebSearch(cache_path=WEB_CACHE_PATH)
+
+
+# Imported on the warm-up thread so they are already loaded once a key is entered.
+WARMUP_MODULES = (
+    "src.core.agent", "src.core.llm", "src.core.memory", "src.core.dedup", "src.core.processing", "src.core.router",
+)
+
+
+def _load_shared_embeddings():
+    for module in WARMUP_MODULES:
+        importlib.import_module(module)
+    from src.core.embeddings import BatchingEmbeddings
+    from src.core.processing import get_embeddings
+
+    embeddings = BatchingEmbeddings(get_embeddings(backend=EMBEDDING_BACKEND, num_threads=EMBEDDING_THREADS))
+    # The first forward pass is much slower than the rest; pay for it here.
+    embeddings.embed_query("warm-up")
+    return embeddings
+
+
+@st.cache_resource(show_spinner=False)
+def _warmup_future() -> Future:
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+    future = executor.submit(_load_shared_embeddings)
+    executor.shutdown(wait=False)
+    return future
+
+
+def start_warmup() -> Future:
+    """Starts loading the shared embedding model (once per process) without blocking the page."""
+    warmup = _warmup_future()
+    if warmup.done() and warmup.exception() is not None:
+        # A failed load (e.g. the model download timed out) is retried rather than cached for the process.
+        _warmup_future.clear()
+        warmup = _warmup_future()
+    return warmup
+
+
+def get_shared_embeddings():
+    """One model per process; concurrent sessions' calls are micro-batched together."""
+    warmup = start_warmup()
+    if not warmup.done():
+        with st.spinner("Loading embedding model..."):
+            return warmup.result()
+    return warmup.result()
+
+
+@st.cache_resource(show_spinner=False)
+def get_map_cache():
+    """Map-step notes of corpus-wide summaries, keyed by content and shared by every session."""
+    from src.core.websearch import TTLCache
+
+    return TTLCache("map_notes", ttl=7 * 24 * 3600, max_entries=4096, path=MAP_CACHE_PATH)
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_router():
+    """Local CHAT/RAG/WEB router over the shared embedding model, or None when disabled."""
+    if not QUERY_ROUTER:
+        return None
+    from src.core.router import QueryRouter
+
+    return QueryRouter(get_shared_embeddings(), log_path=ROUTER_LOG_PATH)
+
+
+@st.cache_resource(show_spinner=False)
+def get_tracer():
+    """Per-stage timing spans of every session, for the latency summary and TRACE_PATH."""
+    from src.core.tracing import Tracer
+
+    return Tracer(path=TRACE_PATH)
 
 
 def make_message_id(prefix: str = "msg") -> str:
@@ -148,11 +308,8 @@ def parse_batch_questions(raw_input: str) -> List[str]:
 
 
 def save_to_favorites(question: str, answer: str, tool: str, insight: str, source_id: str) -> bool:
-    favorites = st.session_state.favorites
-    if any(item.get("source_id") == source_id for item in favorites):
-        return False
-
-    favorites.append(
+    return get_conversation_store().add_favorite(
+        get_conversation_id(),
         {
             "source_id": source_id,
             "question": (question or "Saved Answer").strip(),
@@ -160,9 +317,8 @@ def save_to_favorites(question: str, answer: str, tool: str, insight: str, sourc
             "tool": tool or "CHAT",
             "insight": (insight or "").strip(),
             "saved_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC"),
-        }
+        },
     )
-    return True
 
 
 def _normalize_suggestions(raw_text: str) -> List[str]:
@@ -211,9 +367,13 @@ def _default_followups(tool: str) -> List[str]:
 def generate_followup_suggestions(question: str, answer: str, tool: str) -> List[str]:
     cache_key = f"{tool}|{question[:180]}|{answer[:260]}"
     cache = st.session_state.suggestion_cache
-    if cache_key in cache:
-        return cache[cache_key]
+    with get_tracer().span("suggestions", tool=tool, cache_hit=cache_key in cache):
+        if cache_key in cache:
+            return cache[cache_key]
+        return _generate_followup_suggestions(question, answer, tool, cache_key, cache)
+
 
+def _generate_followup_suggestions(question: str, answer: str, tool: str, cache_key: str, cache: dict) -> List[str]:
     defaults = _default_followups(tool)
     suggestions = []
     prompt = f"""
@@ -265,9 +425,13 @@ def _default_insight(answer: str, tool: str) -> str:
 def generate_insight_card(question: str, answer: str, tool: str) -> str:
     cache_key = f"{tool}|{question[:180]}|{answer[:260]}"
     cache = st.session_state.insight_cache
-    if cache_key in cache:
-        return cache[cache_key]
+    with get_tracer().span("insight", tool=tool, cache_hit=cache_key in cache):
+        if cache_key in cache:
+            return cache[cache_key]
+        return _generate_insight_card(question, answer, tool, cache_key, cache)
 
+
+def _generate_insight_card(question: str, answer: str, tool: str, cache_key: str, cache: dict) -> str:
     prompt = f"""
 Create a concise executive insight card from this answer.
 Use exactly this markdown structure:
@@ -335,6 +499,21 @@ def render_followup_buttons(suggestions: List[str], message_key: str):
                 st.rerun()
 
 
+def get_chat_memory():
+    """The conversation's rolling-summary memory, rebuilt from its stored messages after a reload."""
+    from src.core.chat_memory import ConversationMemory
+
+    conversation_id = get_conversation_id()
+    if st.session_state.get("chat_memory_id") != conversation_id:
+        messages = get_conversation_store().recent_messages(conversation_id, limit=CHAT_MEMORY_REBUILD_MESSAGES)
+        llm = get_llm_pool().chat_model(groq_api_key, temperature=0) if CHAT_SUMMARY == "llm" else None
+        st.session_state.chat_memory = ConversationMemory.from_messages(
+            messages, llm=llm, recent_tokens=CHAT_MEMORY_TOKENS * 3 // 5, summary_tokens=CHAT_MEMORY_TOKENS * 2 // 5
+        )
+        st.session_state.chat_memory_id = conversation_id
+    return st.session_state.chat_memory
+
+
 def run_batch_questions(questions: List[str], tavily_api_key: str, retrieval_k: int, append_to_chat: bool):
     batch_results = []
     with st.status("Running Batch Q&A...", expanded=True) as status:
@@ -363,8 +542,13 @@ def run_batch_questions(questions: List[str], tavily_api_key: str, retrieval_k:
             batch_results.append(result)
 
             if append_to_chat:
-                st.session_state.messages.append({"role": "user", "content": question})
-                st.session_state.messages.append(
+                store = get_conversation_store()
+                store.append_message(get_conversation_id(), {"role": "user", "content": question})
+                chat_memory = get_chat_memory()
+                chat_memory.add("user", question)
+                chat_memory.add("assistant", answer)
+                store.append_message(
+                    get_conversation_id(),
                     {
                         "message_id": make_message_id("batchchat"),
                         "question": question,
@@ -378,11 +562,15 @@ def run_batch_questions(questions: List[str], tavily_api_key: str, retrieval_k:
 
         status.update(label=f"Batch complete: {len(batch_results)} answers", state="complete", expanded=False)
 
-    st.session_state.batch_results = batch_results
+    get_conversation_store().set_batch_results(get_conversation_id(), batch_results)
 
 
 def run_prompt(prompt: str, tavily_api_key: str, retrieval_k: int):
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    store = get_conversation_store()
+    conversation_id = get_conversation_id()
+    chat_memory = get_chat_memory()
+    store.append_message(conversation_id, {"role": "user", "content": prompt})
+    message_key = f"live_{store.count_messages(conversation_id)}"
     with st.chat_message("user", avatar="🧑‍💻"):
         st.markdown(prompt)
 
@@ -396,7 +584,7 @@ def run_prompt(prompt: str, tavily_api_key: str, retrieval_k: int):
             with st.status("🤔 Thinking...", expanded=True) as status:
                 response, results, tool = st.session_state.agent.ask(
                     prompt,
-                    chat_history=st.session_state.messages,
+                    chat_history=chat_memory,
                     k=retrieval_k,
                     status_container=status,
                 )
@@ -412,8 +600,9 @@ def run_prompt(prompt: str, tavily_api_key: str, retrieval_k: int):
 
         if tool in {"RAG", "MIXED"} and results:
             normalized_results = normalize_source_results(results)
-            render_source_badges(normalized_results)
-            model = st.session_state.memory_manager.get_embedding_model()
+            memory_manager = st.session_state.memory_manager
+            render_source_badges(normalized_results, score_to_similarity=memory_manager.score_to_similarity)
+            model = memory_manager.get_embedding_model()
             scored_results = [(doc, score) for doc, score in normalized_results if score is not None]
             for i, (doc, score) in enumerate(scored_results):
                 render_comparison_chart(
@@ -422,6 +611,8 @@ def run_prompt(prompt: str, tavily_api_key: str, retrieval_k: int):
                     model.embed_query(doc.page_content),
                     model.embed_query(prompt),
                     f"Source {i + 1}",
+                    score_to_similarity=memory_manager.score_to_similarity,
+                    metric=memory_manager.metric,
                 )
             if normalized_results and not scored_results:
                 st.caption("Some sources are web/context snippets, so similarity charts are unavailable for this response.")
@@ -429,12 +620,15 @@ def run_prompt(prompt: str, tavily_api_key: str, retrieval_k: int):
         insight_markdown = ""
         if st.session_state.auto_insights:
             insight_markdown = generate_insight_card(prompt, response, tool)
-            render_insight_card(insight_markdown, f"live_{len(st.session_state.messages)}")
+            render_insight_card(insight_markdown, message_key)
 
         suggestions = generate_followup_suggestions(prompt, response, tool)
-        render_followup_buttons(suggestions, f"live_{len(st.session_state.messages)}")
+        render_followup_buttons(suggestions, message_key)
 
-    st.session_state.messages.append(
+    chat_memory.add("user", prompt)
+    chat_memory.add("assistant", response)
+    store.append_message(
+        conversation_id,
         {
             "message_id": make_message_id("chat"),
             "question": prompt,
@@ -449,6 +643,7 @@ def run_prompt(prompt: str, tavily_api_key: str, retrieval_k: int):
 
 # 1. Setup
 uploaded_files, groq_api_key, tavily_api_key, retrieval_k, chunk_size = setup_page()
+start_warmup()
 
 if not groq_api_key:
     st.markdown(
@@ -464,13 +659,104 @@ if not groq_api_key:
     st.info("Please enter your Groq API key in the sidebar to begin.")
     st.stop()
 
+from src.core.agent import AgentBrain
+from src.core.dedup import ChunkDeduplicator
+from src.core.memory import MemoryManager
+from src.core.processing import DocumentProcessor, EMBEDDING_MODEL_NAME, build_manifest
+from src.core.sections import ExtractiveSummarizer, LLMSummarizer
+
+def submit_ingest_job(manifest, aliases, new_hashes, keep_sources, current_state, chunk_size):
+    """
+    Queues parsing and embedding of `new_hashes` on the ingestion workers. The
+    session's MemoryManager keeps serving its current index until the job
+    swaps the new one in. `aliases` are build_manifest's other names per hash.
+    """
+    memory_manager = st.session_state.memory_manager
+    registry = get_corpus_registry()
+    processor = DocumentProcessor(chunk_size=chunk_size, splitter="offset")
+    fingerprint = CorpusRegistry.fingerprint(
+        manifest, chunk_size, EMBEDDING_MODEL_NAME, storage=VECTOR_STORAGE, metric=VECTOR_METRIC,
+        sections=f"{SECTION_SUMMARIES}/{SECTION_PAGES}",
+    )
+
+    def run(progress):
+        parsing = progress.stage(0.0, 0.3)
+
+        def load_splits():
+            splits = []
+            for done, content_hash in enumerate(new_hashes, start=1):
+                upload = manifest[content_hash]
+                parsing.progress((done - 1) / len(new_hashes), text=f"Parsing {upload.name}...")
+                file_splits = processor.process_upload(upload)
+                for split in file_splits:
+                    split.metadata["content_hash"] = content_hash
+                    if content_hash in aliases:
+                        split.metadata["aliases"] = list(aliases[content_hash])
+                splits.extend(file_splits)
+            return splits
+
+        built = memory_manager.load_shared(
+            registry, fingerprint, load_splits, status_container=progress.stage(0.3, 1.0), keep_sources=keep_sources
+        )
+        return {"built": built, "state": current_state, "metrics": list(processor.metrics)}
+
+    return get_ingest_queue().submit(
+        get_conversation_id(), f"{len(new_hashes)} new or changed files", run, payload=memory_manager
+    )
+
+
+def render_ingest_progress(job_id: str):
+    job = get_ingest_queue().get(job_id)
+    if job is None:
+        return
+    status = job.status()
+    if not job.active:
+        st.rerun()
+    eta = f" · about {status['eta_seconds']:.0f}s left" if status["eta_seconds"] is not None else ""
+    st.progress(status["progress"], text=f"{status['message']}{eta}")
+    st.caption("Building in the background. Questions are answered from the current documents meanwhile.")
+    if not hasattr(st, "fragment") and st.button("Refresh Progress", use_container_width=True):
+        st.rerun()
+
+
+if hasattr(st, "fragment"):
+    # Polls the job once a second without rerunning the rest of the page.
+    render_ingest_progress = st.fragment(run_every=1.0)(render_ingest_progress)
+
+
+def build_summarizer():
+    if SECTION_SUMMARIES == "llm":
+        return LLMSummarizer(get_llm_pool().chat_model(groq_api_key, temperature=0))
+    if SECTION_SUMMARIES == "extractive":
+        return ExtractiveSummarizer()
+    return None
+
+
 # 2. State Init
+if "ingest_job_id" not in st.session_state:
+    st.session_state.ingest_job_id = None
+if "memory_manager" not in st.session_state:
+    # A reconnecting client picks up the index its conversation's last job built (or is building).
+    resumed_job = get_ingest_queue().latest(get_conversation_id())
+    if resumed_job is not None and resumed_job.payload is not None:
+        st.session_state.memory_manager = resumed_job.payload
+        st.session_state.ingest_job_id = resumed_job.id
 if "memory_manager" not in st.session_state:
-    st.session_state.memory_manager = MemoryManager()
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.memory_manager = MemoryManager(
+        embedding_model=get_shared_embeddings(),
+        deduplicator=ChunkDeduplicator(),
+        storage=VECTOR_STORAGE,
+        metric=VECTOR_METRIC,
+        score_threshold=SCORE_THRESHOLD,
+        summarizer=build_summarizer(),
+        section_pages=SECTION_PAGES,
+    )
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1
 if "processed_state" not in st.session_state:
     st.session_state.processed_state = None
+if "upload_hashes" not in st.session_state:
+    st.session_state.upload_hashes = {}
 if "suggestion_cache" not in st.session_state:
     st.session_state.suggestion_cache = {}
 if "insight_cache" not in st.session_state:
@@ -479,50 +765,63 @@ if "pending_prompt" not in st.session_state:
     st.session_state.pending_prompt = None
 if "auto_insights" not in st.session_state:
     st.session_state.auto_insights = True
-if "batch_results" not in st.session_state:
-    st.session_state.batch_results = []
 if "batch_questions_input" not in st.session_state:
     st.session_state.batch_questions_input = ""
 if "batch_append_to_chat" not in st.session_state:
     st.session_state.batch_append_to_chat = False
-if "favorites" not in st.session_state:
-    st.session_state.favorites = []
 
 # Session tools in sidebar
 st.sidebar.markdown('<hr class="soft-divider">', unsafe_allow_html=True)
 st.sidebar.markdown("### Session")
-st.sidebar.caption(f"Messages: {len(st.session_state.messages)}")
+conversation_store = get_conversation_store()
+conversation_id = get_conversation_id()
+message_count = conversation_store.count_messages(conversation_id)
+st.sidebar.caption(f"Messages: {message_count}")
 st.session_state.auto_insights = st.sidebar.toggle(
     "Auto Insight Cards",
     value=st.session_state.auto_insights,
     help="Generate an executive insight card for each assistant response.",
 )
-st.sidebar.download_button(
-    label="Download Chat (.md)",
-    data=build_chat_markdown(st.session_state.messages),
-    file_name=f"agentic_chat_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-    mime="text/markdown",
-    use_container_width=True,
-    disabled=not st.session_state.messages,
-)
-
-st.sidebar.markdown('<hr class="soft-divider">', unsafe_allow_html=True)
-st.sidebar.markdown("### Favorites Library")
-st.sidebar.caption(f"Saved answers: {len(st.session_state.favorites)}")
-if st.session_state.favorites:
+# Exports are built only when asked for, not on every rerun.
+if st.sidebar.button("Prepare Chat Export", use_container_width=True, disabled=not message_count):
+    st.session_state.chat_export = (message_count, build_chat_markdown(conversation_store.iter_messages(conversation_id)))
+if st.session_state.get("chat_export", (None,))[0] == message_count:
     st.sidebar.download_button(
-        label="Download Favorites (.md)",
-        data=build_favorites_markdown(st.session_state.favorites),
-        file_name=f"favorites_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+        label="Download Chat (.md)",
+        data=st.session_state.chat_export[1],
+        file_name=f"agentic_chat_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
         mime="text/markdown",
         use_container_width=True,
     )
+if st.sidebar.button("New Conversation", use_container_width=True, disabled=not message_count):
+    st.session_state.conversation_id = new_conversation_id()
+    st.query_params["conversation"] = st.session_state.conversation_id
+    st.session_state.history_pages = 1
+    st.rerun()
+
+st.sidebar.markdown('<hr class="soft-divider">', unsafe_allow_html=True)
+st.sidebar.markdown("### Favorites Library")
+favorite_count = conversation_store.count_favorites(conversation_id)
+st.sidebar.caption(f"Saved answers: {favorite_count}")
+if favorite_count:
+    if st.sidebar.button("Prepare Favorites Export", use_container_width=True):
+        st.session_state.favorites_export = (
+            favorite_count, build_favorites_markdown(conversation_store.favorites(conversation_id))
+        )
+    if st.session_state.get("favorites_export", (None,))[0] == favorite_count:
+        st.sidebar.download_button(
+            label="Download Favorites (.md)",
+            data=st.session_state.favorites_export[1],
+            file_name=f"favorites_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+            mime="text/markdown",
+            use_container_width=True,
+        )
     if st.sidebar.button("Clear Favorites", use_container_width=True):
-        st.session_state.favorites = []
+        conversation_store.clear_favorites(conversation_id)
         st.toast("Favorites cleared.")
         st.rerun()
     with st.sidebar.expander("View Saved", expanded=False):
-        for i, item in enumerate(reversed(st.session_state.favorites[-10:]), start=1):
+        for i, item in enumerate(reversed(conversation_store.favorites(conversation_id, limit=10)), start=1):
             st.markdown(f"**{i}. {item.get('question', 'Saved Answer')[:70]}**")
             st.caption(f"{item.get('saved_at', '')} | {TOOL_LABELS.get(item.get('tool', ''), item.get('tool', 'CHAT'))}")
 else:
@@ -564,38 +863,95 @@ if "agent" in st.session_state:
 if "agent" not in st.session_state or force_reinit:
     if force_reinit:
         st.toast("Updating Agent with new keys.")
-    st.session_state.agent = AgentBrain(groq_api_key, tavily_api_key, st.session_state.memory_manager)
+    st.session_state.agent = AgentBrain(
+        groq_api_key,
+        tavily_api_key,
+        st.session_state.memory_manager,
+        llm_pool=get_llm_pool(),
+        web_search=get_web_search(),
+        router=get_query_router(),
+        tracer=get_tracer(),
+        map_reduce=MAP_REDUCE,
+        map_cache=get_map_cache(),
+    )
+
+# 4. Smart ingestion logic (parsing and embedding run as a background job)
+ingest_job = get_ingest_queue().get(st.session_state.ingest_job_id) if st.session_state.ingest_job_id else None
+if ingest_job is not None and not ingest_job.active:
+    st.session_state.ingest_job_id = None
+    if ingest_job.state == "done":
+        st.session_state.processed_state = ingest_job.result["state"]
+        if ingest_job.result["built"]:
+            st.session_state.ingest_metrics = ingest_job.result["metrics"]
+            st.toast("Knowledge base ready.")
+        else:
+            st.toast("♻️ Reusing an index already built for these files.")
+    else:
+        st.sidebar.error(f"Processing failed: {ingest_job.status()['error']}")
+    ingest_job = None
 
-# 4. Smart ingestion logic
 if uploaded_files:
-    current_state = {"files": frozenset({f.name for f in uploaded_files}), "chunk_size": chunk_size}
+    aliases = {}
+    manifest = build_manifest(uploaded_files, hash_cache=st.session_state.upload_hashes, aliases=aliases)
+    current_state = {"files": frozenset(manifest), "chunk_size": chunk_size}
+    if aliases:
+        # Identical bytes are indexed once, under the first upload's name.
+        st.sidebar.caption("Identical files, indexed once: " + "; ".join(
+            f"{', '.join(names)} = {manifest[content_hash].name}" for content_hash, names in aliases.items()
+        ))
 
     if st.session_state.processed_state != current_state:
-        st.sidebar.warning("Pending changes")
-        if st.sidebar.button("Process Files", type="primary", use_container_width=True):
-            processor = DocumentProcessor(chunk_size=chunk_size)
-            with st.status("Building Knowledge Base...", expanded=True) as status:
-                splits = []
-                for file_obj in uploaded_files:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                        tmp.write(file_obj.getbuffer())
-                        tmp_path = tmp.name
-                    try:
-                        splits.extend(processor.process_files([tmp_path]))
-                    finally:
-                        os.remove(tmp_path)
-
-                st.session_state.memory_manager.clear()
-                st.session_state.memory_manager.ingest_docs(splits, status_container=status)
-                st.session_state.processed_state = current_state
-                status.update(label="Ready", state="complete", expanded=False)
-                st.rerun()
+        # Only new or changed files need parsing; chunks of unchanged files are reused.
+        previous_state = st.session_state.processed_state
+        keep_sources = None
+        if previous_state and previous_state["chunk_size"] == chunk_size:
+            keep_sources = previous_state["files"] & current_state["files"]
+        new_hashes = current_state["files"] - (keep_sources or frozenset())
+        removed_count = len(previous_state["files"] - current_state["files"]) if keep_sources is not None else 0
+
+        st.sidebar.warning(
+            f"Pending changes: {len(new_hashes)} new/changed, {removed_count} removed"
+            if keep_sources is not None
+            else "Pending changes"
+        )
+        if ingest_job is not None:
+            with st.sidebar:
+                render_ingest_progress(ingest_job.id)
+        elif st.sidebar.button("Process Files", type="primary", use_container_width=True):
+            job = submit_ingest_job(manifest, aliases, new_hashes, keep_sources, current_state, chunk_size)
+            st.session_state.ingest_job_id = job.id
+            st.rerun()
     else:
         st.sidebar.success("System ready")
+elif ingest_job is not None:
+    with st.sidebar:
+        render_ingest_progress(ingest_job.id)
 
 # 5. UI Stats
-if st.session_state.memory_manager.vector_store:
-    render_sidebar_stats(st.session_state.memory_manager.vector_store.index.ntotal)
+# Read once: a background ingestion job may swap the store in between.
+vector_store = st.session_state.memory_manager.vector_store
+if vector_store:
+    render_sidebar_stats(vector_store.index.ntotal)
+    shared_key = st.session_state.memory_manager.shared_key
+    if shared_key:
+        sessions = get_corpus_registry().refcount(shared_key)
+        st.sidebar.caption(f"Shared index · used by {sessions} session(s)")
+    if st.session_state.get("ingest_metrics"):
+        with st.sidebar.expander("Ingest Metrics", expanded=False):
+            for stats in st.session_state.ingest_metrics:
+                st.caption(stats.summary())
+            st.caption(f"Embedding service: {get_shared_embeddings().metrics.summary()}")
+            calibration = st.session_state.memory_manager.calibration
+            threshold = st.session_state.memory_manager.relevance_threshold
+            if calibration and threshold is not None:
+                st.caption(
+                    f"Relevance threshold ({VECTOR_METRIC}): {threshold:.3f} · calibrated on "
+                    f"{calibration['samples']} chunks: related cosine p50 {calibration['related_p50']:.2f}, "
+                    f"unrelated p95 {calibration['unrelated_p95']:.2f}"
+                )
+            elif threshold is not None:
+                st.caption(f"Relevance threshold ({VECTOR_METRIC}): {threshold:.3f} · fixed")
+render_latency_summary(get_tracer().summary())
 
 # 6. Chat UI
 st.markdown(
@@ -610,32 +966,33 @@ st.markdown(
 )
 st.caption("Model: Llama-3.3-70B via Groq")
 
-if st.session_state.batch_results:
+batch_results = conversation_store.batch_results(conversation_id)
+if batch_results:
     st.markdown("### Batch Q&A Results")
     b1, b2, b3 = st.columns(3)
-    b1.metric("Questions", len(st.session_state.batch_results))
-    rag_count = sum(1 for item in st.session_state.batch_results if item.get("tool") == "RAG")
-    web_count = sum(1 for item in st.session_state.batch_results if item.get("tool") == "WEB")
+    b1.metric("Questions", len(batch_results))
+    rag_count = sum(1 for item in batch_results if item.get("tool") == "RAG")
+    web_count = sum(1 for item in batch_results if item.get("tool") == "WEB")
     b2.metric("Document-Routed", rag_count)
     b3.metric("Web-Routed", web_count)
 
     dl1, dl2 = st.columns(2)
     dl1.download_button(
         "Download Batch Report (.md)",
-        data=build_batch_markdown(st.session_state.batch_results),
+        data=build_batch_markdown(batch_results),
         file_name=f"batch_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
         mime="text/markdown",
         use_container_width=True,
     )
     dl2.download_button(
         "Download Batch Data (.csv)",
-        data=build_batch_csv(st.session_state.batch_results),
+        data=build_batch_csv(batch_results),
         file_name=f"batch_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
         mime="text/csv",
         use_container_width=True,
     )
 
-    for i, item in enumerate(st.session_state.batch_results, start=1):
+    for i, item in enumerate(batch_results, start=1):
         with st.expander(f"{i}. {item['question']}", expanded=False):
             st.markdown(item["answer"])
             batch_source_id = item.get(
@@ -660,7 +1017,7 @@ if st.session_state.batch_results:
                 render_insight_card(item["insight"], f"batch_{i}")
             render_followup_buttons(item.get("suggestions", []), f"batch_{i}")
 
-if not st.session_state.messages:
+if not message_count:
     st.markdown("**Try prompts like:**")
     c1, c2, c3 = st.columns(3)
     with c1:
@@ -670,7 +1027,14 @@ if not st.session_state.messages:
     with c3:
         st.code("Compare source evidence and highlight conflicts.")
 
-for idx, msg in enumerate(st.session_state.messages):
+# Only the latest turns are loaded; insight cards and follow-ups only for the last HISTORY_WINDOW.
+shown_count = min(message_count, st.session_state.history_pages * HISTORY_WINDOW)
+if message_count > shown_count:
+    if st.button(f"Show earlier messages ({message_count - shown_count} more)", use_container_width=True):
+        st.session_state.history_pages += 1
+        st.rerun()
+for idx, msg in enumerate(conversation_store.recent_messages(conversation_id, shown_count),
+                          start=message_count - shown_count):
     with st.chat_message(msg["role"], avatar="🧑‍💻" if msg["role"] == "user" else "🧠"):
         st.markdown(msg["content"])
         if msg.get("role") == "assistant":
@@ -690,8 +1054,9 @@ for idx, msg in enumerate(st.session_state.messages):
                     )
                     st.toast("Saved to favorites." if saved else "Already in favorites.")
                     st.rerun()
-            render_insight_card(msg.get("insight", ""), f"history_{idx}")
-            render_followup_buttons(msg.get("suggestions", []), f"history_{idx}")
+            if idx >= message_count - HISTORY_WINDOW:
+                render_insight_card(msg.get("insight", ""), f"history_{idx}")
+                render_followup_buttons(msg.get("suggestions", []), f"history_{idx}")
 
 typed_prompt = st.chat_input("Ask anything...")
 queued_prompt = st.session_state.pending_prompt
@@ -0,0 +1,108 @@
+"""
+Serves the HTTP API (src/api/app.py) with uvicorn, over one MemoryManager
+and AgentBrain shared by every request:
+
+    GROQ_API_KEY=gsk_... python -m src.api [--host 127.0.0.1] [--port 8000]
+
+Run a single worker process: each process would hold its own index.
+Settings come from the same environment variables as the Streamlit app,
+plus the API_* limits below. GROQ_BASE_URL / TAVILY_BASE_URL point the
+service at other endpoints, e.g. the fake servers in benchmarks/.
+"""
+import argparse
+import os
+
+from src.api.app import ApiApp
+
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL") or None
+# Agent calls running at once / waiting for a slot before new ones get 503.
+API_ASK_CONCURRENCY = int(os.getenv("API_ASK_CONCURRENCY", "8"))
+API_ASK_QUEUE = int(os.getenv("API_ASK_QUEUE", "32"))
+API_SEARCH_CONCURRENCY = int(os.getenv("API_SEARCH_CONCURRENCY", "16"))
+API_SEARCH_QUEUE = int(os.getenv("API_SEARCH_QUEUE", "128"))
+# Seconds a request may wait for a slot before it gets 503.
+API_QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "30"))
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "flat")
+VECTOR_METRIC = os.getenv("VECTOR_METRIC", "l2")
+SCORE_THRESHOLD = os.getenv("SCORE_THRESHOLD") or None
+if SCORE_THRESHOLD not in (None, "auto"):
+    SCORE_THRESHOLD = float(SCORE_THRESHOLD)
+SECTION_SUMMARIES = os.getenv("SECTION_SUMMARIES", "extractive")
+SECTION_PAGES = int(os.getenv("SECTION_PAGES", "5"))
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_RPM", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TPM", "12000"))
+WEB_CACHE_PATH = os.getenv("WEB_CACHE_PATH") or None
+MAP_REDUCE = os.getenv("MAP_REDUCE", "1") != "0"
+QUERY_ROUTER = os.getenv("QUERY_ROUTER", "1") != "0"
+TRACE_PATH = os.getenv("TRACE_PATH") or None
+
+
+def build_app():
+    from src.core.agent import AgentBrain
+    from src.core.dedup import ChunkDeduplicator
+    from src.core.embeddings import BatchingEmbeddings
+    from src.core.llm import LLMPool
+    from src.core.memory import MemoryManager
+    from src.core.processing import get_embeddings
+    from src.core.router import QueryRouter
+    from src.core.sections import ExtractiveSummarizer, LLMSummarizer
+    from src.core.tracing import Tracer
+    from src.core.websearch import WebSearch
+
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise SystemExit("Set GROQ_API_KEY to serve the API.")
+    pool = LLMPool(requests_per_minute=GROQ_REQUESTS_PER_MINUTE, tokens_per_minute=GROQ_TOKENS_PER_MINUTE,
+                   base_url=GROQ_BASE_URL)
+    embeddings = BatchingEmbeddings(get_embeddings(backend=EMBEDDING_BACKEND, num_threads=EMBEDDING_THREADS))
+    summarizer = None
+    if SECTION_SUMMARIES == "llm":
+        summarizer = LLMSummarizer(pool.chat_model(groq_api_key, temperature=0))
+    elif SECTION_SUMMARIES == "extractive":
+        summarizer = ExtractiveSummarizer()
+    memory = MemoryManager(
+        embedding_model=embeddings,
+        deduplicator=ChunkDeduplicator(),
+        storage=VECTOR_STORAGE,
+        metric=VECTOR_METRIC,
+        score_threshold=SCORE_THRESHOLD,
+        summarizer=summarizer,
+        section_pages=SECTION_PAGES,
+    )
+    agent = AgentBrain(
+        groq_api_key,
+        os.getenv("TAVILY_API_KEY") or None,
+        memory,
+        llm_pool=pool,
+        web_search=WebSearch(cache_path=WEB_CACHE_PATH, api_base_url=TAVILY_BASE_URL),
+        router=QueryRouter(embeddings) if QUERY_ROUTER else None,
+        tracer=Tracer(path=TRACE_PATH),
+        map_reduce=MAP_REDUCE,
+    )
+    return ApiApp(
+        agent,
+        memory,
+        ask_limit=API_ASK_CONCURRENCY,
+        ask_queue=API_ASK_QUEUE,
+        search_limit=API_SEARCH_CONCURRENCY,
+        search_queue=API_SEARCH_QUEUE,
+        queue_timeout=API_QUEUE_TIMEOUT,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(build_app(), host=args.host, port=args.port, workers=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+import asyncio
+import base64
+import binascii
+import io
+import json
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from src.core import tracing
+from src.core.jobs import QUEUED, RUNNING, JobQueue
+from src.core.processing import DocumentProcessor, build_manifest
+
+# Request bodies above this are refused (413); ingested files travel inside the JSON body.
+MAX_BODY_BYTES = 50 * 1024 * 1024
+# Same cap as the Batch Q&A Lab in the Streamlit app.
+MAX_BATCH_QUESTIONS = 8
+MAX_K = 20
+# An SSE comment is sent this often while an answer is being worked on, so proxies keep the stream open.
+SSE_KEEPALIVE_SECONDS = 15.0
+
+JSON_HEADERS = [(b"content-type", b"application/json")]
+SSE_HEADERS = [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or []
+
+
+class Overloaded(HTTPError):
+    def __init__(self, name, retry_after):
+        super().__init__(503, f"Too many {name} requests; retry later.", [(b"retry-after", str(retry_after).encode())])
+
+
+class ConcurrencyLimiter:
+    """
+    Admission control for one kind of request: at most `limit` run at once
+    and at most `queue` wait for a slot. A request arriving to a full queue,
+    or waiting longer than `timeout` seconds, is refused with 503 and a
+    Retry-After estimate, so overload shows up as fast rejections instead of
+    ever-growing latency and memory.
+    """
+
+    def __init__(self, name, limit, queue, timeout=30.0):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Moving average of how long a request holds its slot, for Retry-After.
+        self.average_seconds = 1.0
+
+    def retry_after(self):
+        return max(1, round(self.average_seconds * (self.waiting + 1) / self.limit))
+
+    @asynccontextmanager
+    async def slot(self):
+        if not self._semaphore.locked():
+            # A free slot is taken without yielding, so the next request already sees it taken.
+            await self._semaphore.acquire()
+        elif self.waiting >= self.queue:
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after())
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise Overloaded(self.name, self.retry_after()) from None
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            self.average_seconds = 0.9 * self.average_seconds + 0.1 * (time.perf_counter() - started)
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "queue": self.queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class _Upload(io.BytesIO):
+    """An ingested file, quacking like a Streamlit UploadedFile: getbuffer(), name and type."""
+
+    def __init__(self, data, name, mime_type=None):
+        super().__init__(data)
+        self.name = name
+        self.type = mime_type
+
+
+class _EventStatus:
+    """Status container (write, progress) whose updates become server-sent events."""
+
+    def __init__(self, loop, events):
+        self.loop = loop
+        self.events = events
+
+    def write(self, text):
+        self._emit("status", {"message": str(text)})
+
+    def progress(self, value, text=None):
+        self._emit("progress", {"progress": round(float(value), 4), "message": text})
+        return self
+
+    def _emit(self, event, data):
+        # Called from the worker thread running the agent.
+        self.loop.call_soon_threadsafe(self.events.put_nowait, (event, data))
+
+
+class ApiApp:
+    """
+    ASGI application exposing one shared MemoryManager and AgentBrain over
+    HTTP (see the API section of the README for the endpoints). No web
+    framework: any ASGI server can run it, see src/api/__main__.py.
+
+    Blocking work (searches, agent calls) runs on a thread pool sized to the
+    concurrency limits; ingestion runs as JobQueue jobs, one at a time, and
+    at most `max_pending_jobs` may be queued or running.
+    """
+
+    def __init__(self, agent, memory_manager, jobs=None, chunk_size=1000, ask_limit=8, ask_queue=32,
+                 search_limit=16, search_queue=128, batch_limit=2, batch_queue=4, queue_timeout=30.0,
+                 max_pending_jobs=8):
+        self.agent = agent
+        self.memory = memory_manager
+        # One worker: writes to the MemoryManager are serialized anyway, and the
+        # check for already-ingested files needs no lock when jobs run in turn.
+        self.jobs = jobs or JobQueue(max_workers=1)
+        self.chunk_size = chunk_size
+        self.max_pending_jobs = max_pending_jobs
+        self.limits = {
+            "ask": ConcurrencyLimiter("ask", ask_limit, ask_queue, queue_timeout),
+            "search": ConcurrencyLimiter("search", search_limit, search_queue, queue_timeout),
+            "batch": ConcurrencyLimiter("batch", batch_limit, batch_queue, queue_timeout),
+        }
+        self.executor = ThreadPoolExecutor(max_workers=ask_limit + search_limit, thread_name_prefix="api")
+        # Content hash -> chunk size of every file in the index.
+        self._ingested = {}
+        self.routes = {
+            "/health": {"GET": self.health},
+            "/ingest": {"POST": self.ingest},
+            "/search": {"POST": self.search},
+            "/ask": {"POST": self.ask},
+            "/batch": {"POST": self.batch},
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        try:
+            await self._route(scope["method"], scope["path"])(scope, receive, send)
+        except HTTPError as error:
+            await _send_json(send, error.status, {"error": str(error)}, error.headers)
+        except Exception as error:
+            traceback.print_exc()
+            await _send_json(send, 500, {"error": f"{type(error).__name__}: {error}"})
+
+    def _route(self, method, path):
+        if path.startswith("/jobs/"):
+            methods = {"GET": self.job_status}
+        else:
+            methods = self.routes.get(path.rstrip("/") or "/")
+        if methods is None:
+            raise HTTPError(404, f"No route for {path}")
+        if method not in methods:
+            raise HTTPError(405, f"{method} is not allowed on {path}", [(b"allow", ", ".join(methods).encode())])
+        return methods[method]
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _run(self, fn, *args):
+        """Runs blocking `fn` on the API thread pool, keeping the tracing context."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, tracing.propagate(fn), *args)
+
+    # --- Endpoints ---
+
+    async def health(self, scope, receive, send):
+        store = self.memory.vector_store
+        body = {
+            "status": "ok",
+            "chunks": store.index.ntotal if store else 0,
+            "limits": {name: limiter.stats() for name, limiter in self.limits.items()},
+            "pending_jobs": self._pending_jobs(),
+        }
+        if self.agent.tracer is not None:
+            body["latency"] = self.agent.tracer.summary()
+        await _send_json(send, 200, body)
+
+    async def ingest(self, scope, receive, send):
+        payload = await _read_json(receive)
+        files = payload.get("files")
+        if not isinstance(files, list) or not files:
+            raise HTTPError(400, '"files" must be a non-empty list')
+        chunk_size = payload.get("chunk_size", self.chunk_size)
+        if not isinstance(chunk_size, int) or isinstance(chunk_size, bool) or not 200 <= chunk_size <= 2000:
+            raise HTTPError(400, '"chunk_size" must be an integer between 200 and 2000')
+        if self._pending_jobs() >= self.max_pending_jobs:
+            raise Overloaded("ingest", 5)
+        # Up to MAX_BODY_BYTES of base64 to decode and hash: not on the event loop.
+        manifest, aliases = await asyncio.to_thread(_manifest, files)
+        # The index holds one chunking per file; a second one would duplicate its content.
+        conflicts = [upload.name for content_hash, upload in manifest.items()
+                     if self._ingested.get(content_hash, chunk_size) != chunk_size]
+        if conflicts:
+            raise HTTPError(409, f"Already ingested with another chunk_size: {', '.join(conflicts)}")
+
+        job = self.jobs.submit(
+            "api", f"{len(manifest)} files", lambda progress: self._ingest(manifest, aliases, chunk_size, progress)
+        )
+        await _send_json(send, 202, {"job": job.status()}, [(b"location", f"/jobs/{job.id}".encode())])
+
+    async def job_status(self, scope, receive, send):
+        job = self.jobs.get(scope["path"][len("/jobs/"):])
+        if job is None:
+            raise HTTPError(404, "Unknown job")
+        await _send_json(send, 200, {**job.status(), "result": job.result})
+
+    async def search(self, scope, receive, send):
+        payload = await _read_json(receive)
+        query = _text(payload, "query")
+        k = _k(payload)
+        threshold = payload.get("score_threshold")
+        if threshold is not None and (not isinstance(threshold, (int, float)) or isinstance(threshold, bool)):
+            raise HTTPError(400, '"score_threshold" must be a number')
+        async with self.limits["search"].slot():
+            results = await self._run(self.memory.search, query, k, threshold)
+        await _send_json(send, 200, {"results": [self._source(item) for item in results]})
+
+    async def ask(self, scope, receive, send):
+        payload = await _read_json(receive)
+        question = _text(payload, "question")
+        k = _k(payload)
+        history = _history(payload)
+        stream = payload.get("stream") is True or b"text/event-stream" in _header(scope, b"accept")
+        # Admission happens before any response bytes, so a refused stream still gets a plain 503.
+        async with self.limits["ask"].slot():
+            if stream:
+                await self._stream_answer(receive, send, question, history, k)
+            else:
+                await _send_json(send, 200, await self._run(self._answer, question, history, k, None))
+
+    async def batch(self, scope, receive, send):
+        payload = await _read_json(receive)
+        questions = payload.get("questions")
+        if not isinstance(questions, list) or not all(isinstance(question, str) for question in questions):
+            raise HTTPError(400, '"questions" must be a list of strings')
+        questions = list(dict.fromkeys(question.strip() for question in questions if question.strip()))
+        if not questions or len(questions) > MAX_BATCH_QUESTIONS:
+            raise HTTPError(400, f"Send between 1 and {MAX_BATCH_QUESTIONS} distinct questions")
+        k = _k(payload)
+        async with self.limits["batch"].slot():
+            results = await asyncio.gather(*(self._batch_answer(question, k) for question in questions))
+        await _send_json(send, 200, {"results": results})
+
+    # --- Work ---
+
+    def _pending_jobs(self):
+        return sum(1 for status in self.jobs.statuses() if status["state"] in (QUEUED, RUNNING))
+
+    def _ingest(self, manifest, aliases, chunk_size, progress):
+        """
+        Job body: parses files not ingested before and adds their chunks to the
+        shared index. A file that an earlier queued job ingested with another
+        chunk size is skipped, and one that yields no chunks (unreadable or
+        empty) is not recorded as ingested; both are listed in the result, as
+        are files sent with the same bytes as another (`aliases`).
+        """
+        new_hashes = [content_hash for content_hash in manifest if content_hash not in self._ingested]
+        conflicts = [manifest[content_hash].name for content_hash in manifest
+                     if self._ingested.get(content_hash, chunk_size) != chunk_size]
+        processor = DocumentProcessor(chunk_size=chunk_size, splitter="offset")
+        parsing = progress.stage(0.0, 0.3)
+        splits = []
+        parsed, failed = [], []
+        for done, content_hash in enumerate(new_hashes, start=1):
+            upload = manifest[content_hash]
+            parsing.progress((done - 1) / len(new_hashes), text=f"Parsing {upload.name}...")
+            # process_upload logs and swallows parse errors, returning no chunks.
+            file_splits = processor.process_upload(upload)
+            if not file_splits:
+                failed.append(upload.name)
+                continue
+            for split in file_splits:
+                split.metadata["content_hash"] = content_hash
+                if content_hash in aliases:
+                    split.metadata["aliases"] = list(aliases[content_hash])
+            splits.extend(file_splits)
+            parsed.append(content_hash)
+        self.memory.ingest_docs(splits, status_container=progress.stage(0.3, 1.0))
+        # Only files that made it into the index; a failed one can be sent again.
+        self._ingested.update(dict.fromkeys(parsed, chunk_size))
+        result = {"files": len(manifest), "new_files": len(parsed), "chunks": len(splits)}
+        if failed:
+            result["failed_files"] = failed
+        if aliases:
+            result["duplicate_files"] = {
+                name: manifest[content_hash].name for content_hash, names in aliases.items() for name in names
+            }
+        if conflicts:
+            result["chunk_size_conflicts"] = conflicts
+        return result
+
+    def _answer(self, question, history, k, status_container):
+        answer, sources, tool = self.agent.ask(question, chat_history=history, k=k, status_container=status_container)
+        return {"question": question, "answer": answer, "tool": tool, "sources": [self._source(item) for item in sources]}
+
+    async def _batch_answer(self, question, k):
+        try:
+            async with self.limits["ask"].slot():
+                return await self._run(self._answer, question, [], k, None)
+        except Overloaded as error:
+            return {"question": question, "error": str(error)}
+
+    async def _stream_answer(self, receive, send, question, history, k):
+        """
+        Server-sent events: "status" / "progress" as the agent works through its
+        stages, then one "answer" event (or "error"), then "done".
+        """
+        events = asyncio.Queue()
+        status = _EventStatus(asyncio.get_running_loop(), events)
+        await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+        work = asyncio.ensure_future(self._run(self._answer, question, history, k, status))
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            while True:
+                next_event = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait(
+                    {next_event, work, disconnected}, timeout=SSE_KEEPALIVE_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if next_event in done:
+                    await _send_event(send, *next_event.result())
+                    continue
+                next_event.cancel()
+                if disconnected in done:
+                    # Nobody is listening; the slot is held until the agent call returns.
+                    await asyncio.wait({work})
+                    return
+                if work in done:
+                    # Status updates are queued before the result, so none are lost.
+                    while not events.empty():
+                        await _send_event(send, *events.get_nowait())
+                    try:
+                        await _send_event(send, "answer", work.result())
+                    except Exception as error:
+                        await _send_event(send, "error", {"error": f"{type(error).__name__}: {error}"})
+                    await _send_event(send, "done", {})
+                    break
+                await send({"type": "http.response.body", "body": b": keep-alive\n\n", "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            disconnected.cancel()
+
+    def _source(self, item):
+        doc, score = item if isinstance(item, tuple) else (item, None)
+        source = {"content": doc.page_content, "metadata": doc.metadata, "score": None, "similarity": None}
+        if score is not None:
+            source["score"] = float(score)
+            source["similarity"] = round(self.memory.score_to_similarity(score), 4)
+        return source
+
+
+# --- HTTP helpers ---
+
+
+async def _read_json(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise HTTPError(400, "Client disconnected")
+        body = message.get("body", b"")
+        size += len(body)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body is larger than {MAX_BODY_BYTES} bytes")
+        chunks.append(body)
+        if not message.get("more_body"):
+            break
+    body = b"".join(chunks) or b"{}"
+    try:
+        # Large bodies (ingests with inline files) are parsed off the event loop.
+        payload = json.loads(body) if len(body) < 1 << 20 else await asyncio.to_thread(json.loads, body)
+    except ValueError:
+        raise HTTPError(400, "Request body must be JSON") from None
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    return payload
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _send_json(send, status, body, headers=()):
+    data = json.dumps(body, default=str).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [*JSON_HEADERS, (b"content-length", str(len(data)).encode()), *headers]})
+    await send({"type": "http.response.body", "body": data})
+
+
+async def _send_event(send, event, data):
+    message = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode("utf-8")
+    await send({"type": "http.response.body", "body": message, "more_body": True})
+
+
+def _header(scope, name):
+    return b",".join(value for key, value in scope.get("headers", []) if key == name)
+
+
+def _text(payload, field):
+    value = payload.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(400, f'"{field}" must be a non-empty string')
+    return value.strip()
+
+
+def _k(payload):
+    k = payload.get("k", 5)
+    if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= MAX_K:
+        raise HTTPError(400, f'"k" must be an integer between 1 and {MAX_K}')
+    return k
+
+
+def _history(payload):
+    """Prior turns as [{"role", "content"}]; the agent uses the last three."""
+    history = payload.get("history") or []
+    if not isinstance(history, list) or not all(
+        isinstance(message, dict) and isinstance(message.get("content"), str) and message.get("role") in ("user", "assistant")
+        for message in history
+    ):
+        raise HTTPError(400, '"history" must be a list of {"role": "user"|"assistant", "content": str}')
+    return history
+
+
+def _manifest(files):
+    aliases = {}
+    return build_manifest([_upload(item) for item in files], aliases=aliases), aliases
+
+
+def _b64decode(text, step=1 << 20):
+    """
+    Strict base64 decode in slices of `step` characters (a multiple of 4): one
+    b64decode call holds the GIL throughout, which would stall the event loop
+    for a large file even from a worker thread.
+    """
+    if "=" in text[:-2]:
+        raise binascii.Error("Padding before the end")
+    return b"".join(base64.b64decode(text[start : start + step], validate=True) for start in range(0, len(text), step))
+
+
+def _upload(item):
+    if not isinstance(item, dict) or not isinstance(item.get("name"), str) or not item["name"].strip():
+        raise HTTPError(400, 'Each file needs a "name"')
+    if isinstance(item.get("text"), str):
+        data = item["text"].encode("utf-8")
+    elif isinstance(item.get("content_base64"), str):
+        try:
+            data = _b64decode(item["content_base64"])
+        except (binascii.Error, ValueError):
+            raise HTTPError(400, f'"content_base64" of {item["name"]} is not valid base64') from None
+    else:
+        raise HTTPError(400, f'{item["name"]} needs "text" or "content_base64"')
+    return _Upload(data, item["name"].strip(), item.get("type"))
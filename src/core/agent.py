@@ -1,10 +1,20 @@
-from typing import List, Tuple, Optional, Any
-from langchain_groq import ChatGroq
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, Any, Union
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
-from tavily import TavilyClient
+from src.core.chat_memory import ConversationMemory
+from src.core.llm import LLMPool, estimate_tokens
+from src.core.mapreduce import MapReduceSummarizer
+from src.core.router import QueryRouter
+from src.core import tracing
+from src.core.tracing import Tracer
+from src.core.websearch import TTLCache, WebSearch
 import sys
+import time
+
+# Shared by all sessions for speculative web prefetches (see _answer_single).
+_SPECULATION_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculate")
 
 # Terminal Colors
 class Colors:
@@ -20,15 +30,28 @@ class Colors:
 class AgentBrain:
     MAX_SEARCH_QUERY_LENGTH = 400
 
-    def __init__(self, groq_api_key: str, tavily_api_key: Optional[str], memory_manager: Any):
+    def __init__(self, groq_api_key: str, tavily_api_key: Optional[str], memory_manager: Any,
+                 llm_pool: Optional[LLMPool] = None, web_search: Optional[WebSearch] = None,
+                 speculative: bool = True, router: Optional[QueryRouter] = None, tracer: Optional[Tracer] = None,
+                 map_reduce: bool = True, map_cache: Optional[TTLCache] = None):
         self.memory = memory_manager
+        self.speculative = speculative
+        # Optional up-front CHAT/RAG/WEB routing; without it every query probes RAG first.
+        self.router = router
+        # Optional per-stage timing spans (refine, route, search, LLM, web...); see src/core/tracing.py.
+        self.tracer = tracer
         
-        # Tools
-        self.tavily = TavilyClient(api_key=tavily_api_key) if tavily_api_key else None
+        # Tools (pooled Tavily sessions and cached searches, shared when passed in)
+        self.web = web_search or WebSearch()
+        self.tavily = self.web.client(tavily_api_key) if tavily_api_key else None
         
-        # LLMs
-        self.llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0, api_key=groq_api_key)
-        self.chat_llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0.3, api_key=groq_api_key)
+        # LLMs (shared, rate-limited and retried when a process-wide pool is passed in)
+        llm_pool = llm_pool or LLMPool()
+        self.llm = llm_pool.chat_model(groq_api_key, temperature=0)
+        self.chat_llm = llm_pool.chat_model(groq_api_key, temperature=0.3)
+        # Corpus-wide summaries over every chunk (see _is_corpus_summary_query); map notes
+        # are cached in `map_cache`, which can be shared between sessions.
+        self.map_reduce = MapReduceSummarizer(self.llm, cache=map_cache) if map_reduce else None
 
         # --- PROMPTS ---
         self.context_prompt = ChatPromptTemplate.from_template("""
@@ -63,24 +86,44 @@ class AgentBrain:
 
         self.chat_prompt = ChatPromptTemplate.from_template("User: {question}\nAssistant:")
 
-    def ask(self, query: str, chat_history: Optional[List[dict]] = None, k: int = 5, status_container: Any = None) -> Tuple[str, List[Document], str]:
-        
+    def ask(self, query: str, chat_history: Optional[Union[List[dict], ConversationMemory]] = None, k: int = 5,
+            status_container: Any = None) -> Tuple[str, List[Document], str]:
+        """
+        Args:
+            chat_history: A ConversationMemory (rolling summary + recent turns
+                under a token budget), or plain messages, of which the last
+                three are used verbatim.
+        """
         if chat_history is None:
             chat_history = []
 
+        if self.tracer is None:
+            return self._ask(query, chat_history, k, status_container)
+        with self.tracer.span("ask", k=k, history_turns=len(chat_history)) as span:
+            answer = self._ask(query, chat_history, k, status_container)
+            span.set(tool=answer[2], sources=len(answer[1]))
+            return answer
+
+    def _ask(self, query: str, chat_history: Union[List[dict], ConversationMemory], k: int, status_container: Any) -> Tuple[str, List[Document], str]:
         print(f"\n{Colors.HEADER}=== NEW QUERY ==={Colors.ENDC}")
         print(f"{Colors.BLUE}[Input]:{Colors.ENDC} {query}")
 
         try:
             # 1. Contextualize (Refine)
             if status_container: status_container.write("🧠 Refining context...")
-            history_text = "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in chat_history[-3:]])
-            refined_query = (self.context_prompt | self.llm | StrOutputParser()).invoke(
-                {"chat_history": history_text, "question": query}
-            ).strip()
+            if isinstance(chat_history, ConversationMemory):
+                history_text = chat_history.context()
+            else:
+                history_text = "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in chat_history[-3:]])
+            with tracing.span("refine", history_tokens=estimate_tokens(history_text)):
+                refined_query = (self.context_prompt | self.llm | StrOutputParser()).invoke(
+                    {"chat_history": history_text, "question": query}
+                ).strip()
             print(f"{Colors.CYAN}[Refined]:{Colors.ENDC} {refined_query}")
 
-            sub_questions = self._split_compound_query(refined_query)
+            with tracing.span("split") as span:
+                sub_questions = self._split_compound_query(refined_query)
+                span.set(parts=len(sub_questions))
             if len(sub_questions) > 1:
                 return self._answer_compound(sub_questions, status_container, k=k)
 
@@ -102,32 +145,48 @@ class AgentBrain:
 
     # --- HELPER FUNCTIONS ---
 
-    def _run_web_search(self, query, status_container):
+    def _run_web_search(self, query, status_container, prefetched=None):
         if status_container: status_container.write("🌍 Searching the Web...")
         print(f"{Colors.GREEN}[Web Search]:{Colors.ENDC} Initiating...")
         
         try:
-            # Generate Keywords
-            search_query = (self.search_query_prompt | self.llm | StrOutputParser()).invoke({"question": query}).strip()
-            search_query = self._truncate_search_query(search_query)
-            print(f"{Colors.BLUE}[Query]:{Colors.ENDC} {search_query}")
+            # Search results may already be on their way (see _answer_single).
+            context_str, web_docs = prefetched.result() if prefetched is not None else self._fetch_web_context(query)
             
-            results = self.tavily.search(query=search_query, search_depth="basic", max_results=5)
-            if not results.get('results'): raise ValueError("No results.")
-            
-            context_str = "\n\n".join([f"Source: {r['title']}\nSnippet: {r['content']}" for r in results['results']])
-            web_docs = [Document(page_content=r['content'], metadata={"source": r['title'], "page": "Web"}) for r in results['results'][:3]]
-            
-            response = (self.web_prompt | self.llm | StrOutputParser()).invoke({"context": context_str, "question": query})
+            with tracing.span("generate", tool="WEB"):
+                response = (self.web_prompt | self.llm | StrOutputParser()).invoke({"context": context_str, "question": query})
             return response, web_docs, "WEB"
             
         except Exception as e:
             print(f"{Colors.FAIL}[Web Error]:{Colors.ENDC} {e}")
             return self._run_chat(query, status_container, prefix=f"⚠️ **Web Failed:** {e}\n\n"), [], "CHAT"
 
+    def _fetch_web_context(self, query):
+        """Search query generation + Tavily. Safe to run off the UI thread (no status writes)."""
+        with tracing.span("web_search") as span:
+            # Generate Keywords (reused for a repeated question)
+            search_query = self.web.cached_search_query(query)
+            span.set(query_cache_hit=search_query is not None)
+            if search_query is None:
+                search_query = (self.search_query_prompt | self.llm | StrOutputParser()).invoke({"question": query}).strip()
+                search_query = self._truncate_search_query(search_query)
+                self.web.remember_search_query(query, search_query)
+            print(f"{Colors.BLUE}[Query]:{Colors.ENDC} {search_query}")
+
+            results, cached = self.web.search(self.tavily, search_query, search_depth="basic", max_results=5)
+            span.set(cache_hit=cached, results=len(results.get('results') or []))
+        if cached:
+            print(f"{Colors.GREEN}[Web Search]:{Colors.ENDC} Using cached results.")
+        if not results.get('results'): raise ValueError("No results.")
+        
+        context_str = "\n\n".join([f"Source: {r['title']}\nSnippet: {r['content']}" for r in results['results']])
+        web_docs = [Document(page_content=r['content'], metadata={"source": r['title'], "page": "Web"}) for r in results['results'][:3]]
+        return context_str, web_docs
+
     def _run_chat(self, query, status_container, prefix=""):
         if status_container: status_container.write("💬 Thinking...")
-        response = (self.chat_prompt | self.chat_llm | StrOutputParser()).invoke({"question": query})
+        with tracing.span("generate", tool="CHAT"):
+            response = (self.chat_prompt | self.chat_llm | StrOutputParser()).invoke({"question": query})
         return prefix + response
 
     def _truncate_search_query(self, query: str) -> str:
@@ -187,26 +246,139 @@ class AgentBrain:
         ]
         return any(indicator in lowered for indicator in web_indicators)
 
+    def _is_broad_query(self, query: str) -> bool:
+        lowered = query.lower()
+        broad_phrases = [
+            "summarize",
+            "summarise",
+            "summary",
+            "overview",
+            "main points",
+            "key points",
+            "key findings",
+            "key takeaways",
+            "tl;dr",
+            "what is this document about",
+            "what is the document about",
+            "what is this report about",
+        ]
+        return any(phrase in lowered for phrase in broad_phrases)
+
+    def _is_corpus_summary_query(self, query: str) -> bool:
+        """A broad question about the whole collection, e.g. "summarize my uploaded documents"."""
+        lowered = query.lower()
+        corpus_phrases = [
+            "my documents",
+            "the documents",
+            "uploaded",
+            "all documents",
+            "all the documents",
+            "all files",
+            "all the files",
+            "my files",
+            "whole document",
+            "entire document",
+            "whole report",
+            "entire report",
+            "everything",
+            "corpus",
+        ]
+        return self._is_broad_query(query) and any(phrase in lowered for phrase in corpus_phrases)
+
     def _answer_single(self, query: str, status_container: Any, k: int) -> Tuple[str, List[Document], str]:
         if self._is_subjective_query(query):
             print(f"{Colors.BOLD}[Strategy]:{Colors.ENDC} Subjective query detected. Using CHAT.")
             return self._run_chat(query, status_container), [], "CHAT"
 
+        if self.map_reduce is not None and self.memory.vector_store and self._is_corpus_summary_query(query):
+            return self._answer_map_reduce(query, status_container, k)
+
+        if self.router is None:
+            return self._answer_probing(query, status_container, k)
+
+        started = time.perf_counter()
+        with tracing.span("route") as span:
+            decision = self.router.route(
+                query,
+                self.memory,
+                k=k,
+                web_available=self.tavily is not None,
+                hints={"web": self._needs_web_search(query)},
+            )
+            span.set(route=decision.route, confidence=round(decision.confidence, 4), confident=decision.confident)
+        print(f"{Colors.BOLD}[Router]:{Colors.ENDC} {decision.route} ({decision.confidence:.2f})"
+              f"{'' if decision.confident else ' - not confident, probing'}")
+        if not decision.confident:
+            answer = self._answer_probing(query, status_container, k, decision.results, decision.vector)
+        elif decision.route == "CHAT":
+            answer = self._run_chat(query, status_container), [], "CHAT"
+        elif decision.route == "WEB":
+            answer = self._run_web_search(query, status_container)
+        else:
+            if status_container:
+                status_container.write("📚 Searching Knowledge Base...")
+            answer = self._answer_from_documents(query, status_container, k, results=decision.results,
+                                                 vector=decision.vector)
+        self.router.record(query, decision, answer[2], time.perf_counter() - started)
+        return answer
+
+    def _answer_probing(self, query: str, status_container: Any, k: int, results=None,
+                        vector=None) -> Tuple[str, List[Document], str]:
+        """
+        Original strategy: try RAG, and only fall back when the LLM reports MISSING_INFO.
+        `results` and `vector` are the router's search and query embedding, when it ran.
+        """
+
+        # Speculation: a web-routed question is likely to end up on the web path, so
+        # its search query and Tavily results are fetched while RAG runs. If RAG
+        # answers, the prefetch is cancelled (or its result simply ignored).
+        prefetched = None
+        if self.speculative and self.tavily and self._needs_web_search(query):
+            print(f"{Colors.BOLD}[Strategy]:{Colors.ENDC} Web-like query. Prefetching web results alongside RAG.")
+            prefetched = _SPECULATION_POOL.submit(tracing.propagate(self._fetch_web_context), query)
+
         if status_container:
             status_container.write("📚 Searching Knowledge Base...")
 
-        results = self.memory.search(query, k=k, score_threshold=1.5)
-        if not results and self.memory.vector_store:
-            print(f"{Colors.WARNING}[RAG]:{Colors.ENDC} No matches under threshold. Falling back to top results.")
-            results = self.memory.search(query, k=k, score_threshold=None)
+        try:
+            response = self._answer_from_documents(query, status_container, k, prefetched, results, vector)
+        except Exception:
+            if prefetched is not None:
+                prefetched.cancel()
+            raise
+        if prefetched is not None and response[2] != "WEB":
+            prefetched.cancel()
+        return response
+
+    def _answer_from_documents(self, query: str, status_container: Any, k: int, prefetched=None,
+                               results=None, vector=None) -> Tuple[str, List[Document], str]:
+        # Broad questions are answered from section summaries (when the store has them)
+        # rather than a few scattered chunks.
+        if self._is_broad_query(query):
+            with tracing.span("search_summaries", k=k) as span:
+                summaries = self.memory.search_summaries(query, k=k, vector=vector)
+                span.set(results=len(summaries))
+            if summaries:
+                print(f"{Colors.GREEN}[RAG]:{Colors.ENDC} Broad question. Using {len(summaries)} section summaries.")
+                results = summaries
+        if results is None:
+            with tracing.span("search", k=k) as span:
+                results = self.memory.search(query, k=k)
+                span.set(results=len(results))
+        # One search: keep the chunks that pass the corpus' relevance threshold, or the top-k if none do.
+        relevant = self.memory.filter_relevant(results)
+        if results and not relevant:
+            print(f"{Colors.WARNING}[RAG]:{Colors.ENDC} No matches over the relevance threshold. Using top results.")
+        results = relevant or results
 
         if results:
             print(f"{Colors.GREEN}[RAG]:{Colors.ENDC} Found {len(results)} potential docs.")
             context_text = "\n\n".join([doc.page_content for doc, score in results])
 
-            response = (self.rag_prompt | self.llm | StrOutputParser()).invoke(
-                {"context": context_text, "question": query}
-            )
+            with tracing.span("generate", tool="RAG"):
+                response = (self.rag_prompt | self.llm | StrOutputParser()).invoke(
+                    {"context": context_text, "question": query}
+                )
 
             if "MISSING_INFO" not in response:
                 return response, results, "RAG"
@@ -223,11 +395,41 @@ class AgentBrain:
             ), [], "CHAT"
 
         if self.tavily:
-            return self._run_web_search(query, status_container)
+            return self._run_web_search(query, status_container, prefetched=prefetched)
 
         print(f"{Colors.FAIL}[Fallback]:{Colors.ENDC} Web needed but no Key. Using Logic.")
         return self._run_chat(query, status_container, prefix="ℹ️ **Note:** Not found in documents.\n\n"), [], "CHAT"
 
+    def _answer_map_reduce(self, query: str, status_container: Any, k: int) -> Tuple[str, List[Document], str]:
+        """
+        Map-reduce over every chunk instead of top-k retrieval; sources are the files covered.
+        When that would take more map calls than the summarizer's budget and the
+        index has section summaries, those answer the question instead.
+        """
+        documents = self.memory.documents()
+        uncached = self.map_reduce.uncached_parts(documents)
+        if uncached > self.map_reduce.max_parts and getattr(self.memory.vector_store, "sections", None) is not None:
+            print(f"{Colors.BOLD}[Strategy]:{Colors.ENDC} Corpus-wide question, but {uncached} parts to summarize. "
+                  f"Using section summaries.")
+            return self._answer_from_documents(query, status_container, k)
+        print(f"{Colors.BOLD}[Strategy]:{Colors.ENDC} Corpus-wide question. Map-reduce over {len(documents)} chunks.")
+        if status_container:
+            status_container.write(f"📖 Reading all {len(documents)} chunks...")
+        with tracing.span("map_reduce", chunks=len(documents)) as span:
+            answer, stats = self.map_reduce.run(query, documents, status_container)
+            span.set(**stats)
+        truncated = f", {stats['truncated_chars']:,} chars of notes cut" if stats.get("truncated_chars") else ""
+        print(f"{Colors.GREEN}[MapReduce]:{Colors.ENDC} {stats['parts']} parts ({stats['cached']} cached), "
+              f"{stats['reduce_rounds']} reduce rounds{truncated}.")
+
+        sources = {}
+        for doc in documents:
+            source = doc.metadata.get("source") or "Document"
+            if source not in sources:
+                sources[source] = Document(page_content=doc.page_content,
+                                           metadata={"source": source, "page": doc.metadata.get("page", 0)})
+        return answer, [(doc, None) for doc in sources.values()], "RAG"
+
     def _answer_compound(self, sub_questions: List[str], status_container: Any, k: int) -> Tuple[str, List[Document], str]:
         responses = []
         all_docs: List[Document] = []
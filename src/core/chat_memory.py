@@ -0,0 +1,136 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.core.llm import estimate_tokens
+
+# Shared by all sessions for summary updates, which run off the request path.
+_SUMMARY_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chat-summary")
+
+
+def _clip(text, tokens):
+    """`text` cut to about `tokens` tokens at a word boundary."""
+    text = " ".join(text.split())
+    if estimate_tokens(text) <= tokens:
+        return text
+    return text[: tokens * 4].rsplit(" ", 1)[0] + " …"
+
+
+def _clip_left(text, tokens):
+    """Keeps the newest (last) `tokens` tokens of `text`."""
+    if estimate_tokens(text) <= tokens:
+        return text
+    return "… " + text[-tokens * 4:].split(" ", 1)[-1]
+
+
+def _line(role, content, words=25):
+    return f"{role.upper()}: {' '.join(content.split()[:words])}"
+
+
+class ConversationMemory:
+    """
+    Chat context for the question-rewrite prompt, under a fixed token budget:
+    a rolling summary of older turns (at most `summary_tokens`) plus the most
+    recent turns verbatim (at most `recent_tokens`, each clipped to
+    `max_turn_tokens` so one long answer cannot crowd out the rest).
+
+    add() is called once per message. Turns pushed out of the recent window
+    are folded into the summary by the LLM on a background thread, so the
+    next question never waits for it; until the fold lands, those turns are
+    shown in short form instead. Without an LLM the summary is extractive:
+    the first words of each evicted turn, newest kept.
+    """
+
+    summary_prompt = ChatPromptTemplate.from_template("""
+    Update the running summary of a conversation with the new lines.
+    Keep names, documents, numbers and topics the user may refer back to; drop small talk.
+    Reply with the summary only, at most {words} words.
+
+    Summary so far: {summary}
+    New lines: {lines}
+    Updated summary:
+    """)
+
+    def __init__(self, llm=None, recent_tokens=400, summary_tokens=250, max_turn_tokens=150):
+        self.llm = llm
+        self.recent_tokens = recent_tokens
+        self.summary_tokens = summary_tokens
+        self.max_turn_tokens = max_turn_tokens
+        self.lock = threading.Lock()
+        self.summary = ""
+        self.turns = deque()
+        # Evicted turns not yet folded into the summary (waiting, then being folded).
+        self.pending = []
+        self._in_flight = []
+        self._folding = False
+
+    @classmethod
+    def from_messages(cls, messages, llm=None, **options):
+        """Rebuilds a memory from stored {"role", "content"} messages without any LLM call."""
+        memory = cls(**options)
+        for message in messages:
+            memory.add(message["role"], message.get("content", ""))
+        memory.llm = llm
+        return memory
+
+    def __len__(self):
+        with self.lock:
+            return len(self.turns) + len(self.pending) + len(self._in_flight) + bool(self.summary)
+
+    def add(self, role, content):
+        with self.lock:
+            self.turns.append((role, _clip(content, self.max_turn_tokens)))
+            while len(self.turns) > 1 and sum(estimate_tokens(text) for _, text in self.turns) > self.recent_tokens:
+                self.pending.append(self.turns.popleft())
+            if not self.pending or self._folding:
+                return
+            self._folding = True
+        if self.llm is None:
+            self._fold()
+        else:
+            _SUMMARY_POOL.submit(self._fold)
+
+    def context(self):
+        """Summary, not-yet-folded turns and recent turns, as text for a prompt."""
+        with self.lock:
+            summary, pending, turns = self.summary, self._in_flight + self.pending, list(self.turns)
+        parts = []
+        if summary or pending:
+            earlier = " ".join([summary, *(_line(role, text) for role, text in pending)]).strip()
+            parts.append(f"EARLIER (summary): {_clip_left(earlier, self.summary_tokens)}")
+        parts.extend(f"{role.upper()}: {text}" for role, text in turns)
+        return "\n".join(parts)
+
+    def _fold(self):
+        """Folds pending turns into the summary until none are left."""
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self._folding = False
+                    return
+                summary, batch = self.summary, self.pending
+                self.pending, self._in_flight = [], batch
+            try:
+                summary = self._summarize(summary, batch)
+            except Exception:
+                summary = self._extractive(summary, batch)
+            with self.lock:
+                self.summary, self._in_flight = summary, []
+
+    def _summarize(self, summary, batch):
+        if self.llm is None:
+            return self._extractive(summary, batch)
+        lines = "\n".join(f"{role.upper()}: {text}" for role, text in batch)
+        updated = (self.summary_prompt | self.llm | StrOutputParser()).invoke(
+            {"summary": summary or "(empty)", "lines": lines, "words": self.summary_tokens * 3 // 4}
+        )
+        if not updated.strip():
+            return self._extractive(summary, batch)
+        return _clip(updated, self.summary_tokens)
+
+    def _extractive(self, summary, batch):
+        return _clip_left(" ".join([summary, *(_line(role, text) for role, text in batch)]).strip(),
+                          self.summary_tokens)
@@ -0,0 +1,149 @@
+import json
+import mmap
+import tempfile
+import threading
+from array import array
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+# Vector storage modes accepted by MemoryManager(storage=...).
+STORAGE_MODES = ("flat", "fp16", "sq8")
+# Distance metrics accepted by MemoryManager(metric=...): squared L2, or inner
+# product over L2-normalized vectors (cosine similarity).
+METRICS = ("l2", "ip")
+
+
+def make_index(dimension, storage="flat", metric="l2"):
+    """
+    Builds the FAISS index for a storage mode: full float32 vectors ("flat"),
+    or scalar-quantized codes at 2 ("fp16") or 1 ("sq8") byte per dimension.
+    `metric` is "l2" (squared distance) or "ip" (inner product).
+    """
+    import faiss
+
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}")
+    faiss_metric = faiss.METRIC_L2 if metric == "l2" else faiss.METRIC_INNER_PRODUCT
+    if storage == "flat":
+        return faiss.IndexFlatL2(dimension) if metric == "l2" else faiss.IndexFlatIP(dimension)
+    if storage == "fp16":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss_metric)
+    if storage == "sq8":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss_metric)
+    raise ValueError(f"Unknown storage mode {storage!r}; expected one of {STORAGE_MODES}")
+
+
+class _BlobStorage:
+    """
+    Append-only UTF-8 records in one bytearray (or file), located by offset arrays.
+    Records are never rewritten, so several docstores can share one storage.
+    """
+
+    def __init__(self, directory=None):
+        self.lock = threading.Lock()
+        self.starts = array("Q")
+        self.text_lengths = array("I")
+        self.record_lengths = array("I")
+        self.size = 0
+        # An anonymous temp file is removed by the OS once the storage is dropped.
+        self._blob = bytearray() if directory is None else None
+        self._file = tempfile.TemporaryFile(dir=directory) if directory is not None else None
+        self._map = None
+
+    def append(self, text, metadata):
+        text_bytes = text.encode("utf-8")
+        meta_bytes = json.dumps(metadata, separators=(",", ":"), default=str).encode("utf-8")
+        with self.lock:
+            slot = len(self.starts)
+            self.starts.append(self.size)
+            self.text_lengths.append(len(text_bytes))
+            self.record_lengths.append(len(text_bytes) + len(meta_bytes))
+            if self._file is None:
+                self._blob += text_bytes
+                self._blob += meta_bytes
+            else:
+                self._file.seek(self.size)
+                self._file.write(text_bytes)
+                self._file.write(meta_bytes)
+            self.size += len(text_bytes) + len(meta_bytes)
+        return slot
+
+    def read(self, slot):
+        with self.lock:
+            start = self.starts[slot]
+            split = start + self.text_lengths[slot]
+            end = start + self.record_lengths[slot]
+            buffer = self._buffer(end)
+            with memoryview(buffer) as view:
+                text = str(view[start:split], "utf-8")
+                metadata = json.loads(str(view[split:end], "utf-8"))
+        return text, metadata
+
+    def _buffer(self, end):
+        if self._file is None:
+            return self._blob
+        if self._map is None or len(self._map) < end:
+            self._file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def nbytes(self):
+        offsets = (self.starts.itemsize + self.text_lengths.itemsize + self.record_lengths.itemsize) * len(self.starts)
+        return self.size + offsets
+
+
+class CompactDocstore(Docstore, AddableMixin):
+    """
+    FAISS docstore that keeps chunk text and metadata in a shared UTF-8 blob
+    (optionally a memory-mapped file) instead of one Document per chunk.
+    Documents are rebuilt on demand when search results are read.
+    """
+
+    def __init__(self, directory=None, storage=None, slots=None):
+        """
+        Args:
+            directory: Optional. Keeps the blob in a memory-mapped temp file
+                there instead of in process memory.
+        """
+        self._storage = storage or _BlobStorage(directory)
+        self._slots = slots if slots is not None else {}
+
+    def add(self, texts):
+        for doc_id, doc in texts.items():
+            if doc_id in self._slots:
+                raise ValueError(f"Tried to add ids that already exist: {doc_id}")
+            self._slots[doc_id] = self._storage.append(doc.page_content, doc.metadata)
+
+    def search(self, search):
+        slot = self._slots.get(search)
+        if slot is None:
+            return f"ID {search} not found."
+        text, metadata = self._storage.read(slot)
+        return Document(id=search, page_content=text, metadata=metadata)
+
+    def delete(self, ids):
+        missing = set(ids).difference(self._slots)
+        if missing:
+            raise ValueError(f"Tried to delete ids that does not exist: {missing}")
+        for doc_id in ids:
+            # The record stays in the append-only blob; only the mapping goes.
+            del self._slots[doc_id]
+
+    def items(self):
+        for doc_id in list(self._slots):
+            yield doc_id, self.search(doc_id)
+
+    def replace(self, doc_id, doc):
+        self._slots[doc_id] = self._storage.append(doc.page_content, doc.metadata)
+
+    def copy(self):
+        """Cheap copy-on-write clone: shares the blob, copies only the id mapping."""
+        return CompactDocstore(storage=self._storage, slots=dict(self._slots))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def nbytes(self):
+        return self._storage.nbytes()
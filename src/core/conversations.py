@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+MESSAGE_FIELDS = ("message_id", "role", "content", "question", "tool", "insight", "suggestions")
+FAVORITE_FIELDS = ("source_id", "question", "answer", "tool", "insight", "saved_at")
+BATCH_FIELDS = ("question", "answer", "tool", "insight", "suggestions")
+
+
+def new_conversation_id():
+    return os.urandom(8).hex()
+
+
+class ConversationStore:
+    """
+    SQLite-backed chat messages, favorites and batch results, keyed by
+    conversation id. Reads are paginated (newest first, by row id), so the
+    UI only loads the turns it renders and the cost of a rerun does not grow
+    with the length of the conversation. Exports stream every row on demand.
+
+    One connection is shared by all sessions of the process; `path` defaults
+    to an in-memory database, a file keeps conversations across restarts.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self.lock, self._db:
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation TEXT NOT NULL,
+                    message_id TEXT, role TEXT NOT NULL, content TEXT NOT NULL, question TEXT,
+                    tool TEXT, insight TEXT, suggestions TEXT, created REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages (conversation, id);
+                CREATE TABLE IF NOT EXISTS favorites (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation TEXT NOT NULL,
+                    source_id TEXT NOT NULL, question TEXT, answer TEXT, tool TEXT, insight TEXT, saved_at TEXT,
+                    UNIQUE (conversation, source_id)
+                );
+                CREATE TABLE IF NOT EXISTS batch_results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation TEXT NOT NULL,
+                    question TEXT, answer TEXT, tool TEXT, insight TEXT, suggestions TEXT
+                );
+                CREATE INDEX IF NOT EXISTS batch_by_conversation ON batch_results (conversation, id);
+            """)
+
+    # --- Messages ---
+
+    def append_message(self, conversation, message):
+        row = {field: message.get(field) for field in MESSAGE_FIELDS}
+        row["suggestions"] = json.dumps(row["suggestions"] or [])
+        with self.lock, self._db:
+            self._db.execute(
+                "INSERT INTO messages (conversation, message_id, role, content, question, tool, insight, suggestions,"
+                " created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (conversation, *(row[field] for field in MESSAGE_FIELDS), time.time()),
+            )
+
+    def count_messages(self, conversation):
+        with self.lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM messages WHERE conversation = ?", (conversation,)
+            ).fetchone()[0]
+
+    def recent_messages(self, conversation, limit, offset=0):
+        """Up to `limit` messages, oldest first, skipping the `offset` newest ones."""
+        with self.lock:
+            rows = self._db.execute(
+                "SELECT * FROM messages WHERE conversation = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (conversation, limit, offset),
+            ).fetchall()
+        return [self._message(row) for row in reversed(rows)]
+
+    def iter_messages(self, conversation, page_size=500):
+        """Every message, oldest first, read a page at a time (for exports)."""
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self._db.execute(
+                    "SELECT * FROM messages WHERE conversation = ? AND id > ? ORDER BY id LIMIT ?",
+                    (conversation, last_id, page_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._message(row)
+            last_id = rows[-1]["id"]
+
+    def clear_messages(self, conversation):
+        with self.lock, self._db:
+            self._db.execute("DELETE FROM messages WHERE conversation = ?", (conversation,))
+
+    @staticmethod
+    def _message(row):
+        message = {field: row[field] for field in MESSAGE_FIELDS if row[field] is not None}
+        message["suggestions"] = json.loads(row["suggestions"] or "[]")
+        return message
+
+    # --- Favorites ---
+
+    def add_favorite(self, conversation, favorite):
+        """Returns False if this source was already saved."""
+        with self.lock, self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO favorites (conversation, source_id, question, answer, tool, insight, saved_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (conversation, *(favorite.get(field) for field in FAVORITE_FIELDS)),
+            )
+            return cursor.rowcount > 0
+
+    def count_favorites(self, conversation):
+        with self.lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM favorites WHERE conversation = ?", (conversation,)
+            ).fetchone()[0]
+
+    def favorites(self, conversation, limit=None):
+        """Saved answers, oldest first; with `limit`, only the newest ones."""
+        with self.lock:
+            rows = self._db.execute(
+                "SELECT * FROM favorites WHERE conversation = ? ORDER BY id DESC LIMIT ?",
+                (conversation, -1 if limit is None else limit),
+            ).fetchall()
+        return [{field: row[field] for field in FAVORITE_FIELDS} for row in reversed(rows)]
+
+    def clear_favorites(self, conversation):
+        with self.lock, self._db:
+            self._db.execute("DELETE FROM favorites WHERE conversation = ?", (conversation,))
+
+    # --- Batch results ---
+
+    def set_batch_results(self, conversation, results):
+        """Replaces the conversation's batch results with those of the latest run."""
+        with self.lock, self._db:
+            self._db.execute("DELETE FROM batch_results WHERE conversation = ?", (conversation,))
+            self._db.executemany(
+                "INSERT INTO batch_results (conversation, question, answer, tool, insight, suggestions)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (conversation, item.get("question"), item.get("answer"), item.get("tool"), item.get("insight"),
+                     json.dumps(item.get("suggestions") or []))
+                    for item in results
+                ],
+            )
+
+    def batch_results(self, conversation):
+        with self.lock:
+            rows = self._db.execute(
+                "SELECT * FROM batch_results WHERE conversation = ? ORDER BY id", (conversation,)
+            ).fetchall()
+        return [
+            {**{field: row[field] or "" for field in BATCH_FIELDS}, "suggestions": json.loads(row["suggestions"] or "[]")}
+            for row in rows
+        ]
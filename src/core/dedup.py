@@ -0,0 +1,312 @@
+import hashlib
+import re
+import numpy as np
+from langchain_core.documents import Document
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = (1 << 32) - 1
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class DedupResult:
+    def __init__(self, documents, updated, removed, signatures=()):
+        # New chunks to embed, existing chunks whose provenance grew, the drop
+        # count, and the new chunks' MinHash signatures.
+        self.documents = documents
+        self.updated = updated
+        self.removed = removed
+        self.signatures = signatures
+
+
+class ChunkDeduplicator:
+    """
+    Collapses near-duplicate chunks before they are embedded.
+
+    Each chunk gets a MinHash signature over word shingles; LSH banding finds
+    candidate pairs, and pairs whose estimated Jaccard similarity reaches
+    `threshold` are merged. The first copy is kept and every dropped copy is
+    recorded in its `duplicate_sources` metadata, so answers can still cite
+    all the files a passage appeared in.
+    """
+
+    def __init__(self, threshold=0.85, num_perm=128, bands=32, shingle_size=5, seed=1,
+                 embedding_model=None, vector_floor=0.6, vector_threshold=0.97):
+        """
+        Args:
+            embedding_model: Optional. When set, candidate pairs with a Jaccard
+                estimate between `vector_floor` and `threshold` are also merged
+                if their embeddings' cosine similarity reaches `vector_threshold`.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.embedding_model = embedding_model
+        self.vector_floor = vector_floor
+        self.vector_threshold = vector_threshold
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        tokens = _TOKEN_RE.findall(text.lower())
+        size = self.shingle_size
+        if len(tokens) <= size:
+            shingles = {" ".join(tokens)}
+        else:
+            shingles = {" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)}
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # Both factors are < 2**32, so the products cannot overflow uint64.
+        return ((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME).min(axis=0)
+
+    @property
+    def params(self):
+        """Settings a signature depends on; an index built under others is rebuilt."""
+        return (self.num_perm, self.bands, self.shingle_size, self._a.tobytes(), self._b.tobytes())
+
+    def new_index(self, items=()):
+        """A DedupIndex over (doc id, Document) pairs, e.g. a store's existing chunks."""
+        index = DedupIndex(self.params, self.bands)
+        for doc_id, doc in items:
+            index.add(doc_id, doc.page_content, self.signature(doc.page_content))
+        return index
+
+    def deduplicate(self, splits, index=None, lookup=None):
+        """
+        Args:
+            splits: New chunks about to be embedded.
+            index: Optional DedupIndex of the chunks already in the store; new
+                chunks duplicating them are dropped too. It is not modified.
+            lookup: Doc id -> Document for the chunks in `index`.
+        Returns a DedupResult. Existing Documents are never mutated; copies with
+        extended provenance are returned in `updated` for the caller to store.
+        The kept chunks' signatures are in `signatures`, for the caller to add
+        to the index once the chunks have ids.
+        """
+        state = _DedupState(self, index, lookup)
+
+        kept = []
+        signatures = []
+        updated = {}
+        removed = 0
+        for doc in splits:
+            signature = self.signature(doc.page_content)
+            match = state.find(doc, signature)
+            if match is None:
+                state.add(doc, signature)
+                kept.append(doc)
+                signatures.append(signature)
+                continue
+
+            removed += 1
+            canonical = state.document(match)
+            if state.is_existing(match) and match not in updated:
+                canonical = Document(page_content=canonical.page_content, metadata=dict(canonical.metadata))
+                state.existing[match] = canonical
+                updated[match] = canonical
+            _record_provenance(canonical, doc)
+
+        return DedupResult(kept, updated, removed, signatures)
+
+
+class DedupIndex:
+    """
+    MinHash signatures and LSH band buckets of the chunks in a store, keyed by
+    doc id. Kept on the store across ingests so only new chunks get signed.
+    Buckets are tuples that are replaced, never mutated, so a copy is just
+    shallow copies of the dicts.
+    """
+
+    def __init__(self, params, bands):
+        self.params = params
+        self.bands = bands
+        self.signatures = {}
+        self.hashes = {}
+        self.buckets = {}
+        self.exact = {}
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def copy(self):
+        copy = DedupIndex(self.params, self.bands)
+        copy.signatures = dict(self.signatures)
+        copy.hashes = dict(self.hashes)
+        copy.buckets = dict(self.buckets)
+        copy.exact = dict(self.exact)
+        return copy
+
+    def add(self, doc_id, text, signature):
+        text_hash = _normalized_hash(text)
+        self.signatures[doc_id] = signature
+        self.hashes[doc_id] = text_hash
+        self.exact.setdefault(text_hash, doc_id)
+        for key in _band_keys(signature, self.bands):
+            self.buckets[key] = self.buckets.get(key, ()) + (doc_id,)
+
+    def remove(self, doc_ids):
+        for doc_id in doc_ids:
+            signature = self.signatures.pop(doc_id, None)
+            if signature is None:
+                continue
+            text_hash = self.hashes.pop(doc_id)
+            if self.exact.get(text_hash) == doc_id:
+                del self.exact[text_hash]
+            for key in _band_keys(signature, self.bands):
+                bucket = tuple(other for other in self.buckets[key] if other != doc_id)
+                if bucket:
+                    self.buckets[key] = bucket
+                else:
+                    del self.buckets[key]
+
+
+class _DedupState:
+    """
+    Candidates for one deduplicate call: the index's chunks, keyed by doc id,
+    and the new chunks kept so far, keyed by their position in `docs`.
+    """
+
+    def __init__(self, deduplicator, index, lookup):
+        self.dedup = deduplicator
+        self.index = index
+        self.lookup = lookup
+        self.existing = {}
+        self.docs = []
+        self.signatures = []
+        self.buckets = {}
+        self.exact = {}
+        self.vectors = {}
+
+    def is_existing(self, key):
+        return not isinstance(key, int)
+
+    def document(self, key):
+        if not self.is_existing(key):
+            return self.docs[key]
+        if key not in self.existing:
+            self.existing[key] = self.lookup(key)
+        return self.existing[key]
+
+    def _signature(self, key):
+        return self.index.signatures[key] if self.is_existing(key) else self.signatures[key]
+
+    def add(self, doc, signature):
+        position = len(self.docs)
+        self.docs.append(doc)
+        self.signatures.append(signature)
+        self.exact.setdefault(_normalized_hash(doc.page_content), position)
+        for key in _band_keys(signature, self.dedup.bands):
+            self.buckets.setdefault(key, []).append(position)
+
+    def find(self, doc, signature):
+        text_hash = _normalized_hash(doc.page_content)
+        if self.index is not None and text_hash in self.index.exact:
+            return self.index.exact[text_hash]
+        if text_hash in self.exact:
+            return self.exact[text_hash]
+
+        # Chunks already in the store come first, as if they had been added first.
+        existing = {}
+        candidates = set()
+        for key in _band_keys(signature, self.dedup.bands):
+            if self.index is not None:
+                existing.update(dict.fromkeys(self.index.buckets.get(key, ())))
+            candidates.update(self.buckets.get(key, ()))
+
+        borderline = []
+        for key in [*existing, *sorted(candidates)]:
+            similarity = float(np.mean(self._signature(key) == signature))
+            if similarity >= self.dedup.threshold:
+                return key
+            if similarity >= self.dedup.vector_floor:
+                borderline.append(key)
+
+        if borderline and self.dedup.embedding_model is not None:
+            return self._vector_match(doc, borderline)
+        return None
+
+    def _vector_match(self, doc, keys):
+        model = self.dedup.embedding_model
+        missing = [key for key in keys if key not in self.vectors]
+        if missing:
+            vectors = model.embed_documents([self.document(key).page_content for key in missing])
+            for key, vector in zip(missing, vectors):
+                self.vectors[key] = _unit(vector)
+        query = _unit(model.embed_query(doc.page_content))
+        for key in keys:
+            if float(np.dot(query, self.vectors[key])) >= self.dedup.vector_threshold:
+                return key
+        return None
+
+
+def _band_keys(signature, bands):
+    rows = len(signature) // bands
+    return [(band, signature[band * rows : (band + 1) * rows].tobytes()) for band in range(bands)]
+
+
+def _normalized_hash(text):
+    return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).digest()
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _provenance(metadata):
+    return {
+        "source": metadata.get("source"),
+        "page": metadata.get("page"),
+        "content_hash": metadata.get("content_hash"),
+    }
+
+
+def _record_provenance(canonical, duplicate):
+    record = _provenance(duplicate.metadata)
+    own = _provenance(canonical.metadata)
+    sources = list(canonical.metadata.get("duplicate_sources", []))
+    if record != own and record not in sources:
+        sources.append(record)
+        canonical.metadata["duplicate_sources"] = sources
+
+
+def refresh_provenance(doc, live_sources):
+    """
+    Re-checks a chunk's provenance against the content hashes still in the corpus.
+    Returns `doc` unchanged, an updated copy (dropped copies pruned, or the chunk
+    re-attributed to a surviving duplicate when its own file is gone), or None
+    when no file containing it remains.
+    """
+    duplicates = doc.metadata.get("duplicate_sources", [])
+    survivors = [record for record in duplicates if record.get("content_hash") in live_sources]
+
+    if doc.metadata.get("content_hash") in live_sources:
+        if len(survivors) == len(duplicates):
+            return doc
+        metadata = dict(doc.metadata)
+        if survivors:
+            metadata["duplicate_sources"] = survivors
+        else:
+            metadata.pop("duplicate_sources", None)
+        return Document(page_content=doc.page_content, metadata=metadata)
+
+    if not survivors:
+        return None
+    first = survivors[0]
+    metadata = {
+        "source": first["source"],
+        "file_path": first["source"],
+        "page": first["page"],
+        "content_hash": first["content_hash"],
+    }
+    if survivors[1:]:
+        metadata["duplicate_sources"] = survivors[1:]
+    return Document(page_content=doc.page_content, metadata=metadata)
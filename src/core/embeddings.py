@@ -0,0 +1,279 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# ONNX exports published alongside the sentence-transformers checkpoint.
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_quint8_avx2.onnx",
+}
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence-transformers embeddings served by ONNX Runtime instead of PyTorch.
+
+    Reproduces the all-MiniLM-L6-v2 pipeline (transformer -> mean pooling ->
+    L2 normalize), so vectors match the PyTorch backend within float tolerance
+    (the int8 model within quantization error) and existing indexes stay valid.
+
+    Texts are tokenized once, sorted by length and packed into batches capped
+    by both `batch_size` and `max_batch_tokens`, so each batch is padded only
+    to its own longest sequence instead of the longest in the whole call.
+    """
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", backend="onnx", model_path=None, tokenizer_path=None,
+                 batch_size=64, max_batch_tokens=16384, max_length=256, num_threads=None):
+        """
+        Args:
+            backend: "onnx" (fp32) or "onnx-int8" (dynamically quantized weights).
+            model_path / tokenizer_path: Optional local files; otherwise they are
+                fetched from the `sentence-transformers/<model_name>` hub repo.
+            max_length: Truncation length; 256 matches the model's max_seq_length.
+            num_threads: ONNX Runtime intra-op threads (None = runtime default).
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if backend not in ONNX_FILES:
+            raise ValueError(f"Unknown ONNX backend {backend!r}; expected one of {tuple(ONNX_FILES)}")
+        repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        if model_path is None or tokenizer_path is None:
+            from huggingface_hub import hf_hub_download
+
+            model_path = model_path or hf_hub_download(repo_id, ONNX_FILES[backend])
+            tokenizer_path = tokenizer_path or hf_hub_download(repo_id, "tokenizer.json")
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch([text.replace("\n", " ") for text in texts])
+        vectors = [None] * len(texts)
+        for batch in self._batches(encodings):
+            for index, vector in zip(batch, self._run([encodings[i] for i in batch])):
+                vectors[index] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def _batches(self, encodings):
+        """Index batches of similar-length texts, bounded by count and padded tokens."""
+        order = sorted(range(len(encodings)), key=lambda i: len(encodings[i].ids))
+        batch = []
+        for index in order:
+            # Sorted ascending, so this text sets the batch's padded length.
+            length = len(encodings[index].ids)
+            if batch and (len(batch) >= self.batch_size or (len(batch) + 1) * length > self.max_batch_tokens):
+                yield batch
+                batch = []
+            batch.append(index)
+        if batch:
+            yield batch
+
+    def _run(self, encodings):
+        width = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.zeros((len(encodings), width), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), width), dtype=np.int64)
+        token_type_ids = np.zeros((len(encodings), width), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            length = len(encoding.ids)
+            input_ids[row, :length] = encoding.ids
+            attention_mask[row, :length] = encoding.attention_mask
+            token_type_ids[row, :length] = encoding.type_ids
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask, "token_type_ids": token_type_ids}
+        hidden = self.session.run(None, {name: value for name, value in feeds.items() if name in self.input_names})[0]
+
+        # Mean pooling over real tokens, then L2 normalization (as sentence-transformers does).
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+
+class BatchMetrics:
+    """Counters for the micro-batching service, shown in the sidebar."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bulk_requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.max_batch_texts = 0
+        self.max_queue_depth = 0
+        self.wait_seconds = 0.0
+        self.model_seconds = 0.0
+
+    def record_enqueue(self, depth):
+        with self.lock:
+            self.requests += 1
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def record_bulk(self):
+        with self.lock:
+            self.bulk_requests += 1
+
+    def record_batch(self, texts, wait_seconds, model_seconds):
+        with self.lock:
+            self.batches += 1
+            self.texts += texts
+            self.max_batch_texts = max(self.max_batch_texts, texts)
+            self.wait_seconds += wait_seconds
+            self.model_seconds += model_seconds
+
+    def as_dict(self):
+        with self.lock:
+            batches = self.batches or 1
+            return {
+                "requests": self.requests,
+                "bulk_requests": self.bulk_requests,
+                "batches": self.batches,
+                "texts": self.texts,
+                "avg_batch_texts": round(self.texts / batches, 2),
+                "max_batch_texts": self.max_batch_texts,
+                "max_queue_depth": self.max_queue_depth,
+                "avg_wait_ms": round(self.wait_seconds / batches * 1000, 2),
+                "avg_model_ms": round(self.model_seconds / batches * 1000, 2),
+            }
+
+    def summary(self):
+        stats = self.as_dict()
+        return (f"{stats['requests']:,} requests in {stats['batches']:,} batches · "
+                f"avg batch {stats['avg_batch_texts']} · peak queue {stats['max_queue_depth']}")
+
+
+class _EmbedRequest:
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Process-wide micro-batching front for an embedding model.
+
+    Calls from any thread are queued; one worker coalesces them (up to
+    `max_batch_size` texts) into a single `embed_documents` call and hands
+    each caller its slice through a future. Requests that queue up while a
+    batch runs form the next batch; the worker additionally waits up to
+    `max_wait_ms` for stragglers only while under load (the previous batch
+    held more than one request), so a lone caller pays no extra latency.
+    Concurrent sessions therefore share one batched forward pass instead of
+    running batch-size-1 passes that compete for the CPU.
+
+    Bulk `embed_documents` calls (at least `bulk_texts` texts, e.g. ingest
+    batches) go straight to the wrapped model on the caller's thread: they
+    gain nothing from coalescing and would otherwise hold the worker while
+    interactive queries wait behind them.
+
+    Queries are batched through `embed_documents`, so the wrapped model must
+    embed a query the same way as a document (true for all-MiniLM-L6-v2).
+    """
+
+    def __init__(self, model, max_batch_size=64, max_wait_ms=5.0, bulk_texts=16):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.bulk_texts = bulk_texts
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = BatchMetrics()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        if len(texts) >= self.bulk_texts:
+            self.metrics.record_bulk()
+            return self.model.embed_documents(list(texts))
+        return self._submit(list(texts)).result()
+
+    def embed_query(self, text):
+        return self._submit([text]).result()[0]
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def close(self):
+        """Stops the worker after it drains the queue."""
+        with self._lock:
+            if self._worker is not None:
+                self._queue.put(None)
+                self._worker.join()
+                self._worker = None
+
+    def _submit(self, texts):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+        request = _EmbedRequest(texts)
+        self._queue.put(request)
+        self.metrics.record_enqueue(self._queue.qsize())
+        return request.future
+
+    def _run(self):
+        stopping = False
+        under_load = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            size = len(first.texts)
+            deadline = time.perf_counter() + (self.max_wait if under_load else 0.0)
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            under_load = len(batch) > 1
+            self._process(batch)
+
+    def _process(self, batch):
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for request in batch for text in request.texts]
+        started = time.perf_counter()
+        try:
+            vectors = self.model.embed_documents(texts)
+        except Exception as error:
+            for request in batch:
+                request.future.set_exception(error)
+            return
+        finished = time.perf_counter()
+        wait = sum(started - request.enqueued for request in batch) / len(batch)
+        self.metrics.record_batch(len(texts), wait, finished - started)
+
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset : offset + len(request.texts)])
+            offset += len(request.texts)
@@ -0,0 +1,14 @@
+# File extensions of each loader in src/core/loaders.py. Kept in a module with
+# no heavy imports, so the upload widget can list them before the API key gate
+# without pulling in LangChain.
+EXTENSIONS = {
+    "pdf": ("pdf",),
+    "text": ("txt", "text", "log", "md", "markdown"),
+    "html": ("html", "htm"),
+    "docx": ("docx",),
+    "csv": ("csv", "tsv"),
+}
+
+
+def supported_extensions():
+    return sorted(extension for extensions in EXTENSIONS.values() for extension in extensions)
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    """One background task; progress and result are read through status()."""
+
+    def __init__(self, owner, description, payload=None):
+        self.id = os.urandom(8).hex()
+        self.owner = owner
+        self.description = description
+        # Whatever the job fills in (e.g. the MemoryManager it swaps an index into).
+        self.payload = payload
+        self.lock = threading.Lock()
+        self.state = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a worker..."
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+
+    def update(self, progress=None, message=None):
+        with self.lock:
+            if progress is not None:
+                self.progress = min(max(progress, self.progress), 1.0)
+            if message is not None:
+                self.message = message
+
+    def eta(self):
+        """Seconds left, extrapolated from progress so far (None until there is enough to go on)."""
+        with self.lock:
+            if self.state != RUNNING or self.progress < 0.05:
+                return None
+            elapsed = time.time() - self.started
+            return elapsed / self.progress * (1.0 - self.progress)
+
+    def status(self):
+        eta = self.eta()
+        with self.lock:
+            end = self.finished or time.time()
+            return {
+                "id": self.id,
+                "owner": self.owner,
+                "description": self.description,
+                "state": self.state,
+                "progress": round(self.progress, 4),
+                "message": self.message,
+                "eta_seconds": None if eta is None else round(eta, 1),
+                "elapsed_seconds": round(end - self.started, 1) if self.started else 0.0,
+                "queued_seconds": round((self.started or end) - self.submitted, 1),
+                "error": self.error,
+            }
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+
+class JobProgress:
+    """
+    Quacks like a Streamlit status container (write, progress) so code that
+    reports to the UI, such as MemoryManager, reports to a job instead. The
+    0..1 progress it receives is mapped into the job's [start, end] range.
+    """
+
+    def __init__(self, job, start=0.0, end=1.0):
+        self.job = job
+        self.start = start
+        self.end = end
+
+    def stage(self, start, end):
+        return JobProgress(self.job, start, end)
+
+    def write(self, text):
+        self.job.update(message=str(text))
+
+    def progress(self, value, text=None):
+        self.job.update(self.start + (self.end - self.start) * float(value), text)
+        return self
+
+
+class JobQueue:
+    """
+    Runs submitted functions on a small worker pool, outside any request.
+    Each function gets a JobProgress and its return value becomes the job's
+    result. Jobs are found by id, or by owner (e.g. a conversation id) so a
+    reconnecting client can pick its job up again. The most recent
+    `keep_finished` finished jobs are remembered; their payloads are dropped
+    `payload_ttl` seconds after they finish so they do not pin memory.
+    """
+
+    def __init__(self, max_workers=2, keep_finished=100, payload_ttl=900):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.keep_finished = keep_finished
+        self.payload_ttl = payload_ttl
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+
+    def submit(self, owner, description, fn, payload=None):
+        job = Job(owner, description, payload)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._trim()
+        self.executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def latest(self, owner):
+        """The owner's most recently submitted job, or None."""
+        with self.lock:
+            self._trim()
+            for job in reversed(self.jobs.values()):
+                if job.owner == owner:
+                    return job
+        return None
+
+    def statuses(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [job.status() for job in jobs]
+
+    def _run(self, job, fn):
+        with job.lock:
+            job.state = RUNNING
+            job.started = time.time()
+            job.message = "Starting..."
+        try:
+            result = fn(JobProgress(job))
+        except Exception as error:
+            traceback.print_exc()
+            with job.lock:
+                job.state, job.error, job.message = FAILED, f"{type(error).__name__}: {error}", "Failed"
+        else:
+            with job.lock:
+                job.state, job.result, job.progress, job.message = DONE, result, 1.0, "Done"
+        finally:
+            with job.lock:
+                job.finished = time.time()
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if not job.active]
+        for job_id in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
+        expired = time.time() - self.payload_ttl
+        for job in self.jobs.values():
+            if job.finished and job.finished < expired:
+                job.payload = None
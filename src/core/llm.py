@@ -0,0 +1,336 @@
+import hashlib
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from langchain_core.runnables import Runnable
+
+from src.core import tracing
+
+GROQ_MODEL = "llama-3.3-70b-versatile"
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors.
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def estimate_tokens(value):
+    """Rough token count (~4 characters per token) of a prompt value or string."""
+    text = value.to_string() if hasattr(value, "to_string") else str(value)
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """
+    Blocking token bucket refilled continuously at `per_minute` tokens a minute.
+    The balance may go negative when actual usage exceeds a reservation; later
+    callers then wait for the debt to refill.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1, timeout=None):
+        """Takes `amount` tokens, waiting for them; returns False on timeout."""
+        amount = min(amount, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+                delay = (amount - self.tokens) / self.rate
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    delay = min(delay, remaining)
+                self.condition.wait(delay)
+
+    def adjust(self, delta):
+        """Returns (positive) or charges (negative) tokens after the fact."""
+        with self.condition:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + delta)
+            self.condition.notify_all()
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets for one API key. Bursts
+    are capped at `burst_seconds` worth of budget, so a full bucket plus its
+    refill cannot overshoot a provider's rolling one-minute window by much.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, burst_seconds=10):
+        burst = burst_seconds / 60.0
+        self.requests = TokenBucket(requests_per_minute, capacity=max(1, int(requests_per_minute * burst)))
+        self.tokens = TokenBucket(tokens_per_minute, capacity=max(1, int(tokens_per_minute * burst)))
+
+    def acquire(self, tokens, timeout=None):
+        if not self.requests.acquire(1, timeout):
+            return False
+        if not self.tokens.acquire(tokens, timeout):
+            self.requests.adjust(1)
+            return False
+        return True
+
+    def settle(self, reserved, used):
+        if used is not None:
+            self.tokens.adjust(reserved - used)
+
+
+class LLMStats:
+    """Call counters and a rolling latency window, used for adaptive hedging."""
+
+    def __init__(self, window=200):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def record(self, seconds):
+        with self.lock:
+            self.calls += 1
+            self.latencies.append(seconds)
+
+    def count(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def percentile(self, q):
+        with self.lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def as_dict(self):
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "failures": self.failures,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+class GuardedChatModel(Runnable):
+    """
+    Chat model wrapper that every Groq call goes through. It waits for the API
+    key's rate-limit budget, retries 429/5xx/timeouts with full-jitter
+    exponential backoff (honouring Retry-After), and hedges slow calls: if no
+    answer arrives by the recent p95 latency, a duplicate request is sent and
+    whichever finishes first wins.
+
+    It is a Runnable, so it drops into `prompt | llm | parser` chains unchanged.
+    """
+
+    def __init__(self, model, limiter, stats, executor, max_retries=4, backoff_base=0.5, backoff_cap=20.0,
+                 hedge=True, hedge_after=None, min_hedge_after=1.0, expected_output_tokens=400):
+        """
+        Args:
+            model: The underlying chat model (its own retries should be off).
+            hedge_after: Fixed hedging delay in seconds; None adapts it to the
+                observed p95 latency (never below `min_hedge_after`).
+            expected_output_tokens: Reserved from the tokens-per-minute budget
+                up front; corrected with the response's actual usage.
+        """
+        self.model = model
+        self.limiter = limiter
+        self.stats = stats
+        self.executor = executor
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.min_hedge_after = min_hedge_after
+        self.expected_output_tokens = expected_output_tokens
+
+    def invoke(self, input, config=None, **kwargs):
+        with tracing.span("llm", model=getattr(self.model, "model_name", None)) as span:
+            reserved = estimate_tokens(input) + self.expected_output_tokens
+            for attempt in range(self.max_retries + 1):
+                self.limiter.acquire(reserved)
+                try:
+                    result = self._call(input, config, reserved, **kwargs)
+                except Exception as error:
+                    if attempt == self.max_retries or not _is_retryable(error):
+                        self.stats.count("failures")
+                        raise
+                    # A rejected or failed attempt is not billed; the retry reserves again.
+                    self.limiter.settle(reserved, 0)
+                    self.stats.count("retries")
+                    span.add("llm.retries", 1)
+                    delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                    time.sleep(max(delay, _retry_after(error) or 0.0))
+                    continue
+                usage = getattr(result, "usage_metadata", None) or {}
+                self.limiter.settle(reserved, usage.get("total_tokens"))
+                span.set(**{
+                    "llm.input_tokens": usage.get("input_tokens", 0),
+                    "llm.output_tokens": usage.get("output_tokens", 0),
+                    "llm.total_tokens": usage.get("total_tokens", 0),
+                })
+                return result
+
+    def _call(self, input, config, reserved, **kwargs):
+        started = time.perf_counter()
+        if not self.hedge:
+            result = self.model.invoke(input, config, **kwargs)
+            self.stats.record(time.perf_counter() - started)
+            return result
+
+        primary = self.executor.submit(self.model.invoke, input, config, **kwargs)
+        done, _ = wait([primary], timeout=self._hedge_delay())
+        if done:
+            self.stats.record(time.perf_counter() - started)
+            return primary.result()
+
+        # Hedge only if the budget allows it right now; never queue behind the limiter.
+        if not self.limiter.acquire(reserved, timeout=0):
+            result = primary.result()
+            self.stats.record(time.perf_counter() - started)
+            return result
+        self.stats.count("hedges")
+        span = tracing.current_span()
+        if span is not None:
+            span.set(**{"llm.hedged": True})
+        backup = self.executor.submit(self.model.invoke, input, config, **kwargs)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        self.stats.count("hedge_wins")
+                    self.stats.record(time.perf_counter() - started)
+                    # The loser cannot be aborted mid-request and still uses tokens
+                    # upstream: its reservation stands until it reports its usage.
+                    for loser in pending:
+                        loser.add_done_callback(lambda loser: self._settle_loser(loser, reserved))
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _settle_loser(self, future, reserved):
+        """Settles a hedge loser's reservation with its actual usage; a failed one stays charged in full."""
+        if future.exception() is not None:
+            return
+        usage = getattr(future.result(), "usage_metadata", None) or {}
+        self.limiter.settle(reserved, usage.get("total_tokens"))
+
+    def _hedge_delay(self):
+        if self.hedge_after is not None:
+            return self.hedge_after
+        p95 = self.stats.percentile(0.95)
+        if p95 is None or len(self.stats.latencies) < 20:
+            return max(self.min_hedge_after, 5.0)
+        return max(self.min_hedge_after, p95)
+
+
+class LLMPool:
+    """
+    Process-wide Groq client layer shared by every session: one pooled HTTP
+    connection pool, one rate limiter per API key, and one client per
+    (key, model, temperature).
+    """
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=12000, max_connections=32, timeout=60.0,
+                 base_url=None, max_workers=32, **guard_options):
+        """
+        Args:
+            requests_per_minute / tokens_per_minute: Budget per API key.
+            base_url: Optional API base, e.g. a local fake server for benchmarks.
+            guard_options: Passed to GuardedChatModel (retries, hedging, ...).
+        """
+        import httpx
+
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.timeout = timeout
+        self.base_url = base_url
+        self.guard_options = guard_options
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self._limiters = {}
+        self._stats = {}
+        self._models = {}
+
+    @staticmethod
+    def _key_id(api_key):
+        # Keys are only held by the clients themselves, never as dict keys.
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+    def chat_model(self, api_key, model=GROQ_MODEL, temperature=0):
+        from langchain_groq import ChatGroq
+
+        key_id = self._key_id(api_key)
+        with self._lock:
+            cached = self._models.get((key_id, model, temperature))
+            if cached is not None:
+                return cached
+            limiter = self._limiters.setdefault(key_id, RateLimiter(self.requests_per_minute, self.tokens_per_minute))
+            stats = self._stats.setdefault(key_id, LLMStats())
+            options = {"base_url": self.base_url} if self.base_url else {}
+            client = ChatGroq(
+                model=model,
+                temperature=temperature,
+                api_key=api_key,
+                max_retries=0,
+                timeout=self.timeout,
+                http_client=self.http_client,
+                **options,
+            )
+            guarded = GuardedChatModel(client, limiter, stats, self.executor, **self.guard_options)
+            self._models[(key_id, model, temperature)] = guarded
+            return guarded
+
+    def stats(self, api_key):
+        with self._lock:
+            stats = self._stats.get(self._key_id(api_key))
+        return stats.as_dict() if stats is not None else {}
+
+    def close(self):
+        """Closes the pooled connections and stops the hedging threads."""
+        self.executor.shutdown(wait=False)
+        self.http_client.close()
@@ -0,0 +1,378 @@
+import codecs
+import csv
+import io
+import os
+import re
+import zipfile
+from datetime import datetime
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+from langchain_core.documents import Document
+from src.core.formats import EXTENSIONS
+
+# Text-like formats are emitted as sections of roughly this many characters,
+# so a large log or export never becomes one giant string.
+TEXT_SECTION_CHARS = 32_000
+TEXT_BLOCK_BYTES = 64 * 1024
+CSV_ROWS_PER_DOCUMENT = 50
+
+
+class LoaderStats:
+    """Throughput counters for one loaded file, reported to the ingest metrics."""
+
+    def __init__(self, source, loader, unit):
+        self.source = source
+        self.loader = loader
+        self.unit = unit
+        self.units = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "source": self.source,
+            "loader": self.loader,
+            "unit": self.unit,
+            "units": self.units,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 4),
+            "bytes_per_second": round(self.bytes_per_second, 1),
+        }
+
+    def summary(self):
+        mb_per_second = self.bytes_per_second / (1024 * 1024)
+        return f"{self.source}: {self.units:,} {self.unit} · {mb_per_second:.1f} MB/s"
+
+
+class _Loader:
+    def __init__(self, name, func, unit):
+        self.name = name
+        self.load = func
+        self.unit = unit
+
+
+LOADERS = {}
+MIME_TYPES = {}
+
+
+def register_loader(name, extensions, mime_types=(), unit="pages"):
+    """
+    Registers a streaming loader for the given file extensions and MIME types.
+    A loader is called as `func(buffer, source, stats)` and yields Documents,
+    incrementing `stats.units` for every page/row/section it reads.
+    """
+    def decorator(func):
+        loader = _Loader(name, func, unit)
+        for extension in extensions:
+            LOADERS[extension.lower().lstrip(".")] = loader
+        for mime_type in mime_types:
+            MIME_TYPES[mime_type.lower()] = loader
+        return func
+    return decorator
+
+
+def get_loader(file_name, mime_type=None):
+    """Picks a loader by file extension, falling back to the MIME type."""
+    extension = os.path.splitext(file_name)[1].lower().lstrip(".")
+    loader = LOADERS.get(extension)
+    if loader is None and mime_type:
+        loader = MIME_TYPES.get(mime_type.split(";")[0].strip().lower())
+    if loader is None:
+        raise ValueError(f"No loader registered for '{file_name}' ({mime_type or 'unknown type'})")
+    return loader
+
+
+# --- STREAMING HELPERS ---
+
+class _BufferReader(io.RawIOBase):
+    """Seekable read-only file over a memoryview, so zipfile can read an upload in place."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        size = min(len(target), len(self._view) - self._pos)
+        target[:size] = self._view[self._pos : self._pos + size]
+        self._pos += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def _iter_text(buffer, encoding="utf-8-sig"):
+    """Decodes the buffer block by block; undecodable bytes are replaced, not fatal."""
+    view = memoryview(buffer)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    try:
+        for start in range(0, len(view), TEXT_BLOCK_BYTES):
+            text = decoder.decode(view[start : start + TEXT_BLOCK_BYTES])
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+    finally:
+        view.release()
+
+
+def _iter_sections(blocks, section_chars=TEXT_SECTION_CHARS):
+    """Regroups text blocks into sections, cutting at a line break where possible."""
+    pending = ""
+    for block in blocks:
+        pending += block
+        while len(pending) >= section_chars:
+            cut = pending.rfind("\n", 0, section_chars) + 1
+            if cut <= 0:
+                cut = section_chars
+            yield pending[:cut]
+            pending = pending[cut:]
+    if pending:
+        yield pending
+
+
+def _iter_lines(blocks):
+    pending = ""
+    for block in blocks:
+        pending += block
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+def _section_documents(sections, source, stats):
+    for section in sections:
+        text = section.strip()
+        if not text:
+            continue
+        yield Document(
+            page_content=text,
+            metadata={"source": source, "file_path": source, "page": stats.units},
+        )
+        stats.units += 1
+
+
+# --- LOADERS ---
+
+def _pdf_metadata(doc, source):
+    """
+    Builds the same per-document metadata PyMuPDFLoader produces, so chunks
+    parsed from memory look identical to chunks parsed from a file path.
+    """
+    raw = {
+        "producer": "PyMuPDF",
+        "creator": "PyMuPDF",
+        "creationdate": "",
+        "source": source,
+        "file_path": source,
+        "total_pages": len(doc),
+        **{k: v for k, v in doc.metadata.items() if isinstance(v, (str, int))},
+    }
+
+    metadata = {}
+    for key, value in raw.items():
+        if key.startswith("/"):
+            key = key[1:]
+        key = key.lower()
+        if key in ("creationdate", "moddate"):
+            try:
+                metadata[key] = datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                metadata[key] = value
+        elif key == "file_path":
+            metadata["source"] = value
+            metadata[key] = value
+        else:
+            metadata[key] = value.strip() if isinstance(value, str) else value
+
+    for key in ("modDate", "creationDate"):
+        if key in doc.metadata:
+            metadata[key] = doc.metadata[key]
+    return metadata
+
+
+@register_loader("pdf", EXTENSIONS["pdf"], ["application/pdf"], unit="pages")
+def load_pdf(buffer, source, stats=None):
+    """
+    Yields one Document per page from a PDF held in memory.
+    Args:
+        buffer: bytes or a memoryview (e.g. `uploaded_file.getbuffer()`); it is
+            read in place, never copied or written to disk.
+        source: Name recorded as the document's `source` metadata.
+    """
+    import pymupdf
+
+    with pymupdf.open(stream=buffer, filetype="pdf") as doc:
+        metadata = _pdf_metadata(doc, source)
+        for page in doc:
+            yield Document(
+                page_content=page.get_text().strip(),
+                metadata={**metadata, "page": page.number},
+            )
+            if stats is not None:
+                stats.units += 1
+
+
+@register_loader(
+    "text",
+    EXTENSIONS["text"],
+    ["text/plain", "text/markdown", "text/x-markdown"],
+    unit="sections",
+)
+def load_text(buffer, source, stats):
+    """Plain text and Markdown, decoded incrementally and emitted in sections."""
+    yield from _section_documents(_iter_sections(_iter_text(buffer)), source, stats)
+
+
+class _HTMLTextExtractor(HTMLParser):
+    SKIP_TAGS = {"script", "style", "noscript", "template", "head"}
+    BLOCK_TAGS = {
+        "p", "div", "br", "li", "tr", "section", "article", "header", "footer",
+        "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote", "table",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def drain(self):
+        text = "".join(self.parts)
+        self.parts = []
+        text = re.sub(r"[ \t\r\f\v]+", " ", text)
+        return re.sub(r" ?\n[ \n]*\n ?", "\n\n", text)
+
+
+@register_loader("html", EXTENSIONS["html"], ["text/html", "application/xhtml+xml"], unit="sections")
+def load_html(buffer, source, stats):
+    """HTML fed to the parser block by block; scripts and styles are dropped."""
+    def blocks():
+        parser = _HTMLTextExtractor()
+        for text in _iter_text(buffer):
+            parser.feed(text)
+            yield parser.drain()
+        parser.close()
+        yield parser.drain()
+
+    yield from _section_documents(_iter_sections(blocks()), source, stats)
+
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+@register_loader(
+    "docx",
+    EXTENSIONS["docx"],
+    ["application/vnd.openxmlformats-officedocument.wordprocessingml.document"],
+    unit="paragraphs",
+)
+def load_docx(buffer, source, stats):
+    """Word documents, streamed paragraph by paragraph from word/document.xml."""
+    def paragraphs():
+        with _BufferReader(buffer) as reader, zipfile.ZipFile(reader) as archive:
+            with archive.open("word/document.xml") as xml_file:
+                parts = []
+                for _, element in ElementTree.iterparse(xml_file, events=("end",)):
+                    if element.tag == _WORD_NS + "t":
+                        parts.append(element.text or "")
+                    elif element.tag == _WORD_NS + "tab":
+                        parts.append("\t")
+                    elif element.tag in (_WORD_NS + "br", _WORD_NS + "cr"):
+                        parts.append("\n")
+                    elif element.tag == _WORD_NS + "p":
+                        stats.units += 1
+                        text = "".join(parts)
+                        parts = []
+                        element.clear()
+                        if text.strip():
+                            yield text + "\n\n"
+
+    for index, section in enumerate(_iter_sections(paragraphs())):
+        text = section.strip()
+        if text:
+            yield Document(
+                page_content=text,
+                metadata={"source": source, "file_path": source, "page": index},
+            )
+
+
+@register_loader("csv", EXTENSIONS["csv"], ["text/csv", "text/tab-separated-values"], unit="rows")
+def load_csv(buffer, source, stats):
+    """
+    CSV/TSV exports, read row by row. Every CSV_ROWS_PER_DOCUMENT rows become
+    one Document, with each row rendered as `column: value` pairs.
+    """
+    delimiter = "\t" if source.lower().endswith(".tsv") else ","
+    reader = csv.reader(_iter_lines(_iter_text(buffer)), delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        return
+
+    rows = []
+    first_row = 1
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        rows.append("; ".join(f"{column}: {value}" for column, value in zip(header, row)))
+        stats.units += 1
+        if len(rows) == CSV_ROWS_PER_DOCUMENT:
+            yield _csv_document(rows, source, first_row)
+            first_row = stats.units + 1
+            rows = []
+    if rows:
+        yield _csv_document(rows, source, first_row)
+
+
+def _csv_document(rows, source, first_row):
+    return Document(
+        page_content="\n".join(rows),
+        metadata={
+            "source": source,
+            "file_path": source,
+            "page": (first_row - 1) // CSV_ROWS_PER_DOCUMENT,
+            "row": first_row,
+        },
+    )
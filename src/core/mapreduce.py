@@ -0,0 +1,232 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.core import tracing
+from src.core.websearch import TTLCache
+
+# Bump when the map prompt changes, so cached notes from the old prompt are not reused.
+MAP_PROMPT_VERSION = 1
+
+
+class MapReduceSummarizer:
+    """
+    Answers corpus-wide questions ("summarize the main argument of my
+    documents") that top-k retrieval cannot cover.
+
+    Map: consecutive chunks of each file are grouped into parts of at most
+    `map_chars` characters and each part is condensed into notes, at most
+    `max_workers` LLM calls at a time. The notes do not depend on the
+    question, so they are cached by the part's source and content and a
+    repeat summary of the same corpus only pays for the reduce step. Part
+    boundaries depend on the chunks' content (see `group`), so after a file
+    is edited only the parts around the change are summarized again.
+    Reduce: while the notes exceed `reduce_chars`, batches of them are merged
+    (again in parallel) with the question in view; the final notes then go
+    into one answering call. If `max_rounds` merges are not enough, the
+    notes are cut to fit and the answering call is told so.
+
+    At most `max_parts` parts are summarized per run (cached notes are free).
+    Beyond that, an evenly spaced sample of the uncached parts is read, and the
+    answering call is told how much of the collection it covers; callers can
+    check `uncached_parts` first and answer some other way instead.
+    """
+
+    map_prompt = ChatPromptTemplate.from_template("""
+    Condense this excerpt of "{source}" into short notes: its main points, arguments,
+    conclusions and key figures. Do not add anything that is not in the excerpt.
+
+    Excerpt: {text}
+    Notes:
+    """)
+
+    combine_prompt = ChatPromptTemplate.from_template("""
+    Merge these notes from several parts of a document collection into one set of notes.
+    Keep what helps answer the question, drop repetition, and keep source names.
+
+    Question: {question}
+    Notes: {notes}
+    Merged notes:
+    """)
+
+    answer_prompt = ChatPromptTemplate.from_template("""
+    These notes cover an entire document collection. Answer the question from them.
+
+    Notes: {notes}
+    Question: {question}
+    """)
+
+    def __init__(self, llm, cache=None, max_workers=4, map_chars=6000, reduce_chars=8000, max_rounds=5,
+                 max_parts=64):
+        self.llm = llm
+        self.cache = cache if cache is not None else TTLCache("map_notes", ttl=7 * 24 * 3600, max_entries=4096)
+        self.max_workers = max_workers
+        self.map_chars = map_chars
+        self.reduce_chars = reduce_chars
+        self.max_rounds = max_rounds
+        self.max_parts = max_parts
+
+    def group(self, documents):
+        """
+        Consecutive chunks of the same file, in parts of at most `map_chars`
+        characters. Past half of `map_chars`, a part ends after any chunk whose
+        content hash says so (about once every `map_chars` / 4 characters), so
+        a boundary depends on the chunks around it rather than on everything
+        before it in the file.
+        """
+        parts, current, size = [], [], 0
+        for doc in documents:
+            length = len(doc.page_content)
+            if current and (size + length > self.map_chars
+                            or doc.metadata.get("source") != current[0].metadata.get("source")):
+                parts.append(current)
+                current, size = [], 0
+            current.append(doc)
+            size += length
+            if size >= self.map_chars // 2 and self._is_boundary(doc):
+                parts.append(current)
+                current, size = [], 0
+        if current:
+            parts.append(current)
+        return parts
+
+    def _is_boundary(self, doc):
+        digest = hashlib.sha256(doc.page_content.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64 < len(doc.page_content) / (self.map_chars / 4)
+
+    def run(self, question, documents, status_container=None):
+        """Returns (answer, stats) for `question` over every chunk in `documents`."""
+        parts = self.group(documents)
+        stats = {"chunks": len(documents), "parts": len(parts), "cached": 0, "reduce_rounds": 0}
+        with tracing.span("map", parts=len(parts)) as span:
+            notes = self._map(parts, stats, status_container)
+            span.set(cached=stats["cached"])
+        with tracing.span("reduce") as span:
+            notes = self._reduce(question, notes, stats, status_container)
+            span.set(rounds=stats["reduce_rounds"])
+        if stats.get("skipped_parts"):
+            read = stats["parts"] - stats["skipped_parts"]
+            notes.append(f"(Only {read} of {stats['parts']} parts of the collection were read, evenly spread; "
+                         f"details from the others may be missing.)")
+        with tracing.span("generate", tool="MAP_REDUCE"):
+            answer = (self.answer_prompt | self.llm | StrOutputParser()).invoke(
+                {"notes": "\n\n".join(notes), "question": question}
+            )
+        return answer, stats
+
+    def uncached_parts(self, documents):
+        """How many map calls a run over `documents` would need without a budget."""
+        return sum(1 for part in self.group(documents) if self.cache.get(self._key(part)) is None)
+
+    def _map(self, parts, stats, status_container):
+        notes = [None] * len(parts)
+        pending = []
+        for index, part in enumerate(parts):
+            key = self._key(part)
+            cached = self.cache.get(key)
+            if cached is None:
+                pending.append((index, key, part))
+            else:
+                notes[index] = cached
+        stats["cached"] = len(parts) - len(pending)
+        if len(pending) > self.max_parts:
+            # Over budget: an evenly spaced sample, so every file region is still represented.
+            step = len(pending) / self.max_parts
+            stats["skipped_parts"] = len(pending) - self.max_parts
+            pending = [pending[int(i * step)] for i in range(self.max_parts)]
+            if status_container:
+                status_container.write(f"📉 Reading {self.max_parts} of {len(parts) - stats['cached']} "
+                                       f"uncached parts (budget {self.max_parts}).")
+
+        progress_bar = None
+        if status_container and pending:
+            progress_bar = status_container.progress(
+                0, text=f"Summarizing {len(pending)} parts ({stats['cached']} cached)..."
+            )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="map") as pool:
+            futures = {
+                pool.submit(tracing.propagate(self._map_part), part): (index, key) for index, key, part in pending
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                index, key = futures[future]
+                notes[index] = future.result()
+                self.cache.put(key, notes[index])
+                if progress_bar:
+                    remaining = (time.perf_counter() - started) / done * (len(pending) - done)
+                    progress_bar.progress(done / len(pending),
+                                          text=f"Summarized {done}/{len(pending)} parts, ~{remaining:.0f}s left...")
+        return [note for note in notes if note is not None]
+
+    def _map_part(self, part):
+        source = _source(part)
+        text = "\n\n".join(doc.page_content for doc in part)
+        notes = (self.map_prompt | self.llm | StrOutputParser()).invoke({"source": source, "text": text}).strip()
+        return f"[{source}] {notes}"
+
+    def _reduce(self, question, notes, stats, status_container):
+        # A single note over half the budget could never be paired with another one.
+        notes = _clip(notes, self.reduce_chars // 2, stats)
+        while sum(len(note) for note in notes) > self.reduce_chars and stats["reduce_rounds"] < self.max_rounds:
+            stats["reduce_rounds"] += 1
+            batches = self._batch(notes)
+            if status_container:
+                status_container.write(f"🧩 Merging {len(notes)} notes into {len(batches)}...")
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="reduce") as pool:
+                # One propagated context per task: a context cannot be entered by two threads at once.
+                futures = [pool.submit(tracing.propagate(self._merge), question, batch) for batch in batches]
+                notes = [future.result() for future in futures]
+            notes = _clip(notes, self.reduce_chars // 2, stats)
+
+        total = sum(len(note) for note in notes)
+        if total > self.reduce_chars:
+            # Out of rounds: cut every note by the same share rather than dropping whole sources.
+            notes = _clip(notes, self.reduce_chars // len(notes), stats)
+            kept = sum(len(note) for note in notes)
+            if status_container:
+                status_container.write(f"✂️ Notes still too long after {self.max_rounds} merge rounds; "
+                                       f"cut from {total:,} to {kept:,} characters.")
+        if stats.get("truncated_chars"):
+            notes.append(f"(To fit, {stats['truncated_chars']:,} characters of these notes were cut; "
+                         f"some details of the collection may be missing.)")
+        return notes
+
+    def _batch(self, notes):
+        batches, current, size = [], [], 0
+        for note in notes:
+            if current and size + len(note) > self.reduce_chars:
+                batches.append(current)
+                current, size = [], 0
+            current.append(note)
+            size += len(note)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _merge(self, question, batch):
+        if len(batch) == 1:
+            return batch[0]
+        return (self.combine_prompt | self.llm | StrOutputParser()).invoke(
+            {"question": question, "notes": "\n\n".join(batch)}
+        ).strip()
+
+    @staticmethod
+    def _key(part):
+        # Not TTLCache.make_key: that lowercases and folds whitespace, and the notes quote the source.
+        fields = ("map", MAP_PROMPT_VERSION, _source(part), *(doc.page_content for doc in part))
+        return hashlib.sha256("\0".join(str(field) for field in fields).encode("utf-8")).hexdigest()
+
+
+def _clip(notes, limit, stats):
+    """Cuts each note to `limit` characters, adding what was cut to stats["truncated_chars"]."""
+    cut = sum(max(len(note) - limit, 0) for note in notes)
+    if cut:
+        stats["truncated_chars"] = stats.get("truncated_chars", 0) + cut
+    return [note[:limit] for note in notes]
+
+
+def _source(part):
+    return part[0].metadata.get("source") or "document"
@@ -1,85 +1,545 @@
+import contextlib
+import threading
 import time
+import warnings
+import weakref
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from src.core.compact import METRICS, STORAGE_MODES, CompactDocstore, make_index
+from src.core.dedup import refresh_provenance
 from src.core.processing import get_embeddings
+from src.core.sections import SECTION_PAGES, SectionIndex
+
+def _docstore_items(store):
+    """(id, Document) pairs for either docstore type."""
+    if isinstance(store.docstore, CompactDocstore):
+        return list(store.docstore.items())
+    return list(store.docstore._dict.items())
+
+def _replace_doc(store, doc_id, doc):
+    if isinstance(store.docstore, CompactDocstore):
+        store.docstore.replace(doc_id, doc)
+    else:
+        store.docstore._dict[doc_id] = doc
+
+# Squared-L2 cut-off used before thresholds were calibrated (cosine 0.25 on unit vectors).
+LEGACY_L2_THRESHOLD = 1.5
+# Chunks sampled at ingest to calibrate the relevance threshold (see calibrate).
+CALIBRATION_SAMPLE = 64
+MIN_CALIBRATION_SAMPLE = 8
+
+def _pseudo_query(text, rng):
+    """A sentence of the chunk, trimmed to question length, standing in for a user query."""
+    sentences = [sentence.split() for sentence in text.replace("\n", " ").split(". ")]
+    sentences = [words for words in sentences if len(words) >= 5] or [text.split()]
+    words = sentences[rng.integers(len(sentences))]
+    return " ".join(words[:16])
+
+def calibrate(embeddings, texts, vectors, seed=0):
+    """
+    Relevance threshold for a corpus, from the score distributions of
+    pseudo-queries (a sentence of a sampled chunk) against their own chunk
+    (related) and the other sampled chunks (unrelated). The threshold is the
+    95th percentile of unrelated similarities, lowered if needed so that at
+    least 75% of related pairs still pass. Similarities are cosines.
+    Returns None when the sample is too small to say anything.
+    """
+    if len(texts) < MIN_CALIBRATION_SAMPLE:
+        return None
+    rng = np.random.default_rng(seed)
+    queries = np.asarray(embeddings.embed_documents([_pseudo_query(text, rng) for text in texts]), dtype=np.float32)
+    chunks = np.asarray(vectors, dtype=np.float32)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    chunks /= np.maximum(np.linalg.norm(chunks, axis=1, keepdims=True), 1e-12)
+    similarities = queries @ chunks.T
+    related = np.diag(similarities)
+    unrelated = similarities[~np.eye(len(texts), dtype=bool)]
+    threshold = min(np.percentile(unrelated, 95), np.percentile(related, 25))
+    return {
+        "samples": len(texts),
+        "related_p50": round(float(np.percentile(related, 50)), 4),
+        "unrelated_p95": round(float(np.percentile(unrelated, 95)), 4),
+        "threshold_similarity": round(float(threshold), 4),
+    }
+
+def _calibrate_store(embeddings, store):
+    """
+    `calibrate` on up to CALIBRATION_SAMPLE chunks drawn from the whole store,
+    so after an incremental ingest it reflects the corpus, not just the new files.
+    Vectors are read back from the index (as searches see them).
+    """
+    total = store.index.ntotal
+    rng = np.random.default_rng(total)
+    positions = sorted(rng.choice(total, size=min(CALIBRATION_SAMPLE, total), replace=False).tolist())
+    texts = [store.docstore.search(store.index_to_docstore_id[position]).page_content for position in positions]
+    vectors = [store.index.reconstruct(position) for position in positions]
+    return calibrate(embeddings, texts, vectors)
+
+def _faiss_store(**kwargs):
+    # LangChain warns that normalize_L2 only applies to L2, but it is what turns
+    # inner product into cosine similarity here.
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="Normalizing L2 is not applicable")
+        return FAISS(**kwargs)
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+def _add_batch(store, batch, vectors):
+    """Adds embedded chunks to the store and returns their doc ids."""
+    return store.add_embeddings(
+        zip([doc.page_content for doc in batch], vectors),
+        metadatas=[doc.metadata for doc in batch],
+    )
+
+class _ReadWriteGate:
+    """Any number of readers at once, or one writer alone; a waiting writer goes before new readers."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextlib.contextmanager
+    def reading(self):
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def writing(self):
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
 
 class MemoryManager:
-    def __init__(self, embedding_model=None):
+    """
+    Concurrency: writers (ingest_docs, load_shared, clear) are serialized by
+    `write_lock` and do their slow work (embedding, summaries) before touching
+    the live store. Readers take the current store once per call and use only
+    that. A write either publishes a new store with one assignment, or appends
+    its chunks to this manager's own store while holding `gate` exclusively;
+    searches hold it shared. So any number of searches run in parallel, wait
+    at most for an append (not for embedding), and never see a half-built
+    index. Stores shared through a CorpusRegistry are never modified.
+    """
+
+    def __init__(self, embedding_model=None, deduplicator=None, storage="flat", docstore_dir=None, metric="l2",
+                 score_threshold=None, summarizer=None, section_pages=SECTION_PAGES, top_sections=8):
         """
         Initializes the Memory Manager.
         Args:
             embedding_model: Optional. If None, loads the default model.
+            deduplicator: Optional ChunkDeduplicator; near-duplicate chunks are
+                collapsed before embedding when set.
+            storage: "flat" (float32 vectors + Document objects), or the compact
+                "fp16"/"sq8" modes: scalar-quantized vectors and a CompactDocstore.
+            docstore_dir: Optional. In compact modes, keeps chunk text in a
+                memory-mapped temp file in this directory instead of RAM.
+            metric: "l2" (squared L2 distance, lower is better) or "ip" (inner
+                product over L2-normalized vectors, i.e. cosine, higher is better).
+            score_threshold: Relevance cut-off in the metric's own units, or
+                "auto" to calibrate it per corpus at ingest (see `calibrate`).
+                None means "auto" for "ip" and the legacy 1.5 for "l2".
+            summarizer: Optional section summarizer (see src/core/sections.py).
+                When set, every `section_pages` pages get a summary in a small
+                top-level index, and searches first pick the `top_sections`
+                best sections, then rank only the chunks inside them.
         """
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode {storage!r}; expected one of {STORAGE_MODES}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}")
         if embedding_model is None:
             self.embeddings = get_embeddings()
         else:
             self.embeddings = embedding_model
-            
+
         self.vector_store = None
+        self.deduplicator = deduplicator
+        self.storage = storage
+        self.docstore_dir = docstore_dir
+        self.metric = metric
+        if score_threshold is None:
+            score_threshold = "auto" if metric == "ip" else LEGACY_L2_THRESHOLD
+        self.score_threshold = score_threshold
+        self.summarizer = summarizer
+        self.section_pages = section_pages
+        self.top_sections = top_sections
+
+        # Set while attached to a store owned by a CorpusRegistry (read-only).
+        self.shared_key = None
+        self._shared_release = None
+        self.write_lock = threading.Lock()
+        self.gate = _ReadWriteGate()
 
     def ingest_docs(self, splits, status_container=None):
         """
         Ingests documents in batches to show progress in the UI.
+        The chunks are embedded first and then appended to the store in one
+        step under `gate`. A store shared through a CorpusRegistry is copied
+        first, since other sessions read it without this manager's gate.
+        """
+        if not splits:
+            return
+
+        with self.write_lock:
+            previous_release = self._shared_release
+            store = self.vector_store
+            if store is not None and previous_release is not None:
+                store = self._copy_store(store)
+            self.vector_store = self._embed_into(store, splits, status_container)
+            self._shared_release = None
+            self.shared_key = None
+            if previous_release is not None:
+                previous_release()
+
+    def load_shared(self, registry, fingerprint, load_splits, status_container=None, keep_sources=None):
+        """
+        Attaches to the registry's index for `fingerprint`, building it from
+        `load_splits()` only when no other session has done so already. The
+        registry's index then replaces whatever this manager held.
+        Args:
+            keep_sources: Optional set of content hashes whose chunks can be
+                reused from the current store. When given, `load_splits()` only
+                has to return chunks for the remaining (new) files.
+        Returns True if this call had to build the index.
+        """
+        built = False
+
+        def build():
+            nonlocal built
+            built = True
+            base = None
+            if keep_sources is not None:
+                # Under the lock, so an ingest is not appending to the store while it is copied.
+                with self.write_lock:
+                    base = self._copy_store(self.vector_store) if self.vector_store is not None else None
+            if base is not None:
+                stale_ids = []
+                for doc_id, doc in _docstore_items(base):
+                    refreshed = refresh_provenance(doc, keep_sources)
+                    if refreshed is None:
+                        stale_ids.append(doc_id)
+                    elif refreshed is not doc:
+                        _replace_doc(base, doc_id, refreshed)
+                if stale_ids:
+                    base.delete(stale_ids)
+                    if getattr(base, "dedup_index", None) is not None:
+                        base.dedup_index.remove(stale_ids)
+            store = self._embed_into(base, load_splits(), status_container)
+            if store is not None and store.index.ntotal == 0:
+                return None
+            return store
+
+        # Not under write_lock: this may wait for another session's build of the same corpus.
+        store = registry.acquire(fingerprint, build)
+        with self.write_lock:
+            if store is None:
+                self.vector_store = None
+                self._release_shared()
+                return built
+
+            # Searches running meanwhile (e.g. while this runs as a background
+            # job) keep using the old store until this assignment.
+            previous_release = self._shared_release
+            self.vector_store = store
+            self.shared_key = fingerprint
+            # Release our reference if the session is dropped without a clear().
+            self._shared_release = weakref.finalize(self, registry.release, fingerprint)
+            if previous_release is not None:
+                previous_release()
+        return built
+
+    def _embed_into(self, store, splits, status_container=None):
         """
+        Embeds `splits` into `store` (created if None) and returns the store.
+        Nothing is changed until every chunk is embedded; when `store` is the
+        one searches are using, the changes are then made under `gate`.
+        """
+        live = store is not None and store is self.vector_store
+        updated = {}
+        signatures = None
+        if self.deduplicator is not None and splits:
+            index = self._dedup_index(store)
+            result = self.deduplicator.deduplicate(splits, index=index,
+                                                   lookup=store.docstore.search if store is not None else None)
+            updated = result.updated
+            if result.removed and status_container:
+                status_container.write(f"🧹 Collapsed {result.removed} near-duplicate chunks.")
+            splits = result.documents
+            signatures = result.signatures
+
         total_chunks = len(splits)
         # Process 100 chunks at a time for speed
         batch_size = 100
-        
-        if total_chunks == 0:
-            return
+
+        if total_chunks == 0 and store is None:
+            return None
 
         # --- THE FIX: Create the Progress Bar ONCE ---
         progress_bar = None
-        if status_container:
+        if status_container and total_chunks:
             progress_bar = status_container.progress(0, text="Starting embedding...")
 
-        # 1. Initialize with first batch
-        first_batch = splits[:batch_size]
-        if self.vector_store is None:
-            self.vector_store = FAISS.from_documents(first_batch, self.embeddings)
-        else:
-            self.vector_store.add_documents(first_batch)
-            
-        # Update the existing bar
-        if progress_bar:
-            progress_bar.progress(min(batch_size / total_chunks, 1.0), 
-                                text=f"Embedded {min(batch_size, total_chunks)}/{total_chunks} chunks...")
-
-        # 2. Process remaining batches
-        for i in range(batch_size, total_chunks, batch_size):
+        embedded = []
+        for i in range(0, total_chunks, batch_size):
             batch = splits[i : i + batch_size]
-            self.vector_store.add_documents(batch)
-            
+            vectors = np.asarray(self.embeddings.embed_documents([doc.page_content for doc in batch]), dtype=np.float32)
+            embedded.append((batch, vectors))
+
             # Update the SAME bar (don't create new ones)
             if progress_bar:
                 progress = min((i + batch_size) / total_chunks, 1.0)
-                progress_bar.progress(progress, 
+                progress_bar.progress(progress,
                                     text=f"Embedded {min(i + batch_size, total_chunks)}/{total_chunks} chunks...")
                 time.sleep(0.01)
 
+        with self.gate.writing() if live else contextlib.nullcontext():
+            for doc_id, doc in updated.items():
+                _replace_doc(store, doc_id, doc)
+            doc_ids = []
+            if embedded:
+                if store is None:
+                    store = self._new_store(embedded[0][1].shape[1])
+                if not store.index.is_trained:
+                    # Quantized indexes must be trained before anything is added (first build only).
+                    training = np.vstack([vectors for _, vectors in embedded])
+                    if store._normalize_L2:
+                        training /= np.maximum(np.linalg.norm(training, axis=1, keepdims=True), 1e-12)
+                    store.index.train(training)
+                for batch, vectors in embedded:
+                    doc_ids.extend(_add_batch(store, batch, vectors))
+
+        if signatures is not None:
+            # Only the new chunks are signed; the rest of the index comes from the store.
+            if index is None:
+                index = self.deduplicator.new_index()
+            for doc_id, doc, signature in zip(doc_ids, splits, signatures):
+                index.add(doc_id, doc.page_content, signature)
+            store.dedup_index = index
+        else:
+            # Chunks added without signatures would be missing from the index.
+            store.dedup_index = None
+
+        # Kept on the store, so sessions sharing or copying it share the calibration.
+        # A fixed threshold never reads it, so its embedding calls are skipped.
+        store.calibration = _calibrate_store(self.embeddings, store) if self.score_threshold == "auto" else None
+        self._build_sections(store, status_container)
+        return store
+
+    def _dedup_index(self, store):
+        """The store's DedupIndex, signing its chunks only if it has none under the current settings."""
+        if store is None:
+            return None
+        index = getattr(store, "dedup_index", None)
+        if index is None or index.params != self.deduplicator.params:
+            index = self.deduplicator.new_index(_docstore_items(store))
+        return index
+
+    def _build_sections(self, store, status_container=None):
+        """(Re)builds the store's section index; unchanged sections keep their summaries."""
+        if self.summarizer is None:
+            return
+        if status_container:
+            status_container.write("🗂️ Summarizing sections...")
+        store.sections = SectionIndex.build(
+            store, self.embeddings, self.summarizer, self.section_pages, previous=getattr(store, "sections", None)
+        )
+
+    def _new_store(self, dimension):
+        if self.storage == "flat":
+            docstore = InMemoryDocstore()
+        else:
+            docstore = CompactDocstore(directory=self.docstore_dir)
+        from langchain_community.vectorstores.utils import DistanceStrategy
+
+        return _faiss_store(
+            embedding_function=self.embeddings,
+            index=make_index(dimension, self.storage, self.metric),
+            docstore=docstore,
+            index_to_docstore_id={},
+            # Inner product only means cosine on unit vectors; FAISS normalizes on add and query.
+            normalize_L2=self.metric == "ip",
+            distance_strategy=(
+                DistanceStrategy.MAX_INNER_PRODUCT if self.metric == "ip" else DistanceStrategy.EUCLIDEAN_DISTANCE
+            ),
+        )
+
+    @staticmethod
+    def _copy_store(store):
+        """Copies the index and id mappings; Document objects are shared, not duplicated."""
+        import faiss
+
+        if isinstance(store.docstore, CompactDocstore):
+            docstore = store.docstore.copy()
+        else:
+            docstore = InMemoryDocstore(dict(store.docstore._dict))
+        copy = _faiss_store(
+            embedding_function=store.embedding_function,
+            index=faiss.clone_index(store.index),
+            docstore=docstore,
+            index_to_docstore_id=dict(store.index_to_docstore_id),
+            normalize_L2=store._normalize_L2,
+            distance_strategy=store.distance_strategy,
+        )
+        copy.calibration = getattr(store, "calibration", None)
+        copy.sections = getattr(store, "sections", None)
+        dedup_index = getattr(store, "dedup_index", None)
+        copy.dedup_index = dedup_index.copy() if dedup_index is not None else None
+        return copy
+
+    def _release_shared(self):
+        if self._shared_release is not None:
+            self._shared_release()
+        self._shared_release = None
+        self.shared_key = None
+
     def get_embedding_model(self):
         """Returns the active embedding model."""
         return self.embeddings
-        
+
     def search(self, query, k=5, score_threshold=None):
         """
         Searches for vectors similar to the query.
         """
-        if not self.vector_store:
+        store = self.vector_store
+        if not store:
             return []
+        # Embedded before taking the gate, so an append does not wait for it.
+        return self._search_by_vector(store, self.embeddings.embed_query(query), k, score_threshold)
 
-        # Always use similarity_search_with_score so we get (doc, score) tuples
-        results_with_scores = self.vector_store.similarity_search_with_score(query, k=k)
-        
+    def search_by_vector(self, vector, k=5, score_threshold=None):
+        """Like `search`, for a query that has already been embedded."""
+        store = self.vector_store
+        if not store:
+            return []
+        return self._search_by_vector(store, vector, k, score_threshold)
+
+    def _search_by_vector(self, store, vector, k, score_threshold):
+        sections = self._section_index(store)
+        results_with_scores = None
+        with self.gate.reading():
+            if sections is not None:
+                results_with_scores = self._search_sections(store, sections, vector, k)
+            if results_with_scores is None:
+                results_with_scores = store.similarity_search_with_score_by_vector(vector, k=k)
+        return self._filter(results_with_scores, score_threshold)
+
+    def search_summaries(self, query, k=5, vector=None):
+        """
+        The `k` section summaries closest to the query, as (Document, score)
+        pairs in the metric's units. Suits broad questions ("summarize the
+        report") better than a handful of scattered chunks. Empty without a
+        section index. `vector` is the query's embedding, if already computed.
+        """
+        sections = getattr(self.vector_store, "sections", None)
+        if sections is None:
+            return []
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+        rows = sections.top(_unit(vector), k)
+        return [(sections.document(row), self.similarity_to_score(similarity)) for row, similarity in rows]
+
+    def _section_index(self, store):
+        """The section index, when there are enough sections for picking some to narrow the search."""
+        sections = getattr(store, "sections", None)
+        if sections is None or len(sections) <= 2 * self.top_sections:
+            return None
+        return sections
+
+    def _search_sections(self, store, sections, vector, k):
+        """Two-stage search: best sections by summary, then FAISS restricted to their chunks."""
+        import faiss
+
+        query = _unit(vector)
+        rows = [row for row, _ in sections.top(query, self.top_sections)]
+        ids = sections.candidate_ids(rows)
+        if len(ids) < k:
+            return None
+        if not store._normalize_L2:
+            query = np.asarray(vector, dtype=np.float32)
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+        scores, positions = store.index.search(query[None, :], k, params=params)
+        results = []
+        for score, position in zip(scores[0], positions[0]):
+            if position < 0:
+                continue
+            doc = store.docstore.search(store.index_to_docstore_id[int(position)])
+            results.append((doc, float(score)))
+        return results
+
+    def documents(self):
+        """Every chunk in index order: files in ingest order, each file's chunks in reading order."""
+        store = self.vector_store
+        if not store:
+            return []
+        with self.gate.reading():
+            return [store.docstore.search(store.index_to_docstore_id[position])
+                    for position in sorted(store.index_to_docstore_id)]
+
+    def score_to_similarity(self, score):
+        """
+        Cosine similarity for a search score. Inner-product scores already are
+        cosines; embeddings are unit length, so a squared L2 distance is 2 - 2cos.
+        """
+        if self.metric == "ip":
+            return float(score)
+        return 1.0 - float(score) / 2.0
+
+    def similarity_to_score(self, similarity):
+        return float(similarity) if self.metric == "ip" else 2.0 - 2.0 * float(similarity)
+
+    @property
+    def calibration(self):
+        """Score statistics computed at ingest for the current corpus (None before any ingest)."""
+        return getattr(self.vector_store, "calibration", None)
+
+    @property
+    def relevance_threshold(self):
+        """The effective relevance cut-off in the metric's units, or None if there is none yet."""
+        if self.score_threshold != "auto":
+            return self.score_threshold
+        calibration = self.calibration
+        if calibration is None:
+            return None
+        return self.similarity_to_score(calibration["threshold_similarity"])
+
+    def filter_relevant(self, results_with_scores):
+        """Results that pass the relevance threshold (possibly none); no second search is needed."""
+        return self._filter(results_with_scores, self.relevance_threshold)
+
+    def _filter(self, results_with_scores, score_threshold):
         if score_threshold is not None:
-            # Filter results. Note: For FAISS L2 distance, Lower score = Better match.
-            filtered_results = [
-                (doc, score) for doc, score in results_with_scores 
-                if score <= score_threshold
-            ]
-            return filtered_results
-            
+            # L2 distance: lower is better. Inner product: higher is better.
+            if self.metric == "ip":
+                return [(doc, score) for doc, score in results_with_scores if score >= score_threshold]
+            return [(doc, score) for doc, score in results_with_scores if score <= score_threshold]
+
         return results_with_scores
-    
+
     def clear(self):
         """Clears the vector store memory."""
-        self.vector_store = None
\ No newline at end of file
+        with self.write_lock:
+            self.vector_store = None
+            self._release_shared()
@@ -1,50 +1,156 @@
 import os
-import tempfile
-from langchain_community.document_loaders import PyMuPDFLoader  # FAST LOADER
-from langchain_text_splitters import RecursiveCharacterTextSplitter 
-from langchain_huggingface import HuggingFaceEmbeddings
+import mmap
+import time
+import hashlib
+from src.core.loaders import LoaderStats, get_loader
+from src.core.splitter import OffsetTextSplitter
 
-def get_embeddings():
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+def get_embeddings(backend="torch", num_threads=None, batch_size=None):
+    """
+    Returns the embedding model for `backend`:
+    "torch" (sentence-transformers via HuggingFaceEmbeddings), "onnx" (ONNX
+    Runtime, fp32) or "onnx-int8" (ONNX Runtime, int8-quantized weights).
+    The ONNX backends produce the same vectors within tolerance and never
+    import PyTorch. `num_threads` and `batch_size` tune the ONNX backends.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {EMBEDDING_BACKENDS}")
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+    from src.core.embeddings import OnnxEmbeddings
+
+    options = {"num_threads": num_threads}
+    if batch_size:
+        options["batch_size"] = batch_size
+    return OnnxEmbeddings(model_name=EMBEDDING_MODEL_NAME, backend=backend, **options)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def hash_upload(uploaded_file):
+    """
+    Returns the SHA-256 hex digest of an uploaded file's contents.
+    Hashes the upload's buffer in place, block by block, without copying it.
+    """
+    digest = hashlib.sha256()
+    with uploaded_file.getbuffer() as view:
+        for start in range(0, len(view), HASH_BLOCK_SIZE):
+            digest.update(view[start : start + HASH_BLOCK_SIZE])
+    return digest.hexdigest()
+
+def build_manifest(uploaded_files, hash_cache=None, aliases=None):
     """
-    Returns the HuggingFace embedding model.
+    Maps content hash -> uploaded file. Uploads with identical bytes collapse
+    into one entry (the first one uploaded), and renaming a file does not
+    change its key.
+    Args:
+        hash_cache: Optional dict of upload `file_id` -> hash, so unchanged
+            uploads are not re-hashed on every rerun.
+        aliases: Optional dict filled with content hash -> names of the other
+            uploads that have the same bytes as the manifest's entry.
     """
-    return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+    manifest = {}
+    for file_obj in uploaded_files:
+        file_id = getattr(file_obj, "file_id", None)
+        if hash_cache is not None and file_id and file_id in hash_cache:
+            content_hash = hash_cache[file_id]
+        else:
+            content_hash = hash_upload(file_obj)
+            if hash_cache is not None and file_id:
+                hash_cache[file_id] = content_hash
+        kept = manifest.setdefault(content_hash, file_obj)
+        if aliases is not None and kept is not file_obj and file_obj.name != kept.name:
+            names = aliases.setdefault(content_hash, [])
+            if file_obj.name not in names:
+                names.append(file_obj.name)
+    return manifest
 
 class DocumentProcessor:
-    def __init__(self, chunk_size=1000):
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=200
-        )
+    def __init__(self, chunk_size=1000, splitter="recursive", length_unit="chars"):
+        """
+        Args:
+            splitter: "recursive" (LangChain's RecursiveCharacterTextSplitter) or
+                "offset" (OffsetTextSplitter: same chunks, faster).
+            length_unit: "chars" or "tokens" (tiktoken); tokens need splitter="offset".
+        """
+        if splitter == "offset":
+            self.splitter = OffsetTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=200,
+                length_unit=length_unit,
+            )
+        elif length_unit != "chars":
+            raise ValueError("Token-aware splitting requires splitter='offset'.")
+        else:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            self.splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=200
+            )
+        # One LoaderStats per file processed, for the ingest metrics.
+        self.metrics = []
 
     def process_files(self, file_paths):
         """
         Loads multiple PDFs/Text files and returns a list of split chunks.
+        The loader is picked by file extension (see src.core.loaders).
         """
         all_splits = []
-        
+
         for path in file_paths:
             try:
-                # Optimized: PyMuPDFLoader is significantly faster than PyPDFLoader
-                loader = PyMuPDFLoader(path)
-                docs = loader.load()
-                splits = self.splitter.split_documents(docs)
-                all_splits.extend(splits)
+                if os.path.getsize(path) == 0:
+                    continue
+                # Memory-map the file so loaders read it in place.
+                with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with memoryview(mapped) as view:
+                        all_splits.extend(self._process_buffer(view, path))
             except Exception as e:
                 print(f"Error processing {path}: {e}")
-                
+
         return all_splits
-        
+
+    def process_upload(self, uploaded_file):
+        """
+        Parses an upload straight from its in-memory buffer and returns split chunks.
+        No temp file is written, so uploads are read once and need no writable tmp dir.
+        """
+        try:
+            with uploaded_file.getbuffer() as view:
+                return self._process_buffer(view, uploaded_file.name, getattr(uploaded_file, "type", None))
+        except Exception as e:
+            print(f"Error processing {uploaded_file.name}: {e}")
+            return []
+
     def process_file(self, uploaded_file):
         """
         Legacy method for single file processing.
         """
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(uploaded_file.getbuffer())
-            tmp_path = tmp.name
-            
-        try:
-            return self.process_files([tmp_path])
-        finally:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
\ No newline at end of file
+        return self.process_upload(uploaded_file)
+
+    def _process_buffer(self, view, source, mime_type=None):
+        """
+        Streams documents out of the matching loader and splits each one as it
+        arrives, so only the chunks (not the whole decoded file) are kept.
+        """
+        loader = get_loader(source, mime_type)
+        stats = LoaderStats(os.path.basename(source), loader.name, loader.unit)
+        stats.bytes = len(view)
+
+        splits = []
+        split_seconds = 0.0
+        started = time.perf_counter()
+        for doc in loader.load(view, source, stats):
+            split_started = time.perf_counter()
+            splits.extend(self.splitter.split_documents([doc]))
+            split_seconds += time.perf_counter() - split_started
+        stats.seconds = time.perf_counter() - started - split_seconds
+
+        self.metrics.append(stats)
+        return splits
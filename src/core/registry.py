@@ -0,0 +1,95 @@
+import hashlib
+import threading
+
+
+class _CorpusEntry:
+    """A shared index plus the number of sessions currently attached to it."""
+
+    def __init__(self):
+        self.store = None
+        self.refcount = 0
+        self.build_lock = threading.Lock()
+
+
+class CorpusRegistry:
+    """
+    Process-wide registry of vector stores shared across Streamlit sessions.
+
+    Indexes are keyed by a corpus fingerprint, so sessions uploading the same
+    files with the same settings attach to one read-only index instead of
+    embedding their own copy. An entry is dropped once no session uses it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @staticmethod
+    def fingerprint(file_hashes, chunk_size, model_name, **settings):
+        """
+        Builds a stable corpus key from file content hashes and ingest settings.
+        File order does not matter. Any extra `settings` that change the index
+        (e.g. storage mode) are folded into the key.
+        """
+        digest = hashlib.sha256()
+        for file_hash in sorted(file_hashes):
+            digest.update(file_hash.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(f"chunk_size={chunk_size}|model={model_name}".encode("utf-8"))
+        for name, value in sorted(settings.items()):
+            digest.update(f"|{name}={value}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def acquire(self, fingerprint, build):
+        """
+        Returns the shared store for `fingerprint`, calling `build()` only if no
+        session has built it yet. Concurrent callers for the same corpus wait for
+        the first build instead of repeating it. Every successful acquire must be
+        paired with a `release`.
+        """
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                entry = _CorpusEntry()
+                self._entries[fingerprint] = entry
+            entry.refcount += 1
+
+        try:
+            with entry.build_lock:
+                if entry.store is None:
+                    entry.store = build()
+        except Exception:
+            self.release(fingerprint)
+            raise
+
+        if entry.store is None:
+            # Nothing to share (e.g. an empty corpus); don't keep the entry alive.
+            self.release(fingerprint)
+        return entry.store
+
+    def release(self, fingerprint):
+        """Drops one reference; the index is freed when the last session lets go."""
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return
+            entry.refcount -= 1
+            if entry.refcount <= 0:
+                del self._entries[fingerprint]
+
+    def refcount(self, fingerprint):
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            return entry.refcount if entry else 0
+
+    def stats(self):
+        """Returns a small summary of the shared corpora for display."""
+        with self._lock:
+            return [
+                {
+                    "fingerprint": fingerprint[:12],
+                    "sessions": entry.refcount,
+                    "chunks": entry.store.index.ntotal if entry.store is not None else 0,
+                }
+                for fingerprint, entry in self._entries.items()
+            ]
@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+import numpy as np
+
+from src.core import tracing
+
+ROUTES = ("CHAT", "RAG", "WEB")
+
+# Seed utterances for the nearest-centroid classifier; replace them with
+# labelled queries from the decision log via QueryRouter.fit().
+SEED_EXAMPLES = {
+    "CHAT": [
+        "hi there",
+        "thanks, that was helpful",
+        "how are you today",
+        "tell me a joke",
+        "what do you think about this idea",
+        "can you explain recursion simply",
+        "write a short poem about the sea",
+        "what is the capital of france",
+        "should i learn python or javascript first",
+        "explain the difference between a list and a tuple",
+        "give me tips for a job interview",
+        "what is your opinion on remote work",
+    ],
+    "RAG": [
+        "what does the document say about the refund policy",
+        "summarize the uploaded report",
+        "according to the pdf what are the key findings",
+        "what is the termination clause in the contract",
+        "list the requirements mentioned in section 3",
+        "what were the revenue figures in the annual report",
+        "who are the authors of this paper",
+        "what methodology does the study use",
+        "find the warranty terms in the manual",
+        "what does chapter two conclude",
+        "what are the action items from the meeting notes",
+        "which risks are listed in the file",
+    ],
+    "WEB": [
+        "what is the latest news about the election",
+        "current price of bitcoin",
+        "weather in london today",
+        "who won the match last night",
+        "stock price of apple right now",
+        "recent updates on the new iphone release date",
+        "breaking news this week",
+        "what happened in the market today",
+        "live score of the game",
+        "latest version of python released",
+        "today's headlines in technology",
+        "current exchange rate of dollar to euro",
+    ],
+}
+
+
+class RouteDecision:
+    def __init__(self, route, confidence, probabilities, features, results, vector=None):
+        self.route = route
+        self.confidence = confidence
+        self.probabilities = probabilities
+        self.features = features
+        # Retrieval results computed while routing, reused by the RAG path.
+        self.results = results
+        # The query embedding, so fallbacks don't embed the query again.
+        self.vector = vector
+        self.confident = False
+
+    def as_dict(self):
+        return {
+            "route": self.route,
+            "confident": self.confident,
+            "confidence": round(self.confidence, 4),
+            "probabilities": {route: round(p, 4) for route, p in self.probabilities.items()},
+            "features": self.features,
+        }
+
+
+class QueryRouter:
+    """
+    Decides CHAT / RAG / WEB before any LLM call.
+
+    Two signals are fused: a nearest-centroid classifier over the query
+    embedding (the same vector used for retrieval, so it costs nothing extra)
+    and the retrieval score of the best matching chunk. Keyword hints from the
+    agent nudge the result. Decisions under `min_confidence` are marked not
+    confident, and the agent falls back to its probing strategy.
+    Every decision (and the route finally used) can be appended to a JSONL log
+    for offline tuning.
+    """
+
+    def __init__(self, embedding_model, examples=None, min_confidence=0.55, temperature=0.05,
+                 weak_similarity=0.25, strong_similarity=0.55, hint_bonus=0.15, log_path=None):
+        """
+        Args:
+            weak_similarity / strong_similarity: Cosine similarity of the best
+                chunk below which documents count as no evidence, and above
+                which they count as full evidence for RAG.
+            hint_bonus: Added to a route's score when the agent's keyword
+                heuristics point to it.
+            log_path: Optional JSONL file receiving every decision.
+        """
+        self.embedding_model = embedding_model
+        self.examples = examples or SEED_EXAMPLES
+        self.min_confidence = min_confidence
+        self.temperature = temperature
+        self.weak_similarity = weak_similarity
+        self.strong_similarity = strong_similarity
+        self.hint_bonus = hint_bonus
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._centroids = None
+
+    def fit(self, examples):
+        """Rebuilds the centroids from {route: [queries]}, e.g. labelled log entries."""
+        centroids = {}
+        for route in ROUTES:
+            vectors = np.asarray(self.embedding_model.embed_documents(list(examples[route])), dtype=np.float32)
+            centroid = vectors.mean(axis=0)
+            centroids[route] = centroid / (np.linalg.norm(centroid) or 1.0)
+        with self._lock:
+            self.examples = examples
+            self._centroids = centroids
+
+    def classify(self, vector):
+        """Softmax over cosine similarity to each route's centroid."""
+        if self._centroids is None:
+            self.fit(self.examples)
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        sims = np.array([float(vector @ self._centroids[route]) for route in ROUTES])
+        weights = np.exp((sims - sims.max()) / self.temperature)
+        return dict(zip(ROUTES, (weights / weights.sum()).tolist()))
+
+    def route(self, query, memory, k=5, web_available=True, hints=None):
+        """
+        Args:
+            memory: MemoryManager (searched once with the query's embedding).
+            hints: Optional {"web": bool, "chat": bool} keyword signals.
+        """
+        hints = hints or {}
+        with tracing.span("embed"):
+            vector = self.embedding_model.embed_query(query)
+        classifier = self.classify(vector)
+
+        with tracing.span("search", k=k) as span:
+            results = memory.search_by_vector(vector, k=k) if memory.vector_store else []
+            span.set(results=len(results))
+        similarity = memory.score_to_similarity(results[0][1]) if results else None
+        similarity_range = self.strong_similarity - self.weak_similarity
+        evidence = 0.0 if similarity is None else float(
+            np.clip((similarity - self.weak_similarity) / similarity_range, 0.0, 1.0)
+        )
+
+        scores = {
+            "RAG": 0.5 * classifier["RAG"] + 0.5 * evidence if results else 0.0,
+            "WEB": classifier["WEB"] + (self.hint_bonus if hints.get("web") else 0.0),
+            "CHAT": classifier["CHAT"] + (self.hint_bonus if hints.get("chat") else 0.0),
+        }
+        if not web_available:
+            # Without a search key, web-like questions are answered from general knowledge.
+            scores["CHAT"] += scores.pop("WEB")
+            scores["WEB"] = 0.0
+        total = sum(scores.values()) or 1.0
+        probabilities = {route: score / total for route, score in scores.items()}
+        route = max(probabilities, key=probabilities.get)
+
+        features = {
+            "classifier": {name: round(p, 4) for name, p in classifier.items()},
+            "best_similarity": round(similarity, 4) if similarity is not None else None,
+            "rag_evidence": round(evidence, 4),
+            "hints": hints,
+            "web_available": web_available,
+        }
+        decision = RouteDecision(route, probabilities[route], probabilities, features, results, vector)
+        decision.confident = decision.confidence >= self.min_confidence
+        return decision
+
+    def record(self, query, decision, final_route, seconds=None):
+        """Appends the decision and the route actually used to the log (if any)."""
+        if not self.log_path:
+            return
+        entry = {"ts": time.time(), "query": query, **decision.as_dict(), "final_route": final_route}
+        if seconds is not None:
+            entry["seconds"] = round(seconds, 4)
+        with self._lock, open(self.log_path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry) + "\n")
@@ -0,0 +1,180 @@
+import hashlib
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Pages per section when chunks carry a page number; unpaged chunks are grouped
+# in runs of this many chunks per page instead.
+SECTION_PAGES = 5
+UNPAGED_CHUNKS_PER_PAGE = 4
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[a-z0-9]{3,}")
+
+
+class ExtractiveSummarizer:
+    """
+    Local, model-free summarizer: keeps the sentences whose words recur most
+    across the section, in their original order, up to `max_chars`. Good
+    enough to route queries to sections, and deterministic, so it is the
+    default and what the offline benchmarks use.
+    """
+
+    def __init__(self, max_chars=600):
+        self.max_chars = max_chars
+
+    def summarize(self, texts):
+        return [self._summarize(text) for text in texts]
+
+    def _summarize(self, text):
+        sentences = [sentence.strip() for sentence in _SENTENCE_END.split(" ".join(text.split())) if sentence.strip()]
+        if not sentences:
+            return ""
+        words = [_WORD.findall(sentence.lower()) for sentence in sentences]
+        frequency = Counter(word for sentence in words for word in set(sentence))
+        scores = [sum(frequency[word] for word in set(sentence)) / (len(sentence) or 1) ** 0.5 for sentence in words]
+
+        chosen, length = set(), 0
+        for index in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+            if length and length + len(sentences[index]) > self.max_chars:
+                continue
+            chosen.add(index)
+            length += len(sentences[index]) + 1
+        return " ".join(sentences[index] for index in sorted(chosen))[: self.max_chars]
+
+
+class LLMSummarizer:
+    """
+    Summarizes sections with a chat model (e.g. from LLMPool.chat_model), a few
+    sections at a time. A section whose call fails falls back to the
+    extractive summary rather than failing the ingest.
+    """
+
+    PROMPT = (
+        "Summarize this part of a document in at most {max_words} words. Name the topics, entities and "
+        "figures it covers so the summary can be matched against questions.\n\n{text}\n\nSummary:"
+    )
+
+    def __init__(self, llm, max_words=80, max_workers=4, max_input_chars=8000):
+        self.llm = llm
+        self.max_words = max_words
+        self.max_workers = max_workers
+        self.max_input_chars = max_input_chars
+        self.fallback = ExtractiveSummarizer()
+
+    def summarize(self, texts):
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="summarize") as pool:
+            return list(pool.map(self._summarize, texts))
+
+    def _summarize(self, text):
+        prompt = self.PROMPT.format(max_words=self.max_words, text=text[: self.max_input_chars])
+        try:
+            return self.llm.invoke(prompt).content.strip()
+        except Exception:
+            return self.fallback.summarize([text])[0]
+
+
+def section_key(metadata, position, section_pages=SECTION_PAGES):
+    """(document, section number) for a chunk; `position` numbers unpaged chunks."""
+    document = metadata.get("content_hash") or metadata.get("source") or ""
+    page = metadata.get("page")
+    if not isinstance(page, int):
+        page = position // UNPAGED_CHUNKS_PER_PAGE
+    return document, page // section_pages
+
+
+class SectionIndex:
+    """
+    Small top-level index over section summaries, for two-stage search:
+    pick the sections whose summaries best match the query, then search only
+    the chunks inside them. Rows hold a section's summary, its unit-length
+    summary vector and the FAISS ids of its chunks. Built from a store at
+    ingest and never mutated afterwards, so it can be shared like the store.
+    """
+
+    def __init__(self, keys, summaries, vectors, chunk_ids, digests, metadata):
+        self.keys = keys
+        self.summaries = summaries
+        self.vectors = vectors
+        self.chunk_ids = chunk_ids
+        self.digests = digests
+        self.metadata = metadata
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, store, embeddings, summarizer, section_pages=SECTION_PAGES, previous=None):
+        """
+        Groups the store's chunks into sections and summarizes them. Sections
+        whose text is unchanged since `previous` keep their summary and vector,
+        so adding a file only summarizes that file's sections.
+        """
+        grouped = {}
+        counters = Counter()
+        for position in sorted(store.index_to_docstore_id):
+            doc = store.docstore.search(store.index_to_docstore_id[position])
+            if not isinstance(doc, Document):
+                continue
+            document = doc.metadata.get("content_hash") or doc.metadata.get("source") or ""
+            key = section_key(doc.metadata, counters[document], section_pages)
+            counters[document] += 1
+            section = grouped.setdefault(key, {"ids": [], "texts": [], "pages": set(), "source": None})
+            section["ids"].append(position)
+            section["texts"].append(doc.page_content)
+            if isinstance(doc.metadata.get("page"), int):
+                section["pages"].add(doc.metadata["page"])
+            section["source"] = section["source"] or doc.metadata.get("source")
+        if not grouped:
+            return None
+
+        keys = list(grouped)
+        texts = ["\n".join(grouped[key]["texts"]) for key in keys]
+        digests = [hashlib.sha1(text.encode("utf-8")).hexdigest() for text in texts]
+        cached = {}
+        if previous is not None:
+            for row, key in enumerate(previous.keys):
+                cached[(key, previous.digests[row])] = (previous.summaries[row], previous.vectors[row])
+
+        summaries = [None] * len(keys)
+        vectors = [None] * len(keys)
+        missing = []
+        for row, key in enumerate(keys):
+            hit = cached.get((key, digests[row]))
+            if hit is None:
+                missing.append(row)
+            else:
+                summaries[row], vectors[row] = hit
+        if missing:
+            new_summaries = summarizer.summarize([texts[row] for row in missing])
+            new_vectors = np.asarray(embeddings.embed_documents(new_summaries), dtype=np.float32)
+            new_vectors /= np.maximum(np.linalg.norm(new_vectors, axis=1, keepdims=True), 1e-12)
+            for row, summary, vector in zip(missing, new_summaries, new_vectors):
+                summaries[row], vectors[row] = summary, vector
+
+        metadata = []
+        for key in keys:
+            pages = sorted(grouped[key]["pages"])
+            entry = {"source": grouped[key]["source"], "pages": pages, "section_summary": True}
+            if pages:
+                entry["page"] = pages[0]
+            metadata.append(entry)
+        chunk_ids = [np.asarray(grouped[key]["ids"], dtype=np.int64) for key in keys]
+        return cls(keys, summaries, np.vstack(vectors), chunk_ids, digests, metadata)
+
+    def top(self, query_vector, n):
+        """(row, cosine similarity) of the `n` sections closest to a unit-length query vector."""
+        similarities = self.vectors @ np.asarray(query_vector, dtype=np.float32)
+        n = min(n, len(similarities))
+        rows = np.argpartition(-similarities, n - 1)[:n]
+        rows = rows[np.argsort(-similarities[rows])]
+        return [(int(row), float(similarities[row])) for row in rows]
+
+    def candidate_ids(self, rows):
+        """FAISS ids of every chunk in the given sections."""
+        return np.concatenate([self.chunk_ids[row] for row in rows])
+
+    def document(self, row):
+        return Document(page_content=self.summaries[row], metadata=dict(self.metadata[row]))
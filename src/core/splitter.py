@@ -0,0 +1,132 @@
+from collections import deque
+from langchain_core.documents import Document
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+class OffsetTextSplitter:
+    """
+    High-throughput replacement for RecursiveCharacterTextSplitter.
+
+    Pieces are tracked as (start, end) offsets into the page text and each
+    chunk is sliced out exactly once, instead of building, re-joining and
+    re-splitting intermediate strings. With the default character lengths it
+    produces byte-identical chunks to
+    `RecursiveCharacterTextSplitter(chunk_size, chunk_overlap)`.
+    """
+
+    def __init__(self, chunk_size=1000, chunk_overlap=200, separators=None, length_unit="chars",
+                 encoding_name="cl100k_base"):
+        """
+        Args:
+            length_unit: "chars" (compatibility mode) or "tokens", which measures
+                chunk_size/chunk_overlap in tiktoken tokens.
+            encoding_name: tiktoken encoding used when length_unit="tokens".
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller."
+            )
+        if length_unit not in ("chars", "tokens"):
+            raise ValueError(f"length_unit must be 'chars' or 'tokens', got {length_unit!r}")
+
+        self._chunk_size = chunk_size
+        self._chunk_overlap = chunk_overlap
+        self._separators = separators or DEFAULT_SEPARATORS
+        self._encoding = None
+        if length_unit == "tokens":
+            import tiktoken
+
+            self._encoding = tiktoken.get_encoding(encoding_name)
+
+    def split_text(self, text):
+        chunks = []
+        self._split(text, 0, len(text), self._separators, chunks)
+        return chunks
+
+    def split_documents(self, documents):
+        """Splits each Document, copying its metadata onto every chunk."""
+        chunks = []
+        for doc in documents:
+            for chunk in self.split_text(doc.page_content):
+                chunks.append(Document(page_content=chunk, metadata=dict(doc.metadata)))
+        return chunks
+
+    def _length(self, text, start, end):
+        if self._encoding is None:
+            return end - start
+        return len(self._encoding.encode(text[start:end], disallowed_special=()))
+
+    def _split(self, text, start, end, separators, chunks):
+        # Use the first separator present in this span; finer ones are kept for recursion.
+        separator = separators[-1]
+        remaining = []
+        for i, candidate in enumerate(separators):
+            if not candidate:
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[i + 1 :]
+                break
+
+        good_pieces = []
+        for piece_start, piece_end in self._pieces(text, start, end, separator):
+            length = self._length(text, piece_start, piece_end)
+            if length < self._chunk_size:
+                good_pieces.append((piece_start, piece_end, length))
+                continue
+            if good_pieces:
+                self._merge(text, good_pieces, chunks)
+                good_pieces = []
+            if not remaining:
+                chunks.append(text[piece_start:piece_end])
+            else:
+                self._split(text, piece_start, piece_end, remaining, chunks)
+        if good_pieces:
+            self._merge(text, good_pieces, chunks)
+
+    @staticmethod
+    def _pieces(text, start, end, separator):
+        """
+        Offsets of the pieces between separator matches, each piece starting
+        with its separator (keep_separator="start"). Empty pieces are skipped.
+        """
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+
+        pieces = []
+        piece_start = start
+        position = text.find(separator, start, end)
+        while position != -1:
+            if position > piece_start:
+                pieces.append((piece_start, position))
+            piece_start = position
+            position = text.find(separator, position + len(separator), end)
+        if end > piece_start:
+            pieces.append((piece_start, end))
+        return pieces
+
+    def _merge(self, text, pieces, chunks):
+        """
+        Greedily packs adjacent pieces into chunks with overlap. Pieces are
+        contiguous, so a window of pieces is just text[first_start:last_end].
+        """
+        window = deque()
+        total = 0
+        for piece in pieces:
+            length = piece[2]
+            if total + length > self._chunk_size and window:
+                self._emit(text, window[0][0], window[-1][1], chunks)
+                while total > self._chunk_overlap or (total + length > self._chunk_size and total > 0):
+                    total -= window.popleft()[2]
+            window.append(piece)
+            total += length
+        if window:
+            self._emit(text, window[0][0], window[-1][1], chunks)
+
+    @staticmethod
+    def _emit(text, start, end, chunks):
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
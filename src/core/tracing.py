@@ -0,0 +1,176 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+# Counters added to every enclosing span when a span ends, so a stage reports
+# the tokens of all LLM calls made inside it.
+ROLLUP_ATTRIBUTES = ("llm.input_tokens", "llm.output_tokens", "llm.total_tokens")
+
+
+class Span:
+    """One timed stage. Attributes are free-form; numeric ones can be accumulated with add()."""
+
+    def __init__(self, tracer, name, trace_id, parent_id, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, name, amount):
+        """Accumulates a counter, e.g. tokens over several LLM calls in one stage."""
+        self.attributes[name] = self.attributes.get(name, 0) + amount
+
+    def end(self):
+        self.duration = time.perf_counter() - self._started
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+
+    def as_record(self):
+        """OpenTelemetry-shaped span record (field names follow the OTLP JSON encoding)."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration * 1000, 3),
+            "attributes": dict(self.attributes),
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+class Tracer:
+    """
+    Collects per-stage spans. Finished spans are kept in a rolling window for
+    summary() and, with `path`, appended to a JSON-lines file (one span
+    record per line) for offline analysis.
+
+    Spans nest through a context variable: code anywhere below an active span
+    can open children with the module-level span() without holding the tracer.
+    """
+
+    def __init__(self, path=None, window=5000):
+        self.path = path
+        self.lock = threading.Lock()
+        self.spans = deque(maxlen=window)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        parent = _current_span.get()
+        trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        current = Span(self, name, trace_id, parent.span_id if parent is not None else None, attributes)
+        token = _current_span.set(current)
+        try:
+            yield current
+        except BaseException as error:
+            current.error = f"{type(error).__name__}: {error}"
+            raise
+        finally:
+            current.end()
+            _current_span.reset(token)
+            if parent is not None:
+                for key in ROLLUP_ATTRIBUTES:
+                    if key in current.attributes:
+                        parent.add(key, current.attributes[key])
+            self._export(current)
+
+    def _export(self, span):
+        record = span.as_record()
+        with self.lock:
+            self.spans.append(record)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    handle.write(json.dumps(record, default=str) + "\n")
+
+    def summary(self):
+        with self.lock:
+            records = list(self.spans)
+        return summarize(records)
+
+
+def span(name, **attributes):
+    """Child span of the active span, or a no-op when nothing is being traced."""
+    parent = _current_span.get()
+    if parent is None:
+        return nullcontext(_NullSpan())
+    return parent.tracer.span(name, **attributes)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def propagate(fn):
+    """Wraps `fn` to run in the caller's context, so spans opened on a worker thread nest correctly."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+class _NullSpan:
+    def set(self, **attributes):
+        pass
+
+    def add(self, name, amount):
+        pass
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(records):
+    """Per stage name: count, errors, p50/p95/p99 ms, and token / cache-hit totals."""
+    grouped = defaultdict(list)
+    for record in records:
+        grouped[record["name"]].append(record)
+
+    summary = {}
+    for name, spans in sorted(grouped.items()):
+        durations = sorted(record["durationMs"] for record in spans)
+        row = {
+            "count": len(spans),
+            "errors": sum(1 for record in spans if record["status"]["code"] == "ERROR"),
+            "p50_ms": round(_percentile(durations, 0.50), 1),
+            "p95_ms": round(_percentile(durations, 0.95), 1),
+            "p99_ms": round(_percentile(durations, 0.99), 1),
+        }
+        tokens = sum(record["attributes"].get("llm.total_tokens", 0) for record in spans)
+        if tokens:
+            row["tokens"] = tokens
+        hits = [record["attributes"]["cache_hit"] for record in spans if "cache_hit" in record["attributes"]]
+        if hits:
+            row["cache_hit_rate"] = round(sum(hits) / len(hits), 3)
+        summary[name] = row
+    return summary
+
+
+def load(path):
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="p50/p95/p99 per stage from a trace file written by Tracer.")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    for name, row in summarize(load(args.path)).items():
+        extras = "".join(f", {key} {row[key]}" for key in ("tokens", "cache_hit_rate") if key in row)
+        print(f"{name:<20} n={row['count']:<6} p50 {row['p50_ms']:>9} ms  p95 {row['p95_ms']:>9} ms  "
+              f"p99 {row['p99_ms']:>9} ms  errors {row['errors']}{extras}")
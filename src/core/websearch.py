@@ -0,0 +1,157 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after `ttl` seconds. With `path`,
+    entries are also written to a SQLite table so they survive restarts;
+    memory stays capped at `max_entries` either way.
+    """
+
+    def __init__(self, name, ttl, max_entries=1024, path=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._db.execute(f"DELETE FROM {name} WHERE expires < ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def make_key(*parts):
+        joined = "\0".join(_normalize(str(part)) for part in parts)
+        return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, expires FROM {self.name} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1])
+                    self._remember(key, entry)
+            if entry is None or entry[1] < now:
+                if entry is not None:
+                    self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        entry = (value, time.time() + self.ttl)
+        with self.lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.name} (key, value, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), entry[1]),
+                )
+                self._db.commit()
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+class WebSearch:
+    """
+    Process-wide Tavily access shared by every session: one pooled, retrying
+    HTTP session per API key, and TTL caches for (question -> generated search
+    query) and (search query -> results), so a repeated web-routed question
+    skips both the query-writing LLM call and the Tavily round trip.
+    """
+
+    def __init__(self, query_ttl=24 * 3600, results_ttl=15 * 60, max_entries=1024, cache_path=None, timeout=15,
+                 pool_size=16, api_base_url=None):
+        """
+        Args:
+            query_ttl: Seconds a generated search query is reused.
+            results_ttl: Seconds search results stay fresh; keep this short,
+                web-routed questions are usually about recent events.
+            cache_path: Optional SQLite file to persist both caches.
+            timeout: Per-request HTTP timeout in seconds.
+        """
+        self.queries = TTLCache("search_queries", query_ttl, max_entries, cache_path)
+        self.results = TTLCache("search_results", results_ttl, max_entries, cache_path)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.api_base_url = api_base_url
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def client(self, api_key):
+        """Returns the shared TavilyClient for `api_key`."""
+        key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            client = self._clients.get(key_id)
+            if client is None:
+                client = self._new_client(api_key)
+                self._clients[key_id] = client
+            return client
+
+    def _new_client(self, api_key):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from tavily import TavilyClient
+        from urllib3.util.retry import Retry
+
+        # Search is idempotent, so POSTs are safe to retry on transient failures.
+        retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset({"POST"}), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # One session per key: TavilyClient stores the Authorization header on the session.
+        return TavilyClient(api_key=api_key, api_base_url=self.api_base_url, session=session)
+
+    def cached_search_query(self, question):
+        return self.queries.get(TTLCache.make_key(question))
+
+    def remember_search_query(self, question, search_query):
+        self.queries.put(TTLCache.make_key(question), search_query)
+
+    def search(self, client, search_query, **options):
+        """
+        Returns (results, from_cache). Only non-empty results are cached, so a
+        failed or empty search is retried next time.
+        """
+        key = TTLCache.make_key(search_query, json.dumps(options, sort_keys=True))
+        cached = self.results.get(key)
+        if cached is not None:
+            return cached, True
+        results = client.search(query=search_query, timeout=self.timeout, **options)
+        if results.get("results"):
+            self.results.put(key, results)
+        return results, False
+
+    def stats(self):
+        return {"queries": self.queries.stats(), "results": self.results.stats()}
@@ -1,5 +1,8 @@
 import streamlit as st
 
+from src.core.conversations import new_conversation_id
+from src.core.formats import supported_extensions
+
 
 def setup_page():
     """
@@ -270,10 +273,10 @@ def setup_page():
         # Knowledge Base
         st.markdown("### Data Source")
         uploaded_files = st.file_uploader(
-            "Upload PDF documents",
-            type=["pdf"],
+            "Upload documents",
+            type=supported_extensions(),
             accept_multiple_files=True,
-            help="Use one or multiple PDFs to build your local knowledge base.",
+            help="PDF, text, Markdown, HTML, DOCX or CSV files for your local knowledge base.",
         )
 
         # --- RESTORED SLIDERS ---
@@ -303,7 +306,13 @@ def setup_page():
         if st.button("Reset Brain", type="secondary", use_container_width=True):
             if "memory_manager" in st.session_state:
                 st.session_state.memory_manager.clear()
-            st.session_state.messages = []
+            # Chat history lives in the conversation store: start a new conversation,
+            # as "New Conversation" does, and drop the old one's rolling summary.
+            st.session_state.conversation_id = new_conversation_id()
+            st.query_params["conversation"] = st.session_state.conversation_id
+            st.session_state.history_pages = 1
+            for key in ("chat_memory", "chat_memory_id"):
+                st.session_state.pop(key, None)
             if "processed_state" in st.session_state:
                 del st.session_state["processed_state"]
             st.toast("Brain memory wiped.")
@@ -1,6 +1,4 @@
 import streamlit as st
-import pandas as pd
-import altair as alt
 
 
 def normalize_source_results(results):
@@ -33,7 +31,22 @@ def render_sidebar_stats(chunk_count):
     st.sidebar.progress(min(chunk_count / 100, 1.0))
 
 
-def render_source_badges(results):
+def render_latency_summary(summary):
+    if not summary:
+        return
+    with st.sidebar.expander("Latency (p50 / p95 / p99)", expanded=False):
+        rows = [{"stage": name, **row} for name, row in summary.items()]
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+
+
+def _similarity(score, score_to_similarity):
+    # Without the store's converter, fall back to the old distance-based estimate.
+    if score_to_similarity is None:
+        return 1.0 / (1.0 + score)
+    return max(0.0, min(1.0, score_to_similarity(score)))
+
+
+def render_source_badges(results, score_to_similarity=None):
     normalized = normalize_source_results(results)
     if not normalized:
         return
@@ -45,17 +58,26 @@ def render_source_badges(results):
             if score is None:
                 st.metric(label=f"Source {i + 1}", value="Context", delta=f"Page {doc.metadata.get('page', '?')}")
             else:
-                confidence = (1.0 / (1.0 + score)) * 100
+                confidence = _similarity(score, score_to_similarity) * 100
                 st.metric(
                     label=f"Source {i + 1}",
                     value=f"{confidence:.0f}% match",
                     delta=f"Page {doc.metadata.get('page', '?')}",
                 )
-            st.caption(source_name[:48])
+            copies = doc.metadata.get("duplicate_sources") or []
+            aliases = doc.metadata.get("aliases") or []
+            if copies or aliases:
+                other_files = sorted({str(record.get("source")) for record in copies} | set(aliases))
+                count = len(copies) + len(aliases)
+                st.caption(f"{source_name[:48]} (+{count} copies)", help="Also in: " + ", ".join(other_files))
+            else:
+                st.caption(source_name[:48])
 
 
-def render_comparison_chart(doc_content, distance_score, doc_vector, query_vector, label):
-    similarity_score = 1.0 / (1.0 + distance_score)
+def render_comparison_chart(doc_content, score, doc_vector, query_vector, label, score_to_similarity=None,
+                            metric="l2"):
+    """`score` is the raw search score; `score_to_similarity` converts it for the store's metric."""
+    similarity_score = _similarity(score, score_to_similarity)
     percentage = similarity_score * 100
 
     if percentage >= 70:
@@ -69,12 +91,16 @@ def render_comparison_chart(doc_content, distance_score, doc_vector, query_vecto
         c1, c2 = st.columns([1, 2])
         with c1:
             st.markdown(f":{color}[**{percentage:.1f}%**] ({label_text})")
-            st.caption(f"(Raw Distance: {distance_score:.4f})")
+            score_name = "Inner Product" if metric == "ip" else "Distance"
+            st.caption(f"(Raw {score_name}: {score:.4f})")
         with c2:
             st.markdown("**Context Preview**")
             st.info(doc_content[:1700] + ("..." if len(doc_content) > 1700 else ""))
 
-        # Chart
+        # Chart (pandas/altair are only imported once a chart is drawn)
+        import altair as alt
+        import pandas as pd
+
         dims = min(len(query_vector), 50)
         df = pd.DataFrame({
             "Dimension": list(range(dims)) * 2,
@@ -0,0 +1,165 @@
+"""
+GuardedChatModel against the local fake LLM server (benchmarks/fake_llm_server.py):
+retries on 429/503, Retry-After, and the requests/tokens-per-minute budgets.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+
+from benchmarks.fake_llm_server import FakeLLMConfig, start_server
+from src.core.llm import GuardedChatModel, LLMPool, LLMStats, RateLimiter, TokenBucket
+
+# About 126 prompt tokens by both the client's estimate and the fake server's count.
+PROMPT = "word " * 100
+
+
+@pytest.fixture
+def fake_llm():
+    servers = []
+
+    def start(**options):
+        options = {"latency_ms": 1.0, "sigma": 0.0, "tail": 0.0, "seed": 0, "reply": "ok", **options}
+        server, url = start_server(FakeLLMConfig(**options))
+        servers.append(server)
+        return server.config, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture
+def guarded():
+    """Builds GuardedChatModels over ChatGroq clients pointed at the fake server."""
+    pools = []
+
+    def build(url, limiter=None, **options):
+        pool = LLMPool(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, base_url=url, hedge=False,
+                       backoff_base=0.01, **options)
+        pools.append(pool)
+        model = pool.chat_model("gsk_test_key")
+        if limiter is not None:
+            model.limiter = limiter
+        return model
+
+    yield build
+    for pool in pools:
+        pool.close()
+
+
+def call_concurrently(model, calls, threads=8):
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(lambda _: model.invoke(PROMPT), range(calls)))
+
+
+def test_retries_rate_limits_and_server_errors(fake_llm, guarded):
+    config, url = fake_llm(failures=(429, 503))
+    model = guarded(url)
+
+    assert model.invoke("hello").content == "ok"
+    assert config.counts["requests"] == 3
+    assert model.stats.retries == 2
+
+
+def test_failed_attempts_are_refunded(fake_llm, guarded):
+    config, url = fake_llm(failures=(429, 503))
+    limiter = RateLimiter(10 ** 6, 10 ** 9)
+    # Practically no refill, so the balance shows exactly what was charged.
+    limiter.tokens = TokenBucket(1e-9, capacity=10000)
+    model = guarded(url, limiter=limiter)
+
+    result = model.invoke(PROMPT)
+    assert config.counts["requests"] == 3
+    assert 10000 - limiter.tokens.tokens == pytest.approx(result.usage_metadata["total_tokens"], abs=1)
+
+
+def test_gives_up_after_max_retries(fake_llm, guarded):
+    config, url = fake_llm(failures=(503, 503, 503))
+    model = guarded(url, max_retries=2)
+
+    with pytest.raises(Exception):
+        model.invoke("hello")
+    assert config.counts["requests"] == 3
+    assert model.stats.failures == 1
+
+
+def test_does_not_retry_client_errors(fake_llm, guarded):
+    config, url = fake_llm(failures=(400,))
+    model = guarded(url)
+
+    with pytest.raises(Exception):
+        model.invoke("hello")
+    assert config.counts["requests"] == 1
+
+
+def test_honours_retry_after(fake_llm, guarded):
+    config, url = fake_llm(failures=(429,), failure_retry_after=0.6)
+    model = guarded(url)
+
+    model.invoke("hello")
+    first, second = config.arrivals
+    # The jittered backoff alone would be at most 10 ms.
+    assert second - first >= 0.55
+
+
+def test_requests_per_minute_limit_holds(fake_llm, guarded):
+    config, url = fake_llm()
+    # 10 requests of burst, then 10 a second.
+    model = guarded(url, limiter=RateLimiter(600, 10 ** 9, burst_seconds=1))
+
+    call_concurrently(model, 30)
+
+    arrivals = sorted(config.arrivals)
+    for i in range(len(arrivals)):
+        for j in range(i, len(arrivals)):
+            assert j - i + 1 <= 10 + 10 * (arrivals[j] - arrivals[i]) + 1
+    assert arrivals[-1] - arrivals[0] >= (30 - 10) / 10 * 0.9
+    assert config.counts["rate_limited"] == 0
+
+
+def test_tokens_per_minute_limit_holds(fake_llm, guarded):
+    config, url = fake_llm()
+    # 1,000 tokens of burst, then 1,000 a second; each call uses about 127.
+    model = guarded(url, limiter=RateLimiter(10 ** 6, 60000, burst_seconds=1), expected_output_tokens=1)
+
+    started = time.monotonic()
+    results = call_concurrently(model, 20)
+    elapsed = time.monotonic() - started
+
+    used = sum(result.usage_metadata["total_tokens"] for result in results)
+    assert used > 1000
+    assert elapsed >= (used - 1000) / 1000 * 0.9
+
+
+class _SlowFirstModel(Runnable):
+    """The first call takes 0.4 s, later ones 0.05 s; each reports 100 tokens used."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(0.4 if call == 1 else 0.05)
+        return AIMessage(content="ok", usage_metadata={"input_tokens": 40, "output_tokens": 60, "total_tokens": 100})
+
+
+def test_hedge_loser_is_charged_its_usage():
+    limiter = RateLimiter(10 ** 6, 10 ** 9)
+    # Practically no refill, so the balance shows exactly what was charged.
+    limiter.tokens = TokenBucket(1e-9, capacity=10000)
+    model = GuardedChatModel(_SlowFirstModel(), limiter, LLMStats(), ThreadPoolExecutor(max_workers=2),
+                             hedge_after=0.1)
+
+    model.invoke("hello")
+    assert model.stats.hedge_wins == 1
+    time.sleep(0.5)  # Let the slow primary finish.
+
+    assert model.model.calls == 2
+    assert 10000 - limiter.tokens.tokens == pytest.approx(200, abs=1)